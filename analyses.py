@@ -0,0 +1,133 @@
+'''
+
+Statistical building blocks shared by the analysis scripts and the report runner
+
+Each function takes already-loaded frames (see data_access.py) and returns plain
+numbers or small tables, so the same result can be printed by inferential_tests.py,
+drawn by inferential_plots.py, or memoized once by report_runner.py. SciPy and the
+model code are imported inside the functions that use them, so loading this module
+for the crosstab alone stays cheap.
+
+'''
+
+
+# Import libraries
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+
+
+@traced("crosstab")
+def risk_reward_crosstab(d1):
+    """Counts of risk (rows) by reward (columns) for dataset1."""
+    return pd.crosstab(d1["risk"], d1["reward"])
+
+
+@traced("chi_square", imports=["scipy.stats"])
+def chi_square(ct):
+    """Chi-square test of independence on a contingency table, with Cramer's V."""
+    from scipy import stats
+
+    chi2, p, dof, expected = stats.chi2_contingency(ct)
+    n = ct.values.sum()
+    r, k = ct.shape
+    cramers_v = np.sqrt((chi2 / n) / (min(k - 1, r - 1)))
+    return {"chi2": chi2, "p": p, "dof": dof, "expected": expected, "n": n, "cramers_v": cramers_v}
+
+
+@traced("mann_whitney", imports=["scipy.stats"])
+def mann_whitney(x, y):
+    """Two-sided Mann–Whitney U between two samples, with rank-biserial r."""
+    from scipy import stats
+
+    u_stat, p_u = stats.mannwhitneyu(x, y, alternative="two-sided")
+    rank_biserial = 1 - (2 * u_stat) / (len(x) * len(y))
+    return {"x": x, "y": y, "u": u_stat, "p": p_u, "rank_biserial": rank_biserial}
+
+
+def mann_whitney_by_risk(d1, value="bat_landing_to_food"):
+    """Mann–Whitney U of `value` between risk=0 and risk=1 (see mann_whitney)."""
+    return mann_whitney(d1.loc[d1["risk"] == 0, value], d1.loc[d1["risk"] == 1, value])
+
+
+@traced("logit_fit", imports=["risk_model"])
+def fit_risk_logit(d1):
+    """Logit of risk on seconds_after_rat_arrival + C(season) (risk_model.LogitFit)."""
+    from risk_model import Design, fit_logit
+
+    design = Design(d1, numeric=["seconds_after_rat_arrival"], categorical=["season"])
+    return fit_logit(design, d1["risk"].cat.codes)  # codes ensure a 0/1 numeric outcome
+
+
+@traced("logit_fit", imports=["risk_model"])
+def fit_seasonal_risk_logit(d1_seasons):
+    """Logit of risk on season name, seconds after rat arrival and hours after sunset."""
+    from risk_model import Design, fit_logit
+
+    design = Design(d1_seasons, numeric=["seconds_after_rat_arrival", "hours_after_sunset"],
+                    categorical=["season"])
+    return fit_logit(design, d1_seasons["risk"].cat.codes)
+
+
+def odds_ratio_table(model, rescale=None):
+    """Odds ratios with 95% CI and p-values for a fitted logit.
+
+    `rescale` maps a term to (new_name, factor) to report it per `factor` units,
+    e.g. {"seconds_after_rat_arrival": ("sec_minutes", 60.0)} for ORs per minute.
+    """
+    params = model.params.copy()
+    conf = model.conf_int()
+    for term, (new_name, factor) in (rescale or {}).items():
+        params[term] *= factor
+        conf.loc[term] *= factor
+        params = params.rename({term: new_name})
+        conf = conf.rename(index={term: new_name})
+    return pd.DataFrame({
+        "OR": np.exp(params),
+        "CI_lower": np.exp(conf[0]),
+        "CI_upper": np.exp(conf[1]),
+        "p_value": model.pvalues.values,
+    })
+
+
+def risk_prediction_curves(model, d1, points=100):
+    """Predicted P(risk=1) from fit_risk_logit() over minutes since rat arrival, per season code."""
+    minutes = d1["seconds_after_rat_arrival"] / 60.0
+    curves = pd.DataFrame({"sec_minutes": np.linspace(minutes.min(), minutes.max(), points)})
+    for season in [0, 1]:
+        curves[f"season={season}"] = np.asarray(model.predict(pd.DataFrame({
+            "seconds_after_rat_arrival": curves["sec_minutes"] * 60.0,
+            "season": season,
+        })))
+    return curves
+
+
+@traced("spearman", imports=["scipy.stats"])
+def spearman(x, y):
+    """Spearman rho and p-value as plain floats."""
+    from scipy import stats
+
+    rho, p = stats.spearmanr(x, y)
+    return float(rho), float(p)
+
+
+@traced("bootstrap_ci", imports=["resampling"])
+def effect_size_cis(d1, d2, n_resamples=10_000, confidence=0.95, seed=0, workers=None):
+    """Bootstrap confidence intervals for the effect sizes reported by inferential_tests.py.
+
+    The resample blocks run on `workers` processes (None = one per core).
+    """
+    from resampling import bootstrap_ci
+
+    risk = d1["risk"].cat.codes.to_numpy()
+    columns = {
+        "cramers_v": ("cramers_v", [risk, d1["reward"].cat.codes.to_numpy()]),
+        "rank_biserial": ("rank_biserial", [d1["bat_landing_to_food"].to_numpy(float), risk]),
+        "rho_arrivals_landings": ("spearman", [d2["rat_arrival_number"].to_numpy(float),
+                                               d2["bat_landing_number"].to_numpy(float)]),
+        "rho_minutes_food": ("spearman", [d2["rat_minutes"].to_numpy(float),
+                                          d2["food_availability"].to_numpy(float)]),
+    }
+    return {name: bootstrap_ci(stat, arrays, n_resamples, confidence, seed, workers)
+            for name, (stat, arrays) in columns.items()}
@@ -0,0 +1,130 @@
+'''
+
+Batched hypothesis tests over many groups at once
+
+When the same test is needed for every site x month x season x habit cell, calling
+scipy once per cell means thousands of tiny calls. These functions take the full frame
+and the grouping columns and compute every group's test in one pass: ranks come from a
+single grouped rank, and counts and rank sums from grouped sums, so the per-group work
+is plain array arithmetic.
+
+Each returns a tidy table with one row per group:
+    <group columns>, test, n, statistic, dof, p_value, effect_size, effect
+using the same conventions as analyses.py (Yates-corrected chi-square for 2x2 tables,
+Cramer's V; two-sided Mann–Whitney U with tie and continuity correction, rank-biserial
+r = 1 - 2U/(n1 n2); Spearman rho with the t approximation).
+
+'''
+
+
+# Import libraries
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def _as_list(by):
+    return [by] if isinstance(by, str) else list(by)
+
+
+def _tidy(keys, by, test, n, statistic, dof, p, effect, effect_name):
+    out = keys.to_frame(index=False) if isinstance(keys, pd.MultiIndex) else pd.DataFrame({by[0]: keys})
+    out["test"] = test
+    out["n"] = np.asarray(n, dtype=int)
+    out["statistic"] = statistic
+    out["dof"] = dof
+    out["p_value"] = p
+    out["effect_size"] = effect
+    out["effect"] = effect_name
+    return out
+
+
+def batch_chi_square(df, by, row, col, correction=True):
+    """Chi-square test of independence of `row` x `col` within every `by` group."""
+    by = _as_list(by)
+    counts = df.groupby(by + [row, col], observed=True).size()
+    cube = counts.unstack([row, col], fill_value=0)
+    keys = cube.index
+    # (groups, rows, cols) array of observed counts over the union of row/col levels
+    full = pd.MultiIndex.from_product([counts.index.levels[-2], counts.index.levels[-1]])
+    observed = cube.reindex(columns=full, fill_value=0).to_numpy(dtype=float)
+    observed = observed.reshape(len(keys), len(full.levels[0]), len(full.levels[1]))
+
+    row_tot = observed.sum(axis=2, keepdims=True)
+    col_tot = observed.sum(axis=1, keepdims=True)
+    n = observed.sum(axis=(1, 2))
+    # levels absent from a group drop out of its table, as they would from its crosstab
+    r_eff = (row_tot[:, :, 0] > 0).sum(axis=1)
+    c_eff = (col_tot[:, 0, :] > 0).sum(axis=1)
+    dof = (r_eff - 1) * (c_eff - 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        expected = row_tot * col_tot / n[:, None, None]
+        diff = observed - expected
+        if correction:
+            # Yates' correction, applied like scipy only where the table has one degree of freedom
+            yates = np.minimum(0.5, np.abs(diff)) * (dof == 1)[:, None, None]
+            diff = np.sign(diff) * (np.abs(diff) - yates)
+        cells = np.where(expected > 0, diff ** 2 / expected, 0.0)
+        chi2 = cells.sum(axis=(1, 2))
+        chi2 = np.where(dof > 0, chi2, np.nan)
+        p = stats.chi2.sf(chi2, np.maximum(dof, 1))
+        cramers_v = np.sqrt(chi2 / n / np.maximum(np.minimum(r_eff, c_eff) - 1, 1))
+    return _tidy(keys, by, "chi_square", n, chi2, dof, p, cramers_v, "cramers_v")
+
+
+def batch_mann_whitney(df, by, value, group, x=0, y=1):
+    """Mann–Whitney U of `value` between group == x and group == y within every `by` group."""
+    by = _as_list(by)
+    sub = df.loc[df[group].isin([x, y]) & df[value].notna(), by + [group, value]]
+    ranks = sub.groupby(by, observed=True)[value].rank(method="average")
+    is_x = (sub[group] == x).to_numpy()
+    parts = pd.DataFrame({
+        "rank_x": np.where(is_x, ranks.to_numpy(), 0.0),
+        "n_x": is_x.astype(int),
+        "n_y": (~is_x).astype(int),
+    }, index=sub.index)
+    sums = parts.groupby([sub[c] for c in by], observed=True).sum()
+    # tie correction: sum of t^3 - t over runs of equal values in each group
+    ties = sub.groupby(by + [value], observed=True).size().astype(float)
+    tie_term = (ties ** 3 - ties).groupby(level=list(range(len(by))), observed=True).sum()
+    tie_term = tie_term.reindex(sums.index, fill_value=0.0).to_numpy()
+
+    n1, n2 = sums["n_x"].to_numpy(dtype=float), sums["n_y"].to_numpy(dtype=float)
+    n = n1 + n2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        u = sums["rank_x"].to_numpy() - n1 * (n1 + 1) / 2.0
+        mu = n1 * n2 / 2.0
+        sigma = np.sqrt(n1 * n2 / 12.0 * ((n + 1) - tie_term / (n * (n - 1))))
+        z = (np.maximum(u, n1 * n2 - u) - mu - 0.5) / sigma
+        p = np.clip(2 * stats.norm.sf(z), 0, 1)
+        valid = (n1 > 0) & (n2 > 0)
+        p = np.where(valid, p, np.nan)
+        u = np.where(valid, u, np.nan)
+        rank_biserial = 1 - 2 * u / (n1 * n2)
+    return _tidy(sums.index, by, "mann_whitney", n, u, np.nan, p, rank_biserial, "rank_biserial")
+
+
+def batch_spearman(df, by, x, y):
+    """Spearman rho between `x` and `y` within every `by` group."""
+    by = _as_list(by)
+    sub = df.loc[df[x].notna() & df[y].notna(), by + [x, y]]
+    grouped = sub.groupby(by, observed=True)
+    rx = grouped[x].rank(method="average").to_numpy()
+    ry = grouped[y].rank(method="average").to_numpy()
+    parts = pd.DataFrame({"n": 1, "rx": rx, "ry": ry, "rxx": rx * rx, "ryy": ry * ry, "rxy": rx * ry},
+                         index=sub.index)
+    sums = parts.groupby([sub[c] for c in by], observed=True).sum()
+
+    n = sums["n"].to_numpy(dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sums["rxy"] - sums["rx"] * sums["ry"] / n
+        var_x = sums["rxx"] - sums["rx"] ** 2 / n
+        var_y = sums["ryy"] - sums["ry"] ** 2 / n
+        rho = (cov / np.sqrt(var_x * var_y)).to_numpy()
+        rho = np.clip(rho, -1.0, 1.0)
+        # a t statistic needs at least three pairs
+        dof = np.where(n >= 3, n - 2, np.nan)
+        t = rho * np.sqrt(dof / ((1.0 - rho) * (1.0 + rho)))
+        p = 2 * stats.t.sf(np.abs(t), dof)
+    return _tidy(sums.index, by, "spearman", n, rho, dof, p, rho, "rho")
@@ -0,0 +1,298 @@
+'''
+
+Benchmark harness: how each stage of the analysis scales with data size
+
+For every requested size a synthetic pair of raw exports is generated (see
+synthetic.py), then each stage runs on it on its own and is timed: cleaning the raw
+files, loading the cleaned CSVs, loading through the columnar cache, each statistical
+test, the logit fit, bootstrap intervals and the figures. Libraries are imported
+before the clock starts, so first-use import cost doesn't land on whichever stage
+happens to run first. Peak memory per stage is the tracemalloc high-water mark of
+allocations made during it (NumPy and pandas buffers included); since tracing slows
+Python-level code down, a stage is timed untraced and then rerun under tracemalloc.
+Results go to benchmarks/results/<timestamp>.json with the git revision and library
+versions, and --compare prints per-stage ratios between two result files so a
+regression shows up as a stage getting slower or bigger.
+
+Usage:
+    python benchmarks/run_benchmarks.py                      # 1e3, 1e4, 1e5 rows
+    python benchmarks/run_benchmarks.py --sizes 1e6 1e7 --stages clean load_csv
+    python benchmarks/run_benchmarks.py --compare old.json new.json
+
+'''
+
+
+# Import libraries
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, BENCH_DIR)
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from synthetic import write_synthetic  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+class Workspace:
+    """Paths and lazily loaded frames for one benchmark size."""
+
+    def __init__(self, folder, rows):
+        self.folder = folder
+        self.rows = rows
+        self.raw = {name: os.path.join(folder, f"{name}.csv") for name in ["dataset1", "dataset2"]}
+        self.clean = {name: os.path.join(folder, f"{name}_cleaned.csv") for name in ["dataset1", "dataset2"]}
+        self.frames = {}
+
+    def frame(self, name):
+        if name not in self.frames:
+            from data_access import load_cleaned
+
+            self.frames[name] = load_cleaned(name, self.clean[name])
+        return self.frames[name]
+
+
+# ---------- stages ----------
+# Each takes a Workspace; the ones that read cleaned data rely on "clean" having run.
+
+def stage_generate(ws):
+    for name, path in ws.raw.items():
+        write_synthetic(name, ws.rows, path)
+
+
+def stage_clean(ws):
+    from raw_cleaning import clean_raw
+
+    for name in ws.raw:
+        clean_raw(name, ws.raw[name], ws.clean[name])
+
+
+def stage_load_csv(ws):
+    from data_access import load_cleaned
+
+    for name in ws.clean:
+        load_cleaned(name, ws.clean[name], use_cache=False)
+
+
+def stage_cache_build(ws):
+    from data_access import cache_paths, load_cleaned
+
+    for name, path in ws.clean.items():
+        for cached in cache_paths(path):
+            if os.path.exists(cached):
+                os.remove(cached)
+        load_cleaned(name, path)
+
+
+def stage_load_cached(ws):
+    from data_access import load_cleaned
+
+    for name in ws.clean:
+        load_cleaned(name, ws.clean[name])
+
+
+def stage_chi_square(ws):
+    from analyses import chi_square, risk_reward_crosstab
+
+    chi_square(risk_reward_crosstab(ws.frame("dataset1")))
+
+
+def stage_mann_whitney(ws):
+    from analyses import mann_whitney_by_risk
+
+    mann_whitney_by_risk(ws.frame("dataset1"))
+
+
+def stage_spearman(ws):
+    from analyses import spearman
+
+    d2 = ws.frame("dataset2")
+    spearman(d2["rat_arrival_number"], d2["bat_landing_number"])
+    spearman(d2["rat_minutes"], d2["food_availability"])
+
+
+def stage_batch_tests(ws):
+    from batch_tests import batch_chi_square, batch_spearman
+
+    batch_chi_square(ws.frame("dataset1"), "month", "risk", "reward")
+    batch_spearman(ws.frame("dataset2"), "month", "rat_arrival_number", "bat_landing_number")
+
+
+def stage_logit(ws):
+    from analyses import fit_risk_logit
+
+    fit_risk_logit(ws.frame("dataset1"))
+
+
+def stage_bootstrap(ws):
+    from analyses import effect_size_cis
+
+    effect_size_cis(ws.frame("dataset1"), ws.frame("dataset2"), n_resamples=1000, workers=1)
+
+
+def stage_plots(ws):
+    import figures
+
+    d1, d2 = ws.frame("dataset1"), ws.frame("dataset2")
+    figures.plot_landing_to_food_hist(d1, os.path.join(ws.folder, "hist.png"))
+    figures.plot_seconds_after_rat_by_risk_box(d1, os.path.join(ws.folder, "box.png"))
+    figures.plot_correlation(d2, "rat_arrival_number", "bat_landing_number", 0.0, 1.0,
+                             "Rat arrivals vs Bat landings", "Rat arrivals", "Bat landings",
+                             os.path.join(ws.folder, "corr.png"))
+
+
+STAGES = {
+    "generate": stage_generate,
+    "clean": stage_clean,
+    "load_csv": stage_load_csv,
+    "cache_build": stage_cache_build,
+    "load_cached": stage_load_cached,
+    "chi_square": stage_chi_square,
+    "mann_whitney": stage_mann_whitney,
+    "spearman": stage_spearman,
+    "batch_tests": stage_batch_tests,
+    "logit": stage_logit,
+    "bootstrap": stage_bootstrap,
+    "plots": stage_plots,
+}
+
+# Stages that produce or load the data; the rest get preloaded frames
+DATA_STAGES = {"generate", "clean", "load_csv", "cache_build", "load_cached"}
+
+# Stages that resample every row thousands of times are skipped above this size
+MAX_ROWS = {"bootstrap": 100_000}
+
+
+def warm_imports():
+    """Import everything the stages use so no stage is charged for it."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    import scipy.sparse  # noqa: F401
+    import scipy.stats  # noqa: F401
+
+    import analyses  # noqa: F401
+    import batch_tests  # noqa: F401
+    import data_access  # noqa: F401
+    import figures  # noqa: F401
+    import raw_cleaning  # noqa: F401
+    import resampling  # noqa: F401
+    import risk_model  # noqa: F401
+
+
+def measure(fn, ws, memory=True):
+    """Run one stage; returns seconds and peak traced MB (None when memory is off)."""
+    start = time.perf_counter()
+    fn(ws)
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn(ws)
+            peak = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return {"seconds": round(seconds, 4), "peak_mb": peak}
+
+
+def environment():
+    import numpy
+    import pandas
+    import scipy
+
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "revision": revision,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "scipy": scipy.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run(sizes, stages, data_dir=None, keep_data=False, memory=True):
+    warm_imports()
+    results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(), "runs": []}
+    root = data_dir or tempfile.mkdtemp(prefix="batbench-")
+    try:
+        for rows in sizes:
+            folder = os.path.join(root, f"rows_{rows}")
+            os.makedirs(folder, exist_ok=True)
+            ws = Workspace(folder, rows)
+            # data-producing stages always run so the later ones have input
+            needed = [s for s in STAGES if s in stages or s in ("generate", "clean")]
+            for stage in needed:
+                if rows > MAX_ROWS.get(stage, float("inf")):
+                    continue
+                if stage not in DATA_STAGES:
+                    for name in ws.clean:
+                        ws.frame(name)
+                # generating the input is setup, so it is timed but never traced
+                result = measure(STAGES[stage], ws, memory and stage != "generate")
+                if stage in stages:
+                    results["runs"].append({"rows": rows, "stage": stage, **result})
+                    print(f"{rows:>12,} rows  {stage:<13} {result['seconds']:>9.3f}s  "
+                          f"{result['peak_mb'] if result['peak_mb'] is not None else '-':>9} MB")
+            ws.frames.clear()
+    finally:
+        if not keep_data and data_dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def compare(old_path, new_path, threshold=1.2):
+    """Print new/old time and memory ratios per (rows, stage); flag ones above threshold."""
+    with open(old_path) as f:
+        old = {(r["rows"], r["stage"]): r for r in json.load(f)["runs"]}
+    with open(new_path) as f:
+        new = {(r["rows"], r["stage"]): r for r in json.load(f)["runs"]}
+    print(f"{'rows':>12}  {'stage':<13} {'time x':>8} {'memory x':>9}")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        time_ratio = b["seconds"] / a["seconds"] if a["seconds"] else float("nan")
+        mem_ratio = (b["peak_mb"] / a["peak_mb"]) if a.get("peak_mb") and b.get("peak_mb") else float("nan")
+        flag = "  <-- slower" if time_ratio > threshold else ""
+        flag += "  <-- bigger" if mem_ratio > threshold else ""
+        print(f"{key[0]:>12,}  {key[1]:<13} {time_ratio:>8.2f} {mem_ratio:>9.2f}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and measure each analysis stage on synthetic data.")
+    parser.add_argument("--sizes", nargs="+", type=float, default=DEFAULT_SIZES,
+                        help="rows per dataset, e.g. 1e3 1e6 (up to 1e8)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--data-dir", default=None, help="keep generated data here instead of a temp folder")
+    parser.add_argument("--keep-data", action="store_true", help="don't delete the temp data folder")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, times only)")
+    parser.add_argument("--out", default=None, help="result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    results = run([int(s) for s in args.sizes], args.stages, args.data_dir, args.keep_data, not args.no_memory)
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"Results saved to {out}")
@@ -0,0 +1,125 @@
+'''
+
+Synthetic dataset1/dataset2 exports at any size
+
+Rows are drawn from the real raw files so the joint distribution of habit, risk,
+reward, season, month, seconds_after_rat_arrival, bat_landing_to_food and the
+dataset2 counts is kept, missing habits included. Timestamps are then laid out on a
+synthetic run of nights: dataset1 landings fall at the sampled hours after each
+night's sunset, with the rat visit placed around them, and dataset2 gets one window
+every 30 minutes from half an hour before sunset. Output is the raw export format
+(day-first dates), written in chunks so 10^8 rows never sit in memory at once, and
+each chunk has its own seed so a given size and seed always gives the same file.
+
+'''
+
+
+# Import libraries
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from raw_cleaning import RAW_DATE_FORMAT, RAW_PATHS
+
+CHUNK_ROWS = 1_000_000
+
+# Roughly what the real exports hold per night (866 landings over 60 nights,
+# about 22 dataset2 windows per night)
+LANDINGS_PER_NIGHT = 15
+WINDOWS_PER_NIGHT = 22
+
+FIRST_NIGHT = pd.Timestamp("2017-12-26")
+SUNSET = pd.Timedelta(hours=16, minutes=45)
+
+
+def _templates():
+    """Real raw rows with their dates parsed, as the sampling pool for each dataset."""
+    d1 = pd.read_csv(RAW_PATHS["dataset1"])
+    for col in ["start_time", "rat_period_start", "rat_period_end"]:
+        d1[col] = pd.to_datetime(d1[col], format=RAW_DATE_FORMAT)
+    d1["rat_before"] = (d1["start_time"] - d1["rat_period_start"]).dt.total_seconds()
+    d1["rat_after"] = (d1["rat_period_end"] - d1["start_time"]).dt.total_seconds().clip(lower=0)
+    d2 = pd.read_csv(RAW_PATHS["dataset2"])
+    return d1, d2
+
+
+def _fmt(times):
+    # many rows share a minute, so format each distinct timestamp once
+    values, inverse = np.unique(pd.DatetimeIndex(times).to_numpy(), return_inverse=True)
+    return np.asarray(pd.DatetimeIndex(values).strftime(RAW_DATE_FORMAT), dtype=object)[inverse]
+
+
+def dataset1_chunk(pool, start_row, n, rng):
+    """n synthetic dataset1 rows starting at global row number start_row."""
+    rows = pool.iloc[rng.integers(0, len(pool), n)].reset_index(drop=True)
+    night = (start_row + np.arange(n)) // LANDINGS_PER_NIGHT
+    sunset = FIRST_NIGHT + pd.to_timedelta(night, unit="D") + SUNSET
+    hours = pd.to_numeric(rows["hours_after_sunset"], errors="coerce").fillna(0.0).to_numpy()
+    start = (sunset + pd.to_timedelta(np.round(hours * 60), unit="min")).floor("min")
+    rat_start = (start - pd.to_timedelta(rows["rat_before"].fillna(0).to_numpy(), unit="s")).floor("min")
+    rat_end = (start + pd.to_timedelta(rows["rat_after"].fillna(0).to_numpy(), unit="s")).ceil("min")
+    return pd.DataFrame({
+        "start_time": _fmt(start),
+        "bat_landing_to_food": rows["bat_landing_to_food"],
+        "habit": rows["habit"],
+        "rat_period_start": _fmt(rat_start),
+        "rat_period_end": _fmt(rat_end),
+        "seconds_after_rat_arrival": rows["seconds_after_rat_arrival"],
+        "risk": rows["risk"],
+        "reward": rows["reward"],
+        "month": rows["month"],
+        "sunset_time": _fmt(sunset),
+        "hours_after_sunset": rows["hours_after_sunset"],
+        "season": rows["season"],
+    })
+
+
+def dataset2_chunk(pool, start_row, n, rng):
+    """n synthetic 30-minute dataset2 windows starting at global row number start_row."""
+    rows = pool.iloc[rng.integers(0, len(pool), n)].reset_index(drop=True)
+    row = start_row + np.arange(n)
+    night, slot = row // WINDOWS_PER_NIGHT, row % WINDOWS_PER_NIGHT
+    time = (FIRST_NIGHT + pd.to_timedelta(night, unit="D") + SUNSET
+            + pd.to_timedelta(30 * slot - 30, unit="min"))
+    return pd.DataFrame({
+        "time": _fmt(time),
+        "month": rows["month"],
+        "hours_after_sunset": 0.5 * slot - 0.5,
+        "bat_landing_number": rows["bat_landing_number"],
+        "food_availability": rows["food_availability"],
+        "rat_minutes": rows["rat_minutes"],
+        "rat_arrival_number": rows["rat_arrival_number"],
+    })
+
+
+def write_synthetic(name, rows, path, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write a raw-format synthetic export of `rows` rows to path; returns path."""
+    pools = dict(zip(["dataset1", "dataset2"], _templates()))
+    make = dataset1_chunk if name == "dataset1" else dataset2_chunk
+    n_chunks = max(1, -(-rows // chunk_rows))
+    seeds = np.random.SeedSequence([seed, int(name[-1])]).spawn(n_chunks)
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        for i, chunk_seed in enumerate(seeds):
+            start = i * chunk_rows
+            n = min(chunk_rows, rows - start)
+            make(pools[name], start, n, np.random.default_rng(chunk_seed)).to_csv(f, index=False, header=(i == 0))
+    os.replace(tmp, path)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write synthetic raw exports shaped like dataset1/dataset2.")
+    parser.add_argument("rows", type=float, help="rows per dataset, e.g. 1e6")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for dataset in ["dataset1", "dataset2"]:
+        out = write_synthetic(dataset, int(args.rows), os.path.join(args.out_dir, f"{dataset}.csv"), args.seed)
+        print(f"Wrote {out}")
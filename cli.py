@@ -0,0 +1,195 @@
+'''
+
+One command-line entry point for the analysis
+
+    python cli.py inspect               raw CSV preview, info, missing values (data_inspection.py)
+    python cli.py describe              shapes, risk x reward crosstab, describe() tables
+    python cli.py test                  chi-square, Mann–Whitney, logit and Spearman results
+    python cli.py plot [--sections ...] descriptive and inferential figures
+    python cli.py seasonal              seasonal tests, then the seasonal figures
+    python cli.py profile NAME [--raw]  streaming describe() of a CSV of any size (streaming_summary.py)
+    python cli.py rolling [--width 14D] sliding-window risk rate, median and Spearman (rolling.py)
+    python cli.py results [--field p]   stored test and model results, without recomputing (results_store.py)
+    python cli.py serve [--port 8765]   HTTP service answering queries from warm data (service.py)
+
+Nothing heavy is imported up front: each subcommand imports what it needs when it
+runs, so `describe` loads pandas but never SciPy or matplotlib, and `test` never loads
+matplotlib. After each run a timing line goes to stderr splitting the time spent
+importing modules from the time spent on the work itself.
+
+'''
+
+
+# Import libraries
+import argparse
+import os
+import sys
+import time
+
+_STARTED = time.perf_counter()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _report(args):
+    from report_runner import Report
+
+    return Report(args.out_dir, workers=args.workers, dpi=args.dpi, force=args.force, recompute=args.recompute)
+
+
+def cmd_inspect(args):
+    import runpy
+
+    runpy.run_path(os.path.join(BASE_DIR, "data_inspection.py"), run_name="__main__")
+
+
+def cmd_describe(args):
+    _report(args).print_descriptive()
+
+
+def cmd_test(args):
+    _report(args).print_tests()
+
+
+def cmd_plot(args):
+    _report(args).render(args.sections)
+
+
+def cmd_seasonal(args):
+    report = _report(args)
+    report.print_seasonal()
+    report.render(["seasonal"])
+
+
+def cmd_profile(args):
+    import runpy
+
+    argv = [args.name, "--workers", str(args.workers or os.cpu_count() or 1)]
+    argv += ["--path", args.path] if args.path else []
+    argv += ["--raw"] if args.raw else []
+    sys.argv = [os.path.join(BASE_DIR, "streaming_summary.py")] + argv
+    runpy.run_path(sys.argv[0], run_name="__main__")
+
+
+def cmd_rolling(args):
+    import pandas as pd
+
+    from data_access import load_datasets
+    from rolling import rolling_summary
+
+    summary = rolling_summary(*load_datasets(), args.width, args.step)
+    with pd.option_context("display.width", 160, "display.max_rows", None):
+        print(summary.to_string(index=False, float_format="%.3f"))
+
+
+def cmd_results(args):
+    import runpy
+
+    argv = []
+    for flag in ["analysis", "subset", "field", "version"]:
+        if getattr(args, flag) is not None:
+            argv += [f"--{flag}", getattr(args, flag)]
+    argv += ["--all-versions"] if args.all_versions else []
+    sys.argv = [os.path.join(BASE_DIR, "results_store.py")] + argv
+    runpy.run_path(sys.argv[0], run_name="__main__")
+
+
+def cmd_serve(args):
+    import asyncio
+
+    from service import serve
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.cache_size, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bat/rat analysis: pick one part of the report to run.")
+    parser.add_argument("--out-dir", default=BASE_DIR, help="root folder for figure output")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for figures and resampling (default: one per core, 1 = no pool)")
+    parser.add_argument("--dpi", type=int, default=None, help="dpi for the seasonal figures (default 300)")
+    parser.add_argument("--force", action="store_true", help="redraw every figure, ignoring the figure cache")
+    parser.add_argument("--recompute", action="store_true",
+                        help="recompute test and model results instead of reading the results store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("inspect", help="preview and check the raw CSVs").set_defaults(func=cmd_inspect)
+    sub.add_parser("describe", help="descriptive summaries of the cleaned data").set_defaults(func=cmd_describe)
+    sub.add_parser("test", help="inferential tests").set_defaults(func=cmd_test)
+    plot = sub.add_parser("plot", help="descriptive and inferential figures")
+    plot.add_argument("--sections", nargs="+", choices=["descriptive", "plots"], default=["descriptive", "plots"])
+    plot.set_defaults(func=cmd_plot)
+    sub.add_parser("seasonal", help="seasonal tests and figures").set_defaults(func=cmd_seasonal)
+    profile = sub.add_parser("profile", help="one-pass summary of a CSV too large to load")
+    profile.add_argument("name", choices=["dataset1", "dataset2"])
+    profile.add_argument("--path", default=None, help="CSV to read (default: the cleaned dataset)")
+    profile.add_argument("--raw", action="store_true", help="the file is a raw export")
+    profile.set_defaults(func=cmd_profile)
+    rolling = sub.add_parser("rolling", help="statistics over sliding windows of the timeline")
+    rolling.add_argument("--width", default="14D", help="window length (default 14D)")
+    rolling.add_argument("--step", default="1D", help="distance between window starts (default 1D)")
+    rolling.set_defaults(func=cmd_rolling)
+    results = sub.add_parser("results", help="query stored test and model results")
+    results.add_argument("--analysis", default=None, help="e.g. chi_square, mann_whitney, spearman, odds_ratios")
+    results.add_argument("--subset", default=None, help='e.g. all or "season=winter"')
+    results.add_argument("--field", default=None, help="e.g. p, chi2, cramers_v, OR[season]")
+    results.add_argument("--version", default=None, help="dataset SHA-256 (or a prefix of it)")
+    results.add_argument("--all-versions", action="store_true", help="include older dataset and code versions")
+    results.set_defaults(func=cmd_results)
+    serve = sub.add_parser("serve", help="answer analysis queries over HTTP from warm in-memory data")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--cache-size", type=int, default=1024, help="results kept in the LRU")
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+class _ImportTimer:
+    """Wraps builtins.__import__ to add up the wall time spent importing (outermost calls only)."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.depth = 0
+        self._import = None
+
+    def __enter__(self):
+        import builtins
+
+        self._import = builtins.__import__
+
+        def timed_import(*args, **kwargs):
+            if self.depth:
+                return self._import(*args, **kwargs)
+            self.depth += 1
+            start = time.perf_counter()
+            try:
+                return self._import(*args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - start
+                self.depth -= 1
+
+        builtins.__import__ = timed_import
+        return self
+
+    def __exit__(self, *exc):
+        import builtins
+
+        builtins.__import__ = self._import
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    startup = time.perf_counter() - _STARTED
+    modules_before = len(sys.modules)
+    start = time.perf_counter()
+    with _ImportTimer() as imports:
+        args.func(args)
+    total = time.perf_counter() - start
+    print(f"[cli] {args.command}: startup {startup:.2f}s, imports {imports.seconds:.2f}s "
+          f"({len(sys.modules) - modules_before} modules), work {total - imports.seconds:.2f}s, "
+          f"total {time.perf_counter() - _STARTED:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+'''
+
+Memory-mapped NumPy copies of the numeric columns of the cleaned datasets
+
+build_columns() writes every numeric column of a cleaned dataset (the compact dtypes of
+data_access.COMPACT_DTYPES) to dataset_cleaned/columns/<name>/<column>.npy, next to a
+small schema.json header holding the row count, each column's dtype and file, and the
+size/mtime/SHA-256 of the CSV it came from.
+
+open_columns() maps those files read-only with np.load(mmap_mode="r"). Opening them
+needs only NumPy, not pandas, and every process that maps the same file shares its
+pages through the OS page cache, so workers get the arrays without a copy each. The
+copy is rebuilt (which does import pandas) when the CSV has changed.
+
+'''
+
+
+# Import libraries
+import json
+import os
+
+import numpy as np
+
+# Same layout as raw_cleaning.py, spelled out here because importing it would load pandas
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COLUMN_DIR = os.path.join(BASE_DIR, "dataset_cleaned", "columns")
+SCHEMA_NAME = "schema.json"
+STORE_VERSION = 1
+
+
+def store_dir(name):
+    return os.path.join(COLUMN_DIR, name)
+
+
+def _csv_path(name):
+    return os.path.join(BASE_DIR, "dataset_cleaned", f"{name}_cleaned.csv")
+
+
+def build_columns(name, csv_path=None):
+    """Write the numeric columns of a cleaned dataset as .npy files plus schema.json."""
+    from data_access import COMPACT_DTYPES, file_sha256, load_cleaned
+
+    csv_path = csv_path or _csv_path(name)
+    df = load_cleaned(name, csv_path)
+    folder = store_dir(name)
+    os.makedirs(folder, exist_ok=True)
+    columns = {}
+    for col in COMPACT_DTYPES[name]:
+        values = np.ascontiguousarray(df[col].to_numpy())
+        path = os.path.join(folder, col + ".npy")
+        np.save(path + ".tmp.npy", values)
+        os.replace(path + ".tmp.npy", path)
+        columns[col] = {"dtype": values.dtype.str, "file": col + ".npy"}
+    stat = os.stat(csv_path)
+    schema = {"version": STORE_VERSION, "rows": len(df), "columns": columns,
+              "source": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_sha256(csv_path)}}
+    with open(os.path.join(folder, SCHEMA_NAME + ".tmp"), "w") as f:
+        json.dump(schema, f, indent=1)
+    os.replace(os.path.join(folder, SCHEMA_NAME + ".tmp"), os.path.join(folder, SCHEMA_NAME))
+    return schema
+
+
+def _read_schema(name):
+    try:
+        with open(os.path.join(store_dir(name), SCHEMA_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_columns(name, csv_path=None):
+    """Schema of an up-to-date column store, rebuilding it if the CSV changed."""
+    csv_path = csv_path or _csv_path(name)
+    schema = _read_schema(name)
+    stat = os.stat(csv_path)
+    if schema is not None and schema["version"] == STORE_VERSION:
+        source = schema["source"]
+        if source["size"] == stat.st_size and source["mtime_ns"] == stat.st_mtime_ns:
+            return schema
+        from data_access import file_sha256
+
+        if source["size"] == stat.st_size and source["sha256"] == file_sha256(csv_path):
+            return schema
+    return build_columns(name, csv_path)
+
+
+def open_columns(name, columns=None):
+    """Read-only memory maps of the requested numeric columns (all when None), keyed by name."""
+    schema = ensure_columns(name)
+    columns = list(schema["columns"]) if columns is None else list(columns)
+    arrays = {}
+    for col in columns:
+        entry = schema["columns"].get(col)
+        if entry is None:
+            raise KeyError(f"{col!r} is not a stored numeric column of {name}")
+        arrays[col] = np.load(os.path.join(store_dir(name), entry["file"]), mmap_mode="r")
+        if arrays[col].dtype.str != entry["dtype"] or len(arrays[col]) != schema["rows"]:
+            raise ValueError(f"{entry['file']} does not match {SCHEMA_NAME}; delete {store_dir(name)} to rebuild")
+    return arrays
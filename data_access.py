@@ -0,0 +1,214 @@
+'''
+
+Shared loader for the cleaned datasets
+
+Every analysis script reads dataset_cleaned/*.csv through load_cleaned() instead of
+calling pd.read_csv itself. The first load parses the CSV (dates and all) and saves
+a typed columnar copy next to it: Parquet when pyarrow is installed, otherwise a
+pandas pickle. Later loads read that copy directly. The copy is rebuilt only when
+the CSV changes: a matching size and mtime is trusted, and if those moved we compare
+the SHA-256 of the file before deciding.
+
+Frames come back with compact dtypes (int8/int16/int32 counts and flags, float32
+measures, categorical labels) and load_dataset() memoizes them, so one process keeps
+a single copy of each dataset however many analyses use it. Treat the returned frames
+as read-only: derive new columns with .assign() rather than writing into them.
+
+'''
+
+
+# Import libraries
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+from raw_cleaning import CLEAN_PATHS, SCHEMAS
+
+# Bump when the cached layout changes so old copies are rebuilt
+CACHE_VERSION = 2
+
+# Columns stored as categoricals in the cached copy
+CATEGORICAL_COLUMNS = ["risk", "reward", "season", "habit", "site"]
+
+# Smallest dtype that holds each numeric column (categoricals above are separate)
+COMPACT_DTYPES = {
+    "dataset1": {
+        "bat_landing_to_food": "float32",
+        "seconds_after_rat_arrival": "int32",
+        "month": "int8",
+        "hours_after_sunset": "float32",
+    },
+    "dataset2": {
+        "month": "int8",
+        "hours_after_sunset": "float32",
+        "bat_landing_number": "int16",
+        "food_availability": "float32",
+        "rat_minutes": "float32",
+        "rat_arrival_number": "int16",
+    },
+}
+
+# Season names. dataset1 codes them directly (0 = winter, 1 = spring); dataset2 only
+# has a month number, so it goes through a month -> season lookup table.
+# Categories are kept in alphabetical order so model reference levels match plain strings.
+SEASON_CATEGORIES = ["spring", "winter"]
+SEASON_CODE_NAMES = {0: "winter", 1: "spring"}
+SEASON_MONTHS = {"winter": [5, 6, 7], "spring": [8, 9, 10]}
+
+_MONTH_TO_SEASON_CODE = np.full(12, -1, dtype=np.int8)
+for _season, _months in SEASON_MONTHS.items():
+    _MONTH_TO_SEASON_CODE[_months] = SEASON_CATEGORIES.index(_season)
+
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = "parquet"
+except ImportError:
+    CACHE_FORMAT = "pickle"
+
+
+def cache_paths(csv_path):
+    """Return (data_path, meta_path) of the columnar copy that sits next to csv_path."""
+    stem = os.path.splitext(csv_path)[0]
+    ext = ".parquet" if CACHE_FORMAT == "parquet" else ".pkl"
+    return stem + ext, stem + ".cache.json"
+
+
+def file_sha256(path, block_size=1 << 20):
+    """SHA-256 of a file, read in blocks so large exports don't need to fit in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def apply_categories(df):
+    """Cast the categorical columns in place (no-op for ones that already are)."""
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and df[col].dtype.name != "category":
+            df[col] = df[col].astype("category")
+    return df
+
+
+def read_cleaned_csv(csv_path, name):
+    """Parse a cleaned CSV with explicit dtypes and apply the categorical columns."""
+    schema = SCHEMAS[name]
+    df = pd.read_csv(
+        csv_path,
+        # site labels stay text even when they look like numbers (multi-site files, ingestion.py)
+        dtype={**COMPACT_DTYPES[name], "site": str},
+        parse_dates=schema["dates"],
+        date_format="%Y-%m-%d %H:%M:%S",
+    )
+    return apply_categories(df)
+
+
+def season_from_month(month):
+    """Season names for an array of month numbers, as a categorical (NaN outside the table)."""
+    month = np.asarray(month, dtype=np.int64)
+    codes = np.full(month.shape, -1, dtype=np.int8)
+    known = (month >= 0) & (month < len(_MONTH_TO_SEASON_CODE))
+    codes[known] = _MONTH_TO_SEASON_CODE[month[known]]
+    return pd.Categorical.from_codes(codes, categories=SEASON_CATEGORIES)
+
+
+def season_names(season):
+    """Season names for dataset1's 0/1 season codes, as a categorical."""
+    lookup = np.full(len(SEASON_CODE_NAMES), -1, dtype=np.int8)
+    for code, label in SEASON_CODE_NAMES.items():
+        lookup[code] = SEASON_CATEGORIES.index(label)
+    return pd.Categorical.from_codes(lookup[np.asarray(season, dtype=np.int64)], categories=SEASON_CATEGORIES)
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_is_fresh(csv_path, data_path, meta_path, stat):
+    meta = _read_meta(meta_path)
+    if meta is None or meta.get("version") != CACHE_VERSION or meta.get("format") != CACHE_FORMAT:
+        return False
+    if not os.path.exists(data_path):
+        return False
+    if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    # The file was touched; only rebuild if its contents actually changed
+    if meta["size"] == stat.st_size and meta["sha256"] == file_sha256(csv_path):
+        meta["mtime_ns"] = stat.st_mtime_ns
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        return True
+    return False
+
+
+def _write_cache(df, csv_path, data_path, meta_path, stat):
+    tmp = data_path + ".tmp"
+    if CACHE_FORMAT == "parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, data_path)
+    meta = {
+        "version": CACHE_VERSION,
+        "format": CACHE_FORMAT,
+        "source": os.path.basename(csv_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_sha256(csv_path),
+    }
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+
+@traced("load")
+def load_cleaned(name, csv_path=None, use_cache=True):
+    """Load a cleaned dataset ("dataset1" or "dataset2") as a typed DataFrame."""
+    csv_path = csv_path or CLEAN_PATHS[name]
+    if not use_cache:
+        return read_cleaned_csv(csv_path, name)
+
+    data_path, meta_path = cache_paths(csv_path)
+    stat = os.stat(csv_path)
+    if _cache_is_fresh(csv_path, data_path, meta_path, stat):
+        if CACHE_FORMAT == "parquet":
+            # Parquet keeps string categories but hands integer ones back as plain ints
+            return apply_categories(pd.read_parquet(data_path))
+        return pd.read_pickle(data_path)
+
+    df = read_cleaned_csv(csv_path, name)
+    try:
+        _write_cache(df, csv_path, data_path, meta_path, stat)
+    except OSError as e:
+        # A read-only checkout should still be able to run the analysis
+        print(f"Could not write cache for {csv_path}: {e}")
+    return df
+
+
+def dataset_version(name, csv_path=None):
+    """sha256 of a cleaned CSV, read from the cache metadata while the file is untouched."""
+    csv_path = csv_path or CLEAN_PATHS[name]
+    stat = os.stat(csv_path)
+    meta = _read_meta(cache_paths(csv_path)[1])
+    if meta is not None and meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        return meta["sha256"]
+    return file_sha256(csv_path)
+
+
+@lru_cache(maxsize=None)
+def load_dataset(name):
+    """Memoized load_cleaned(name): every caller in the process shares one frame."""
+    return load_cleaned(name)
+
+
+def load_datasets():
+    """Return the shared (dataset1, dataset2) frames."""
+    return load_dataset("dataset1"), load_dataset("dataset2")
@@ -19,13 +19,16 @@ The purpose is to understand the structure of the data before we do any cleaning
 # Import libraries
 import pandas as pd
 
+from raw_cleaning import RAW_PATHS
+from validation import validate_csv
+
 print("Checking datasets...")
 
 # Load the datasets
 # dataset1.csv: Bat landings (individual events)
 # dataset2.csv: 30-min observation periods
-dataset1 = pd.read_csv("dataset1.csv")
-dataset2 = pd.read_csv("dataset2.csv")
+dataset1 = pd.read_csv(RAW_PATHS["dataset1"])
+dataset2 = pd.read_csv(RAW_PATHS["dataset2"])
 print("Datasets loaded successfully.\n")
 
 # Show first few rows for quick preview instead of whole dataset
@@ -50,4 +53,12 @@ print("Step 4: Summary statistics")
 print("Dataset 1:\n", dataset1.describe(include='all'), "\n")
 print("Dataset 2:\n", dataset2.describe(include='all'), "\n")
 
+# Declared data-quality rules (allowed values, ranges, time order), see validation.py
+print("Step 5: Data-quality rules")
+for name in ["dataset1", "dataset2"]:
+    report = validate_csv(name)
+    table = report.table()
+    print(f"{name}: {report.errors()} error-level violations")
+    print(table.to_string() if len(table) else "No violations.", "\n")
+
 print("Data inspection complete.")
\ No newline at end of file
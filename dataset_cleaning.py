@@ -18,18 +18,15 @@ The aim is to understand the data visually before we run the formal statistical
 # Import libraries
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
+
+from analyses import risk_reward_crosstab
+from data_access import load_datasets
+from raw_cleaning import BASE_DIR
+import figures
 
 # 1) Load the cleaned datasets
 print("Step 1: Loading cleaned datasets...")
-d1 = pd.read_csv(
-    "dataset_cleaned/dataset1_cleaned.csv",
-    parse_dates=["start_time", "rat_period_start", "rat_period_end", "sunset_time"]
-)
-d2 = pd.read_csv(
-    "dataset_cleaned/dataset2_cleaned.csv",
-    parse_dates=["time"]
-)
+d1, d2 = load_datasets()
 print("Loaded cleaned datasets.\n")
 
 # 2) Quick shapes to confirm we loaded what we expect
@@ -37,12 +34,9 @@ print("Step 2: Basic shapes")
 print(f"dataset1_cleaned shape: {d1.shape}")
 print(f"dataset2_cleaned shape: {d2.shape}\n")
 
-# 3) Ensure categorical types for key columns in dataset1
-print("Step 3: Ensure categorical types for key columns")
-for col in ["risk", "reward", "season"]:
-    if col in d1.columns and d1[col].dtype != "category":
-        d1[col] = d1[col].astype("category")
-print("Categorical types set where applicable.\n")
+# 3) Key columns in dataset1 arrive as categories from the shared loader
+print("Step 3: Check categorical types for key columns")
+print(d1[["risk", "reward", "season", "habit"]].dtypes, "\n")
 
 # 4) Summary tables for dataset1 (behavioural variables)
 print("Step 4: Summary tables (dataset1)")
@@ -53,7 +47,7 @@ print("Value counts: reward")
 print(d1["reward"].value_counts(dropna=False), "\n")
 
 print("Crosstab: risk vs reward")
-print(pd.crosstab(d1["risk"], d1["reward"]), "\n")
+print(risk_reward_crosstab(d1), "\n")
 
 print("Descriptive stats: bat_landing_to_food (seconds)")
 print(d1["bat_landing_to_food"].describe(), "\n")
@@ -74,7 +68,7 @@ print(d2["food_availability"].describe(), "\n")
 
 # 6) Prepare plots directory
 print("Step 6: Create plots directory if missing")
-PLOTS_DIR = "plots"
+PLOTS_DIR = os.path.join(BASE_DIR, "plots")
 os.makedirs(PLOTS_DIR, exist_ok=True)
 print(f"Plots will be saved to: {PLOTS_DIR}\n")
 
@@ -82,36 +76,14 @@ print(f"Plots will be saved to: {PLOTS_DIR}\n")
 print("Step 7: Plots for dataset1")
 
 # 7.1 Histogram: time from landing to approaching food
-plt.figure()
-d1["bat_landing_to_food"].plot(kind="hist", bins=40)
-plt.title("Distribution of time from landing to food (dataset1)")
-plt.xlabel("Seconds from landing to approaching food")
-plt.ylabel("Count")
-plt.tight_layout()
-plt.savefig(os.path.join(PLOTS_DIR, "d1_bat_landing_to_food_hist.png"))
-plt.close()
+figures.plot_landing_to_food_hist(d1, os.path.join(PLOTS_DIR, "d1_bat_landing_to_food_hist.png"))
 
 # 7.2 Bar plot: Risk vs Reward counts
-ct = pd.crosstab(d1["risk"], d1["reward"])
-plt.figure()
-ct.plot(kind="bar")
-plt.title("Risk vs Reward counts (dataset1)")
-plt.xlabel("Risk (0=avoid, 1=take)")
-plt.ylabel("Count")
-plt.tight_layout()
-plt.savefig(os.path.join(PLOTS_DIR, "d1_risk_vs_reward_bar.png"))
-plt.close()
+ct = risk_reward_crosstab(d1)
+figures.plot_risk_reward_bar(ct, os.path.join(PLOTS_DIR, "d1_risk_vs_reward_bar.png"))
 
 # 7.3 Boxplot: seconds after rat arrival grouped by risk
-plt.figure()
-d1.boxplot(column="seconds_after_rat_arrival", by="risk")
-plt.title("Seconds after rat arrival by risk (dataset1)")
-plt.suptitle("")  # remove automatic super title
-plt.xlabel("Risk (0=avoid, 1=take)")
-plt.ylabel("Seconds after rat arrival")
-plt.tight_layout()
-plt.savefig(os.path.join(PLOTS_DIR, "d1_seconds_after_rat_arrival_by_risk_box.png"))
-plt.close()
+figures.plot_seconds_after_rat_by_risk_box(d1, os.path.join(PLOTS_DIR, "d1_seconds_after_rat_arrival_by_risk_box.png"))
 
 print("Saved dataset1 plots.\n")
 
@@ -119,34 +91,25 @@ print("Saved dataset1 plots.\n")
 print("Step 8: Plots for dataset2")
 
 # 8.1 Scatter: rat_arrival_number vs bat_landing_number
-plt.figure()
-plt.scatter(d2["rat_arrival_number"], d2["bat_landing_number"])
-plt.title("Rat arrivals vs Bat landings (dataset2)")
-plt.xlabel("Rat arrival number (per 30 min)")
-plt.ylabel("Bat landing number (per 30 min)")
-plt.tight_layout()
-plt.savefig(os.path.join(PLOTS_DIR, "d2_rat_arrivals_vs_bat_landings_scatter.png"))
-plt.close()
+figures.plot_scatter(
+    d2, "rat_arrival_number", "bat_landing_number",
+    "Rat arrivals vs Bat landings (dataset2)", "Rat arrival number (per 30 min)", "Bat landing number (per 30 min)",
+    os.path.join(PLOTS_DIR, "d2_rat_arrivals_vs_bat_landings_scatter.png"),
+)
 
 # 8.2 Scatter: rat_minutes vs bat_landing_number
-plt.figure()
-plt.scatter(d2["rat_minutes"], d2["bat_landing_number"])
-plt.title("Rat minutes vs Bat landings (dataset2)")
-plt.xlabel("Rat minutes (per 30 min)")
-plt.ylabel("Bat landing number (per 30 min)")
-plt.tight_layout()
-plt.savefig(os.path.join(PLOTS_DIR, "d2_rat_minutes_vs_bat_landings_scatter.png"))
-plt.close()
+figures.plot_scatter(
+    d2, "rat_minutes", "bat_landing_number",
+    "Rat minutes vs Bat landings (dataset2)", "Rat minutes (per 30 min)", "Bat landing number (per 30 min)",
+    os.path.join(PLOTS_DIR, "d2_rat_minutes_vs_bat_landings_scatter.png"),
+)
 
 # 8.3 Scatter: rat_minutes vs food_availability
-plt.figure()
-plt.scatter(d2["rat_minutes"], d2["food_availability"])
-plt.title("Rat minutes vs Food availability (dataset2)")
-plt.xlabel("Rat minutes (per 30 min)")
-plt.ylabel("Food availability")
-plt.tight_layout()
-plt.savefig(os.path.join(PLOTS_DIR, "d2_rat_minutes_vs_food_scatter.png"))
-plt.close()
+figures.plot_scatter(
+    d2, "rat_minutes", "food_availability",
+    "Rat minutes vs Food availability (dataset2)", "Rat minutes (per 30 min)", "Food availability",
+    os.path.join(PLOTS_DIR, "d2_rat_minutes_vs_food_scatter.png"),
+)
 
 print("Saved dataset2 plots.\n")
 
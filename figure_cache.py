@@ -0,0 +1,156 @@
+'''
+
+Content-addressed cache for rendered figures
+
+Every RenderJob gets a key: a SHA-256 over the data slice it draws (its columns after
+the row filter), its extra arguments, its style keyword arguments, its builder's name
+and the source of the whole figures.py module, so an edit to a shared helper or
+constant (_hexbin, SCATTER_MAX_POINTS, ...) counts as a code change too. Each output
+folder keeps a manifest (.figure_manifest.json) mapping file name -> key. A job whose
+key matches the manifest and whose PNG still exists is skipped. PNGs that the manifest
+lists but no current job produces are stale and get deleted.
+
+render_cached() is the entry point for scripts: it draws only the out-of-date jobs
+through render_pool.render_jobs() and keeps the manifests in step.
+
+'''
+
+
+# Import libraries
+import hashlib
+import inspect
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_NAME = ".figure_manifest.json"
+
+
+def _update(h, obj):
+    """Feed a stable representation of obj into hash h."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        # row hashes cover values and index labels; column names and dtypes are added separately
+        h.update(repr(obj.dtypes.to_dict() if isinstance(obj, pd.DataFrame) else (obj.name, obj.dtype)).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(obj.dtype.str.encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=repr):
+            h.update(repr(key).encode())
+            _update(h, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for item in obj:
+            _update(h, item)
+    elif isinstance(obj, np.generic):
+        # a NumPy scalar and the same Python number draw the same figure
+        h.update(repr(obj.item()).encode())
+    else:
+        h.update(repr(obj).encode())
+
+
+@lru_cache(maxsize=None)
+def _figures_source():
+    import figures
+
+    return inspect.getsource(figures)
+
+
+def job_key(job, frame):
+    """Hash of everything that decides what a job's PNG looks like."""
+    h = hashlib.sha256()
+    h.update(_figures_source().encode())
+    h.update(job.builder.encode())
+    if job.frame is not None:
+        data = frame
+        if job.where is not None:
+            col, value = job.where
+            data = data[data[col] == value]
+        _update(h, data[list(job.columns)])
+    _update(h, job.args)
+    _update(h, job.kwargs)
+    return h.hexdigest()
+
+
+def _load_manifest(folder):
+    try:
+        with open(os.path.join(folder, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(folder, manifest):
+    path = os.path.join(folder, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+class FigureCache:
+    """Decides which jobs need drawing and keeps the per-folder manifests in step."""
+
+    def __init__(self, jobs, frames, force=False):
+        self.keys = {job.path: job_key(job, frames.get(job.frame)) for job in jobs}
+        self.folders = {os.path.dirname(path) for path in self.keys}
+        self.manifests = {folder: _load_manifest(folder) for folder in self.folders}
+        self.force = force
+
+    def is_fresh(self, path):
+        folder, name = os.path.split(path)
+        return (not self.force
+                and self.manifests[folder].get(name) == self.keys[path]
+                and os.path.exists(path))
+
+    def stale_paths(self):
+        """Files listed in a manifest that no current job produces."""
+        current = set(self.keys)
+        return [os.path.join(folder, name)
+                for folder, manifest in self.manifests.items()
+                for name in manifest
+                if os.path.join(folder, name) not in current]
+
+    def record(self, path):
+        folder, name = os.path.split(path)
+        self.manifests[folder][name] = self.keys[path]
+
+    def save(self):
+        """Drop stale outputs and write every manifest back."""
+        removed = []
+        for path in self.stale_paths():
+            if os.path.exists(path):
+                os.remove(path)
+                removed.append(path)
+            folder, name = os.path.split(path)
+            del self.manifests[folder][name]
+        for folder, manifest in self.manifests.items():
+            _save_manifest(folder, manifest)
+        return removed
+
+
+def render_cached(jobs, frames, force=False, workers=None, root=None):
+    """Draw the jobs whose figures are out of date and update the manifests.
+
+    Progress is printed with paths relative to `root` (as given when None).
+    """
+    from render_pool import render_jobs
+
+    def shown(path):
+        return path if root is None else os.path.relpath(path, root)
+
+    jobs = list(jobs)
+    cache = FigureCache(jobs, frames, force=force)
+    todo = [job for job in jobs if not cache.is_fresh(job.path)]
+    if len(todo) < len(jobs):
+        print(f"{len(jobs) - len(todo)} of {len(jobs)} figures unchanged, skipping them")
+    try:
+        for path in render_jobs(todo, frames, workers=workers):
+            cache.record(path)
+            print(f"Saved: {shown(path)}")
+    finally:
+        for path in cache.save():
+            print(f"Removed stale figure: {shown(path)}")
@@ -0,0 +1,256 @@
+'''
+
+Figure builders shared by the plotting scripts and the report runner
+
+Each builder draws one figure from data it is handed (a frame slice, or a small
+table or summary from analyses.py), saves it to `path` and closes it. Nothing here
+loads data or runs a test of its own, so the runner can compute every input once and
+hand the builders to render_pool.py to draw in parallel. Figures are always drawn on
+the non-interactive Agg backend. Scatter builders handed more than SCATTER_MAX_POINTS
+rows draw a hexbin and fit their trend line from sums, so large inputs still render
+quickly into a small PNG.
+
+'''
+
+
+# Import libraries
+import os
+
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from instrumentation import stage
+
+
+# Above this many points the scatter builders draw a hexbin density instead of markers
+SCATTER_MAX_POINTS = 50_000
+HEXBIN_GRIDSIZE = 60
+
+
+def _save(path, **kwargs):
+    with stage("savefig", path=os.path.basename(path)):
+        plt.tight_layout()
+        plt.savefig(path, **kwargs)
+        plt.close()
+
+
+def _hexbin(x, y):
+    """Log-scaled hexbin of x vs y; render time and file size don't grow with the row count."""
+    plt.hexbin(x, y, gridsize=HEXBIN_GRIDSIZE, bins="log", mincnt=1, cmap="Blues")
+    plt.colorbar(label="Points per bin (log scale)")
+
+
+def _linear_fit(x, y):
+    """Least-squares line from sums (n, means, Sxx, Sxy), plus the half-width of its 95% band.
+
+    Same line as np.polyfit(x, y, 1) but one pass over the data and no bootstrap, so
+    large inputs can get the trend line regplot would draw.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    mx, my = x.mean(), y.mean()
+    sxx = np.dot(x - mx, x - mx)
+    slope = np.dot(x - mx, y - my) / sxx
+    intercept = my - slope * mx
+    resid = (y - my) - slope * (x - mx)
+    s = np.sqrt(np.dot(resid, resid) / (n - 2))
+
+    def band(xx):
+        return 1.96 * s * np.sqrt(1 / n + (xx - mx) ** 2 / sxx)
+
+    return slope, intercept, band
+
+
+# =============== Descriptive plots (dataset_cleaning.py) ===============
+
+def plot_landing_to_food_hist(d1, path):
+    plt.figure()
+    d1["bat_landing_to_food"].plot(kind="hist", bins=40)
+    plt.title("Distribution of time from landing to food (dataset1)")
+    plt.xlabel("Seconds from landing to approaching food")
+    plt.ylabel("Count")
+    _save(path)
+
+
+def plot_risk_reward_bar(ct, path):
+    ct.plot(kind="bar")
+    plt.title("Risk vs Reward counts (dataset1)")
+    plt.xlabel("Risk (0=avoid, 1=take)")
+    plt.ylabel("Count")
+    _save(path)
+
+
+def plot_seconds_after_rat_by_risk_box(d1, path):
+    d1.boxplot(column="seconds_after_rat_arrival", by="risk")
+    plt.title("Seconds after rat arrival by risk (dataset1)")
+    plt.suptitle("")  # remove automatic super title
+    plt.xlabel("Risk (0=avoid, 1=take)")
+    plt.ylabel("Seconds after rat arrival")
+    _save(path)
+
+
+def plot_scatter(df, x, y, title, xlabel, ylabel, path):
+    plt.figure()
+    if len(df) > SCATTER_MAX_POINTS:
+        _hexbin(df[x], df[y])
+    else:
+        plt.scatter(df[x], df[y])
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    _save(path)
+
+
+# =============== Inferential plots (inferential_plots.py) ===============
+
+def plot_chi_counts(ct, path):
+    ct.plot(kind="bar")
+    plt.title("Risk × Reward (counts)")
+    plt.xlabel("Risk (0=avoid, 1=take)")
+    plt.ylabel("Count")
+    _save(path)
+
+
+def plot_chi_percent_stacked(ct, path):
+    ct_pct = ct.div(ct.sum(axis=1), axis=0) * 100
+    ct_pct.plot(kind="bar", stacked=True)
+    plt.title("Risk × Reward (% within risk group)")
+    plt.xlabel("Risk (0=avoid, 1=take)")
+    plt.ylabel("Percent")
+    plt.legend(title="Reward (0/1)", loc="best")
+    _save(path)
+
+
+def plot_mannwhitney_box(d1, mw, path, value="bat_landing_to_food"):
+    """Boxplot of `value` by risk group, annotated with a Mann–Whitney result (p, rank_biserial)."""
+    x = d1.loc[d1["risk"] == 0, value]
+    y = d1.loc[d1["risk"] == 1, value]
+    plt.figure()
+    plt.boxplot([x, y], tick_labels=["risk=0", "risk=1"], showfliers=False)
+    plt.title("Landing→Food time by risk (boxplot, outliers hidden)")
+    plt.xlabel("Risk group")
+    plt.ylabel("Seconds from landing to approaching food")
+    # annotate p-value and effect size
+    txt = (f"Mann–Whitney U p={mw['p']:.2e}, rank-biserial={mw['rank_biserial']:.3f}\n"
+           f"Means: 0→{x.mean():.2f}s, 1→{y.mean():.2f}s")
+    plt.gcf().text(0.5, -0.12, txt, ha="center", fontsize=9)
+    _save(path, bbox_inches="tight")
+
+
+def plot_logit_forest(or_df, path):
+    """Forest plot of an odds-ratio table (analyses.odds_ratio_table), intercept dropped."""
+    or_plot = or_df[or_df.index != "Intercept"]
+    plt.figure()
+    ypos = np.arange(len(or_plot))
+    plt.errorbar(or_plot["OR"], ypos,
+                 xerr=[or_plot["OR"] - or_plot["CI_lower"], or_plot["CI_upper"] - or_plot["OR"]],
+                 fmt='o', capsize=4)
+    plt.axvline(1.0, linestyle="--")
+    plt.yticks(ypos, or_plot.index)
+    plt.xlabel("Odds ratio (logit)")
+    plt.title("Logistic regression ORs with 95% CI\n(Outcome: risk=1; Predictor per +1 minute since rat arrival)")
+    _save(path)
+
+
+def plot_logit_pred_prob(curves, path):
+    """Predicted P(risk=1) curves from analyses.risk_prediction_curves()."""
+    plt.figure()
+    for col in curves.columns.drop("sec_minutes"):
+        plt.plot(curves["sec_minutes"], curves[col], label=col)
+    plt.xlabel("Minutes since rat arrival")
+    plt.ylabel("Predicted probability of risk=1")
+    plt.title("Predicted risk-taking vs time since rat arrival by season")
+    plt.legend()
+    _save(path)
+
+
+def plot_correlation(df, x, y, rho, p, title, xlabel, ylabel, path):
+    """Scatter of df[x] vs df[y] (a DataFrame or a dict of arrays) with a least-squares trend line;
+    the Spearman result goes in the title. Large inputs are drawn as a hexbin."""
+    x = np.asarray(df[x])
+    y = np.asarray(df[y])
+    plt.figure()
+    if len(x) > SCATTER_MAX_POINTS:
+        m, b, _ = _linear_fit(x, y)
+        _hexbin(x, y)
+    else:
+        m, b = np.polyfit(x, y, 1)
+        plt.scatter(x, y, alpha=0.35)
+    xx = np.linspace(x.min(), x.max(), 100)
+    plt.plot(xx, m * xx + b)
+    plt.title(f"{title} (Spearman ρ={rho:.3f}, p={p:.2e})")
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    _save(path)
+
+
+# =============== Seasonal plots (seasonal_analysis/seasonal_plots.py) ===============
+
+def plot_risk_by_season(d1, path, dpi=300):
+    """Stacked risk counts per season; expects season names (data_access.season_names)."""
+    risk_counts = d1.groupby(['season', 'risk'], observed=True).size().reset_index(name='count')
+    risk_pivot = risk_counts.pivot(index='season', columns='risk', values='count').fillna(0)
+    risk_pivot.plot(kind='bar', stacked=True, color=['#1f77b4', '#ff7f0e'])
+    plt.title('Risk-taking Behaviour by Season')
+    plt.xlabel('Season')
+    plt.ylabel('Count of Bats')
+    plt.legend(['Risk-avoidance (0)', 'Risk-taking (1)'])
+    _save(path, dpi=dpi)
+
+
+def plot_landing_to_food_by_season(d1, path, dpi=300):
+    import seaborn as sns
+
+    plt.figure(figsize=(7, 5))
+    sns.boxplot(data=d1, x='season', y='bat_landing_to_food', hue='season', order=['winter', 'spring'],
+                palette='coolwarm', legend=False)
+    plt.title('Landing-to-Food Time by Season')
+    plt.xlabel('Season')
+    plt.ylabel('Time (seconds)')
+    _save(path, dpi=dpi)
+
+
+def plot_rat_vs_bat_scatter(d2_season, title, path, dpi=300):
+    import seaborn as sns
+
+    plt.figure(figsize=(7, 5))
+    if len(d2_season) > SCATTER_MAX_POINTS:
+        # regplot would bootstrap its band over every row; draw the same line and an analytic band
+        x, y = d2_season['rat_arrival_number'], d2_season['bat_landing_number']
+        m, b, band = _linear_fit(x, y)
+        _hexbin(x, y)
+        xx = np.linspace(x.min(), x.max(), 100)
+        plt.plot(xx, m * xx + b, color='red', linewidth=1.5)
+        plt.fill_between(xx, m * xx + b - band(xx), m * xx + b + band(xx), color='red', alpha=0.15)
+        plt.title(title)
+        plt.xlabel('Rat Arrivals')
+        plt.ylabel('Bat Landings')
+        _save(path, dpi=dpi)
+        return
+    sns.scatterplot(
+        data=d2_season,
+        x='rat_arrival_number', y='bat_landing_number',
+        color='#1f77b4', alpha=0.7
+    )
+    sns.regplot(
+        data=d2_season,
+        x='rat_arrival_number', y='bat_landing_number',
+        scatter=False, color='red', line_kws={'linewidth': 1.5}
+    )
+    plt.title(title)
+    plt.xlabel('Rat Arrivals')
+    plt.ylabel('Bat Landings')
+    _save(path, dpi=dpi)
+
+
+def plot_correlation_heatmap(d2, path, dpi=300):
+    import seaborn as sns
+
+    plt.figure(figsize=(7, 6))
+    corr = d2[['bat_landing_number', 'rat_arrival_number', 'rat_minutes', 'food_availability']].corr()
+    sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f")
+    plt.title('Correlation Heatmap (Dataset2)')
+    _save(path, dpi=dpi)
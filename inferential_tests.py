@@ -12,84 +12,69 @@ Suyog Kadariya - S393829
 This script runs the main statistical tests on our cleaned data.
 We check if risk and reward are related, compare groups, and fit a simple model.
 The goal is to back up our findings with proper tests and clear numbers.
+Test results come from the results store (results_store.py) while the data and the
+analysis code are unchanged, so only new results are computed.
 
 '''
 
 
 # Import libraries
-import pandas as pd
-import numpy as np
-from scipy import stats
-import statsmodels.formula.api as smf
+from report_runner import Report
 
 # 1) Load cleaned data
 print("Step 1: Loading cleaned datasets...")
-d1 = pd.read_csv(
-    "dataset_cleaned/dataset1_cleaned.csv",
-    parse_dates=["start_time", "rat_period_start", "rat_period_end", "sunset_time"]
-)
-d2 = pd.read_csv(
-    "dataset_cleaned/dataset2_cleaned.csv",
-    parse_dates=["time"]
-)
+# the report's nodes share one load of the data and read or fill the results store
+report = Report()
+d1, d2 = report.d1, report.d2
 print("Loaded cleaned datasets.\n")
 
-# Ensure categorical types for d1
-for col in ["risk", "reward", "season"]:
-    if col in d1.columns and d1[col].dtype.name != "category":
-        d1[col] = d1[col].astype("category")
+# 95% bootstrap CIs (10,000 resamples, fixed seed) for every effect size reported below
+# (resampled on a process pool when they are not stored yet)
+cis = report.effect_size_cis
+
+
+def ci_text(name):
+    ci = cis[name]
+    return f"95% CI [{ci['ci_low']:.3f}, {ci['ci_high']:.3f}]"
+
 
 # =============== DATASET 1 TESTS (individual landings) ===============
 
 print("Step 2: Chi-square test — association between risk and reward (dataset1)")
-ct = pd.crosstab(d1["risk"], d1["reward"])
-chi2, p, dof, expected = stats.chi2_contingency(ct)
-n = ct.values.sum()
-phi2 = chi2 / n
-r, k = ct.shape
-cramers_v = np.sqrt(phi2 / (min(k - 1, r - 1)))
+ct = report.risk_reward_ct
+chi = report.chi_square
 print("Contingency table:")
 print(ct)
-print(f"chi2={chi2:.3f}, df={dof}, p={p:.6f}")
-print(f"Cramer's V={cramers_v:.3f}\n")
+print(f"chi2={chi['chi2']:.3f}, df={chi['dof']}, p={chi['p']:.6f}")
+print(f"Cramer's V={chi['cramers_v']:.3f}, {ci_text('cramers_v')}\n")
 
 print("Step 3: Mann–Whitney U — landing→food time by risk (dataset1)")
+mw = report.mann_whitney
 x = d1.loc[d1["risk"] == 0, "bat_landing_to_food"]
 y = d1.loc[d1["risk"] == 1, "bat_landing_to_food"]
-u_stat, p_u = stats.mannwhitneyu(x, y, alternative="two-sided")
-rank_biserial = 1 - (2 * u_stat) / (len(x) * len(y))
 print(f"Group sizes: risk=0 (n={len(x)}), risk=1 (n={len(y)})")
-print(f"U={u_stat:.1f}, p={p_u:.6f}")
-print(f"Rank-biserial effect size={rank_biserial:.3f}")
+print(f"U={mw['u']:.1f}, p={mw['p']:.6f}")
+print(f"Rank-biserial effect size={mw['rank_biserial']:.3f}, {ci_text('rank_biserial')}")
 print(f"Means: risk=0 -> {x.mean():.3f}s, risk=1 -> {y.mean():.3f}s\n")
 
 print("Step 4: Logistic regression — does time since rat arrival predict risk? (dataset1)")
 # Model: binary risk (0/1) ~ seconds_after_rat_arrival + season
-d1_model = d1.copy()
-d1_model["risk_num"] = d1_model["risk"].cat.codes  # ensures 0/1 numeric
-model = smf.logit("risk_num ~ seconds_after_rat_arrival + C(season)", data=d1_model).fit(disp=False)
+model = report.logit
 print(model.summary())
 
 # Odds ratios with 95% CI
-params = model.params
-conf = model.conf_int()
-or_table = pd.DataFrame({
-    "OR": np.exp(params),
-    "CI_lower": np.exp(conf[0]),
-    "CI_upper": np.exp(conf[1]),
-    "p_value": model.pvalues
-})
+or_table = report.odds_ratios
 print("\nOdds ratios (with 95% CI):")
 print(or_table, "\n")
 
 # =============== DATASET 2 TESTS (30-min windows) ===============
 
 print("Step 5: Correlation — rat arrivals vs bat landings (dataset2)")
-rho1, p1 = stats.spearmanr(d2["rat_arrival_number"], d2["bat_landing_number"])
-print(f"Spearman rho={rho1:.3f}, p={p1:.6f}\n")
+rho1, p1 = report.spearman_arrivals_landings
+print(f"Spearman rho={rho1:.3f}, {ci_text('rho_arrivals_landings')}, p={p1:.6f}\n")
 
 print("Step 6: Correlation — rat minutes vs food availability (dataset2)")
-rho2, p2 = stats.spearmanr(d2["rat_minutes"], d2["food_availability"])
-print(f"Spearman rho={rho2:.3f}, p={p2:.6f}\n")
+rho2, p2 = report.spearman_minutes_food
+print(f"Spearman rho={rho2:.3f}, {ci_text('rho_minutes_food')}, p={p2:.6f}\n")
 
 print("Inferential analysis complete.")
@@ -0,0 +1,153 @@
+'''
+
+Site-aware ingestion of many raw exports
+
+The field setup writes one export per site per night, so instead of a single
+dataset1.csv/dataset2.csv there is a folder tree like
+
+    raw/<site>/<night>_dataset1.csv
+    raw/<site>/<night>_dataset2.csv
+
+discover() finds every export of a dataset under a root folder and labels it with its
+site: the first folder below the root (files directly in the root take the root
+folder's name). ingest() cleans and validates the files concurrently on a process
+pool, each worker streaming one file through raw_cleaning.clean_raw() into a part file
+that carries a leading "site" column. The parts are then concatenated byte for byte,
+in (site, file) order, into the usual cleaned CSV, so load_cleaned() reads the combined
+dataset (site becomes a categorical column) and partition_store.py partitions it by
+site first. Files are handed out largest first and the parent only copies bytes, so
+throughput grows with the number of workers until the disk is the limit.
+
+A file that breaks an error-level validation rule, or that needs sunsets derived for
+a site without a position in sunset.SITES, is left out and listed in the result
+instead of stopping the other sites. Sunsets the workers derive are sent back to the
+parent, which adds them to the shared sunset table and saves it once.
+
+Usage:
+    python ingestion.py raw/                  # both datasets, one worker per core
+    python ingestion.py raw/ --names dataset2 --workers 8
+
+'''
+
+
+# Import libraries
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from raw_cleaning import CHUNK_SIZE, CLEAN_PATHS, clean_raw
+from sunset import SunsetTable
+
+RAW_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "raw")
+
+
+def discover(root, name):
+    """(site, path) of every CSV export of `name` under root, sorted by site then path."""
+    root = os.path.abspath(root)
+    found = []
+    for folder, _, files in os.walk(root):
+        for file in files:
+            if file.endswith(".csv") and name in file:
+                rel = os.path.relpath(folder, root)
+                site = os.path.basename(root) if rel == "." else rel.split(os.sep)[0]
+                found.append((site, os.path.join(folder, file)))
+    return sorted(found)
+
+
+def _clean_file(name, site, src, dst, chunksize):
+    """Clean one export; returns (rows_in, rows_out, error text or None, new sunset rows)."""
+    from sunset import SunsetTable, UnknownSiteError
+    from validation import ValidationError
+
+    # the table is only read here; the parent merges the returned rows and saves it
+    sunsets = SunsetTable.load()
+    try:
+        rows_in, rows_out = clean_raw(name, src, dst, chunksize, validate=True, site=site, sunsets=sunsets)
+    except (ValidationError, UnknownSiteError) as e:
+        # the error itself may hold a report object; send back plain text
+        return 0, 0, str(e), None
+    return rows_in, rows_out, None, sunsets.added()
+
+
+def _concat(parts, dst):
+    """Join cleaned part files into dst, keeping the first header only."""
+    tmp = dst + ".tmp"
+    with open(tmp, "wb") as out:
+        for i, part in enumerate(parts):
+            with open(part, "rb") as f:
+                header = f.readline()
+                if i == 0:
+                    out.write(header)
+                shutil.copyfileobj(f, out, 1 << 20)
+    os.replace(tmp, dst)
+
+
+def ingest(name, root=RAW_ROOT, dst=None, workers=None, chunksize=CHUNK_SIZE):
+    """Clean every export of `name` under root into one cleaned CSV with a site column.
+
+    Returns a dict with the files, rows in/out per site, rejected files and timing.
+    """
+    dst = dst or CLEAN_PATHS[name]
+    files = discover(root, name)
+    if not files:
+        raise FileNotFoundError(f"no {name} exports under {root}")
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix=f".{name}-ingest-", dir=os.path.dirname(os.path.abspath(dst)))
+    start = time.perf_counter()
+    try:
+        jobs = [(name, site, src, os.path.join(scratch, f"part-{i:06d}.csv"), chunksize)
+                for i, (site, src) in enumerate(files)]
+        if workers == 1 or len(jobs) == 1:
+            results = [_clean_file(*job) for job in jobs]
+        else:
+            # biggest files first, so one large export doesn't start last and hold up the pool
+            order = sorted(range(len(jobs)), key=lambda i: os.path.getsize(jobs[i][2]), reverse=True)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {i: pool.submit(_clean_file, *jobs[i]) for i in order}
+                results = [futures[i].result() for i in range(len(jobs))]
+
+        sites, rejected, parts = {}, [], []
+        sunsets = SunsetTable.load()
+        for (_, site, src, part, _), (rows_in, rows_out, error, new_sunsets) in zip(jobs, results):
+            if error is not None:
+                rejected.append({"site": site, "path": src, "error": error})
+                continue
+            parts.append(part)
+            sunsets.add(new_sunsets)
+            counts = sites.setdefault(site, {"files": 0, "rows_in": 0, "rows_out": 0})
+            counts["files"] += 1
+            counts["rows_in"] += rows_in
+            counts["rows_out"] += rows_out
+        sunsets.save()
+        if not parts:
+            raise ValueError(f"every {name} export under {root} was rejected")
+        _concat(parts, dst)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    seconds = time.perf_counter() - start
+    return {"name": name, "path": dst, "files": len(files), "sites": sites, "rejected": rejected,
+            "bytes": sum(os.path.getsize(src) for _, src in files), "seconds": seconds}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Clean every per-site raw export into one dataset per name.")
+    parser.add_argument("root", nargs="?", default=RAW_ROOT, help="folder of <site>/... raw exports")
+    parser.add_argument("--names", nargs="+", choices=["dataset1", "dataset2"], default=["dataset1", "dataset2"])
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    for dataset in args.names:
+        result = ingest(dataset, args.root, workers=args.workers, chunksize=args.chunksize)
+        print(f"=== {dataset}: {result['files']} files, {result['bytes'] / 2**20:.1f} MB in "
+              f"{result['seconds']:.2f}s ({result['bytes'] / 2**20 / result['seconds']:.1f} MB/s) ===")
+        for site, counts in result["sites"].items():
+            print(f"{site}: {counts['files']} files, {counts['rows_in']} raw rows -> {counts['rows_out']} cleaned rows")
+        for bad in result["rejected"]:
+            print(f"Rejected {bad['path']}:\n{bad['error']}")
+        print(f"Saved: {result['path']}\n")
@@ -0,0 +1,185 @@
+'''
+
+Stage-level timing and memory instrumentation
+
+Set ANALYSIS_TRACE to a file path and every instrumented stage (dataset loads, the
+crosstab, chi-square, Mann–Whitney, logit fits, each savefig, the report sections)
+appends one JSON line there when it finishes:
+
+    {"name": "chi_square", "ts_us": ..., "dur_ms": 1.9, "cpu_ms": 1.8, "rows": 2,
+     "depth": 1, "pid": 4121, "tid": 140..., ...}
+
+dur_ms is wall-clock time, cpu_ms the process CPU time over the same span, rows the
+length of the data the stage was handed (or returned), and depth its nesting level.
+With ANALYSIS_TRACE_MEMORY=1 as well, tracemalloc runs and each stage also records
+its net allocation (alloc_kb) and, for top-level stages, the peak (peak_kb).
+Processes started by a pool inherit the variables and append to the same file.
+
+    python instrumentation.py trace.jsonl trace.json
+
+Modules a stage imports lazily (SciPy for the tests, the model code for logit fits) are
+imported in a stage of their own, "import" with a module field, just before the first
+traced call that needs them, so an import is never billed to the test that triggered it.
+
+turns the log into Chrome trace-event JSON, which chrome://tracing, Perfetto or
+speedscope show as a flame graph per process. When ANALYSIS_TRACE is unset, stage()
+hands back one shared no-op context manager and traced() calls straight through, so
+the hooks cost a global lookup.
+
+'''
+
+
+# Import libraries
+import contextlib
+import functools
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+TRACE_ENV = "ANALYSIS_TRACE"
+MEMORY_ENV = "ANALYSIS_TRACE_MEMORY"
+
+_NULL = contextlib.nullcontext()
+_path = None
+_memory = False
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(path, memory=False):
+    """Start appending stage events to `path` (what setting ANALYSIS_TRACE does at import)."""
+    global _path, _memory
+    _path = path
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _path
+    _path = None
+
+
+def enabled():
+    return _path is not None
+
+
+def _rows(obj):
+    return len(obj) if hasattr(obj, "shape") and getattr(obj, "ndim", 1) > 0 else None
+
+
+def _emit(event):
+    line = json.dumps(event, default=str) + "\n"
+    with _lock, open(_path, "a") as f:
+        f.write(line)
+
+
+class _Stage:
+    __slots__ = ("name", "fields", "start_wall", "start_ns", "start_cpu", "start_mem")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        depth = getattr(_local, "depth", 0)
+        _local.depth = depth + 1
+        if _memory:
+            if depth == 0:
+                tracemalloc.reset_peak()
+            self.start_mem = tracemalloc.get_traced_memory()[0]
+        self.start_wall = time.time_ns()
+        self.start_cpu = time.process_time_ns()
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        dur = time.perf_counter_ns() - self.start_ns
+        cpu = time.process_time_ns() - self.start_cpu
+        _local.depth -= 1
+        event = {
+            "name": self.name,
+            "ts_us": self.start_wall // 1000,
+            "dur_ms": round(dur / 1e6, 3),
+            "cpu_ms": round(cpu / 1e6, 3),
+            "depth": _local.depth,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if _memory:
+            current, peak = tracemalloc.get_traced_memory()
+            event["alloc_kb"] = round((current - self.start_mem) / 1024, 1)
+            if _local.depth == 0:
+                event["peak_kb"] = round(peak / 1024, 1)
+        if exc_type is not None:
+            event["error"] = exc_type.__name__
+        event.update(self.fields)
+        if _path is not None:
+            _emit(event)
+        return False
+
+
+def stage(name, **fields):
+    """Context manager timing one stage; extra keyword fields (rows, path, ...) go into its event."""
+    if _path is None:
+        return _NULL
+    return _Stage(name, fields)
+
+
+def traced(name, imports=()):
+    """Decorator form of stage(); rows come from the first argument or the result with a shape.
+
+    `imports` names the modules the function imports inside; when tracing, any that are not
+    loaded yet are imported first, each in its own "import" stage.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _path is None:
+                return fn(*args, **kwargs)
+            for module in imports:
+                if module not in sys.modules:
+                    with _Stage("import", {"module": module}):
+                        importlib.import_module(module)
+            fields = {}
+            with _Stage(name, fields):
+                rows = _rows(args[0]) if args else None
+                result = fn(*args, **kwargs)
+                fields["rows"] = rows if rows is not None else _rows(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def to_chrome_trace(log_path, out_path):
+    """Convert a stage log into Chrome trace-event JSON ("X" complete events)."""
+    events = []
+    with open(log_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            args = {k: v for k, v in event.items() if k not in ("name", "ts_us", "dur_ms", "pid", "tid")}
+            events.append({"name": event["name"], "ph": "X", "ts": event["ts_us"],
+                           "dur": round(event["dur_ms"] * 1000), "pid": event["pid"],
+                           "tid": event["tid"], "args": args})
+    with open(out_path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(events)
+
+
+if os.environ.get(TRACE_ENV):
+    enable(os.environ[TRACE_ENV], memory=os.environ.get(MEMORY_ENV, "") not in ("", "0"))
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        sys.exit("usage: python instrumentation.py STAGE_LOG.jsonl TRACE.json")
+    count = to_chrome_trace(sys.argv[1], sys.argv[2])
+    print(f"Wrote {count} events to {sys.argv[2]}")
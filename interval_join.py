@@ -0,0 +1,116 @@
+'''
+
+Interval joins between bat landings, rat episodes and 30-minute observation windows
+
+dataset1 has one row per bat landing with the rat visit it happened in
+(rat_period_start/rat_period_end); dataset2 has one row per 30-minute window starting at
+`time`. Here the two are linked without a cross join: interval starts are sorted once,
+each lookup is a binary search (np.searchsorted), and overlapping intervals are only
+compared with the candidates whose start lies within the longest interval length. The
+cost is O((n + m) log m) plus the candidates checked, which is bounded by how many
+intervals start within one longest-interval span of each query, not by the number of
+matches. With 30-minute windows and rat visits of minutes that is a handful per lookup,
+so millions of landings against hundreds of thousands of windows are fine; a single
+very long interval widens the candidate range of every lookup.
+
+    link_landings(d1, d2)       per-landing window, rat episode and overlap count
+    rat_episodes(d1)            one row per distinct rat visit, with landings per episode
+    window_landings(d2, links)  dataset1 landings counted per dataset2 window
+    overlap_pairs(...)          every overlapping (a, b) pair, e.g. windows x rat episodes
+
+'''
+
+
+# Import libraries
+import numpy as np
+import pandas as pd
+
+WINDOW = pd.Timedelta(minutes=30)
+
+
+def _ns(values):
+    return np.asarray(values, dtype="datetime64[ns]").astype(np.int64)
+
+
+def point_in_windows(points, starts, width=WINDOW):
+    """Position of the window [start, start + width) holding each point, or -1.
+
+    Windows must not overlap; `starts` need not be sorted.
+    """
+    points, starts = _ns(points), _ns(starts)
+    order = np.argsort(starts, kind="stable")
+    sorted_starts = starts[order]
+    pos = np.searchsorted(sorted_starts, points, side="right") - 1
+    inside = (pos >= 0) & (points < sorted_starts[np.maximum(pos, 0)] + pd.Timedelta(width).value)
+    return np.where(inside, order[np.maximum(pos, 0)], -1)
+
+
+def overlap_pairs(a_start, a_end, b_start, b_end, closed=True):
+    """All (i, j) with interval a[i] overlapping interval b[j]; points are zero-length intervals.
+
+    With closed=True intervals include both ends, so a point on an end counts as inside.
+    Returns two position arrays, sorted by i then b's start.
+    """
+    a_start, a_end = _ns(a_start), _ns(a_end)
+    b_start, b_end = _ns(b_start), _ns(b_end)
+    order = np.argsort(b_start, kind="stable")
+    starts, ends = b_start[order], b_end[order]
+    longest = int((ends - starts).max()) if len(starts) else 0
+    # candidates for a[i]: b intervals starting in [a_start - longest, a_end]
+    lo = np.searchsorted(starts, a_start - longest, side="left")
+    hi = np.searchsorted(starts, a_end, side="right" if closed else "left")
+    counts = np.maximum(hi - lo, 0)
+    i = np.repeat(np.arange(len(a_start)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    j = np.repeat(lo, counts) + offsets
+    keep = ends[j] >= a_start[i] if closed else ends[j] > a_start[i]
+    return i[keep], order[j[keep]]
+
+
+def covering_counts(points, starts, ends):
+    """Number of closed intervals [start, end] containing each point, without listing them."""
+    points = _ns(points)
+    starts, ends = np.sort(_ns(starts)), np.sort(_ns(ends))
+    # started at or before the point, minus already ended before it
+    return np.searchsorted(starts, points, side="right") - np.searchsorted(ends, points, side="left")
+
+
+def rat_episodes(d1):
+    """Distinct rat visits in dataset1 with their landing counts, sorted by start."""
+    keys = ["rat_period_start", "rat_period_end"]
+    grouped = d1.groupby(keys, observed=True, sort=True)
+    episodes = grouped.size().rename("landings").reset_index()
+    episodes.insert(0, "episode_id", np.arange(len(episodes)))
+    episodes["duration_s"] = (episodes["rat_period_end"] - episodes["rat_period_start"]).dt.total_seconds()
+    risk_taken = (d1["risk"] == 1).groupby([d1[k] for k in keys], observed=True, sort=True)
+    episodes["risk_rate"] = risk_taken.mean().to_numpy()
+    episodes["first_landing_s"] = grouped["seconds_after_rat_arrival"].min().to_numpy()
+    return episodes
+
+
+def link_landings(d1, d2, episodes=None):
+    """Per-landing links, aligned to d1's index.
+
+    window        index label of the dataset2 window holding the landing (-1 if none)
+    episode_id    the landing's own rat visit (row of rat_episodes)
+    overlapping_episodes  number of rat visits in progress at the landing time
+    """
+    if episodes is None:
+        episodes = rat_episodes(d1)
+    pos = point_in_windows(d1["start_time"], d2["time"])
+    window = np.where(pos >= 0, np.asarray(d2.index)[np.maximum(pos, 0)], -1)
+
+    # the landing's own episode: hash lookup of its (start, end) among the episode keys
+    lookup = pd.MultiIndex.from_frame(episodes[["rat_period_start", "rat_period_end"]])
+    found = lookup.get_indexer(pd.MultiIndex.from_frame(d1[["rat_period_start", "rat_period_end"]]))
+    episode_id = np.where(found >= 0, episodes["episode_id"].to_numpy()[found], -1)
+
+    overlapping = covering_counts(d1["start_time"], episodes["rat_period_start"], episodes["rat_period_end"])
+    return pd.DataFrame({"window": window, "episode_id": episode_id,
+                         "overlapping_episodes": overlapping}, index=d1.index)
+
+
+def window_landings(d2, links):
+    """dataset1 landings per dataset2 window (0 for windows with none), aligned to d2."""
+    matched = links.loc[links["window"] != -1, "window"]
+    return matched.value_counts().reindex(d2.index, fill_value=0).rename("d1_landings")
@@ -0,0 +1,247 @@
+'''
+
+Partitioned on-disk copies of the cleaned datasets, with predicate pushdown
+
+build_partitions() splits a cleaned dataset into one file per partition, in a
+key=value folder layout under dataset_cleaned/partitions/<name>/ (site, when the data
+has one, then season_name, then month). A _manifest.json lists every partition with its
+key values, row count and per-column statistics: min/max and null count for numeric
+and date columns, the distinct values for categorical ones.
+
+Each build writes its files into a fresh build-<id>/ folder and then atomically
+replaces _manifest.json to point at it, so the store never goes missing while it is
+rebuilt. The previous build is deleted afterwards; a reader that was still reading it
+re-reads the manifest and retries once.
+
+load_partitioned() takes the columns a query needs and filters written as
+(column, op, value) with op in ==, !=, <, <=, >, >=, in. It skips every partition
+whose keys or statistics rule the filters out, reads only the requested columns of
+the rest, then applies the filters to the rows it read. The partitions are rebuilt
+when the cleaned CSV changes, as for the cache in data_access.py.
+
+'''
+
+
+# Import libraries
+import json
+import operator
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_access import CACHE_FORMAT, file_sha256, load_cleaned, season_from_month, season_names
+from raw_cleaning import CLEAN_DIR, CLEAN_PATHS
+
+PARTITION_DIR = os.path.join(CLEAN_DIR, "partitions")
+MANIFEST_NAME = "_manifest.json"
+STORE_VERSION = 2
+
+# Partition keys, outermost first; keys the data doesn't have are skipped
+PARTITION_KEYS = ["site", "season_name", "month"]
+
+_OPS = {"==": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le,
+        ">": operator.gt, ">=": operator.ge, "in": lambda a, b: a.isin(b) if hasattr(a, "isin") else a in b}
+
+
+def store_dir(name):
+    return os.path.join(PARTITION_DIR, name)
+
+
+def _with_keys(df):
+    """The frame plus a season_name key column (dataset1 codes its season, dataset2 only has months)."""
+    if "season" in df.columns:
+        season = season_names(df["season"])
+    else:
+        season = season_from_month(df["month"])
+    return df.assign(season_name=pd.Series(season, index=df.index).astype(object).fillna("unknown"))
+
+
+def _json_value(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _column_stats(part):
+    stats = {}
+    for col in part.columns:
+        series = part[col]
+        entry = {"nulls": int(series.isna().sum())}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry["values"] = sorted(_json_value(v) for v in series.dropna().unique())
+        elif series.notna().any() and (pd.api.types.is_numeric_dtype(series)
+                                       or pd.api.types.is_datetime64_any_dtype(series)):
+            entry["kind"] = "datetime" if pd.api.types.is_datetime64_any_dtype(series) else "number"
+            entry["min"] = _json_value(series.min())
+            entry["max"] = _json_value(series.max())
+        stats[col] = entry
+    return stats
+
+
+def build_partitions(name, df=None, csv_path=None):
+    """Write the partitioned copy of a cleaned dataset and return its manifest."""
+    csv_path = csv_path or CLEAN_PATHS[name]
+    if df is None:
+        df = load_cleaned(name, csv_path)
+    df = _with_keys(df)
+    keys = [k for k in PARTITION_KEYS if k in df.columns]
+    root = store_dir(name)
+    build = f"build-{time.time_ns()}-{os.getpid()}"
+    ext = ".parquet" if CACHE_FORMAT == "parquet" else ".pkl"
+
+    partitions = []
+    for values, part in df.groupby(keys, observed=True, sort=True):
+        values = dict(zip(keys, values if isinstance(values, tuple) else (values,)))
+        rel = os.path.join(build, *(f"{k}={_json_value(v)}" for k, v in values.items()), "part-0" + ext)
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # key columns live in the folder names; the index keeps each row's original position
+        data = part.drop(columns=keys)
+        if CACHE_FORMAT == "parquet":
+            data.to_parquet(path, index=True)
+        else:
+            data.to_pickle(path)
+        partitions.append({"path": rel, "keys": {k: _json_value(v) for k, v in values.items()},
+                           "rows": len(part), "stats": _column_stats(data)})
+
+    stat = os.stat(csv_path)
+    categories = {col: [_json_value(v) for v in df[col].cat.categories]
+                  for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)}
+    manifest = {"version": STORE_VERSION, "format": CACHE_FORMAT, "keys": keys,
+                "columns": list(df.columns), "key_dtypes": {k: df[k].dtype.str for k in keys},
+                "categories": categories,
+                "source": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_sha256(csv_path)},
+                "build": build, "partitions": partitions}
+    previous = _read_manifest(name)
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, f"{MANIFEST_NAME}.tmp-{os.getpid()}")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    # readers switch to the new build here, in one atomic rename of the manifest
+    os.replace(tmp, os.path.join(root, MANIFEST_NAME))
+    for entry in os.listdir(root):
+        # the build the old manifest named, and files of the older, unversioned layout
+        old_build = previous is not None and entry == previous.get("build")
+        if entry != build and (old_build or "=" in entry):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return manifest
+
+
+def _read_manifest(name):
+    try:
+        with open(os.path.join(store_dir(name), MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_partitions(name, csv_path=None):
+    """Manifest of an up-to-date partitioned copy, rebuilding it if the CSV changed."""
+    csv_path = csv_path or CLEAN_PATHS[name]
+    manifest = _read_manifest(name)
+    stat = os.stat(csv_path)
+    if manifest is not None and manifest["version"] == STORE_VERSION and manifest["format"] == CACHE_FORMAT:
+        source = manifest["source"]
+        if source["size"] == stat.st_size and (source["mtime_ns"] == stat.st_mtime_ns
+                                               or source["sha256"] == file_sha256(csv_path)):
+            return manifest
+    return build_partitions(name, csv_path=csv_path)
+
+
+def _bound(entry, value):
+    """Filter value in the type of a stats entry (dates are stored as ISO strings)."""
+    if entry.get("kind") == "datetime":
+        return pd.Timestamp(entry["min"]), pd.Timestamp(entry["max"]), pd.Timestamp(value)
+    return entry["min"], entry["max"], value
+
+
+def _may_match(partition, column, op, value):
+    """False only when the partition provably holds no row passing the filter."""
+    if column in partition["keys"]:
+        key = partition["keys"][column]
+        return key in value if op == "in" else _OPS[op](key, value)
+    entry = partition["stats"].get(column)
+    if entry is None:
+        return True
+    if entry["nulls"] == partition["rows"]:
+        return op == "!="
+    if "values" in entry:
+        present = set(entry["values"])
+        if op == "==":
+            return value in present
+        if op == "in":
+            return bool(present & set(value))
+        if op == "!=":
+            return present != {value}
+        return True
+    if "min" not in entry:
+        return True
+    if op == "in":
+        return any(_may_match(partition, column, "==", v) for v in value)
+    low, high, value = _bound(entry, value)
+    return {
+        "==": low <= value <= high,
+        "!=": not (low == high == value),
+        "<": low < value,
+        "<=": low <= value,
+        ">": high > value,
+        ">=": high >= value,
+    }[op]
+
+
+def _read_part(path, columns):
+    if CACHE_FORMAT == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    df = pd.read_pickle(path)
+    return df if columns is None else df[columns]
+
+
+def load_partitioned(name, columns=None, filters=()):
+    """Rows of a cleaned dataset passing every filter, reading only the partitions and columns needed.
+
+    Rows come back in their original order with their original index labels, so the
+    result equals filtering the full frame. Key columns (e.g. season_name) are included
+    only when listed in `columns` or when `columns` is None.
+    """
+    try:
+        return _load_partitioned(name, columns, filters)
+    except FileNotFoundError:
+        # a rebuild deleted the build this read started on; the manifest now names a newer one
+        return _load_partitioned(name, columns, filters)
+
+
+def _load_partitioned(name, columns, filters):
+    manifest = ensure_partitions(name)
+    keys = manifest["keys"]
+    filters = [(c, op, set(v) if op == "in" else v) for c, op, v in filters]
+    chosen = [p for p in manifest["partitions"] if all(_may_match(p, c, op, v) for c, op, v in filters)]
+
+    wanted = None if columns is None else list(columns)
+    data_cols = None
+    if wanted is not None:
+        # row filters on non-key columns need those columns read as well
+        needed = wanted + [c for c, _, _ in filters if c not in wanted]
+        data_cols = [c for c in needed if c not in keys]
+
+    parts = []
+    # with nothing to read, an emptied first partition still gives the right columns
+    for p in chosen or manifest["partitions"][:1]:
+        part = _read_part(os.path.join(store_dir(name), p["path"]), data_cols)
+        for key in keys:
+            if wanted is None or key in wanted or any(c == key for c, _, _ in filters):
+                part[key] = np.full(len(part), p["keys"][key], dtype=manifest["key_dtypes"][key])
+        parts.append(part if chosen else part.iloc[:0])
+    df = pd.concat(parts).sort_index()
+    for col, op, value in filters:
+        if col not in keys:
+            df = df[_OPS[op](df[col], value)]
+    # partitions only see the categories they hold; restore the full dataset's categories
+    for col, cats in manifest["categories"].items():
+        if col in df.columns:
+            df[col] = pd.Categorical(df[col], categories=cats)
+    return df[manifest["columns"]] if wanted is None else df[wanted]
@@ -0,0 +1,185 @@
+'''
+
+HIT140 Assessment 2: Part I (b) — Cleaning the raw datasets
+
+Group Name: SYDN 28
+Group Members:
+Krish Rajbhandari - S395754
+Tasnim Zannat - S394294
+Asma Zia - S395083
+Suyog Kadariya - S393829
+
+This script turns the raw field exports (dataset1.csv, dataset2.csv) into the
+cleaned files in dataset_cleaned/ that every other script reads.
+The raw files are read in fixed-size chunks so memory stays flat no matter how
+long the camera logs get. Day-first timestamps ("30/12/2017 18:37") are parsed
+with an explicit format, numeric columns are coerced, and rows missing a
+required value are dropped.
+
+'''
+
+
+# Import libraries
+import os
+import pandas as pd
+
+# Default number of raw rows held in memory at once
+CHUNK_SIZE = 100_000
+
+# Raw timestamps are day-first with minute precision
+RAW_DATE_FORMAT = "%d/%m/%Y %H:%M"
+CLEAN_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Column layout of each dataset. Required columns must be present for a row to be kept.
+SCHEMAS = {
+    "dataset1": {
+        "dates": ["start_time", "rat_period_start", "rat_period_end", "sunset_time"],
+        "floats": ["bat_landing_to_food", "hours_after_sunset"],
+        "ints": ["seconds_after_rat_arrival", "risk", "reward", "month", "season"],
+        "strings": ["habit"],
+        "required": ["start_time", "habit", "risk", "reward"],
+    },
+    "dataset2": {
+        "dates": ["time"],
+        "floats": ["hours_after_sunset", "food_availability", "rat_minutes"],
+        "ints": ["month", "bat_landing_number", "rat_arrival_number"],
+        "strings": [],
+        "required": ["time"],
+    },
+}
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_PATHS = {
+    "dataset1": os.path.join(BASE_DIR, "dataset1.csv"),
+    "dataset2": os.path.join(BASE_DIR, "dataset2.csv"),
+}
+CLEAN_DIR = os.path.join(BASE_DIR, "dataset_cleaned")
+CLEAN_PATHS = {
+    "dataset1": os.path.join(CLEAN_DIR, "dataset1_cleaned.csv"),
+    "dataset2": os.path.join(CLEAN_DIR, "dataset2_cleaned.csv"),
+}
+
+
+def coerce_types(chunk, name):
+    """Parse the dates and numbers of a raw chunk in place; unparseable values become NaN/NaT.
+
+    Optional columns the export doesn't have at all (e.g. sunset_time in new field data)
+    are added empty, so later stages can fill them.
+    """
+    schema = SCHEMAS[name]
+    for col in schema["dates"] + schema["floats"] + schema["ints"] + schema["strings"]:
+        if col not in chunk.columns and col not in schema["required"]:
+            chunk[col] = pd.NA
+    for col in schema["dates"]:
+        chunk[col] = pd.to_datetime(chunk[col], format=RAW_DATE_FORMAT, errors="coerce")
+    for col in schema["floats"] + schema["ints"]:
+        chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+    for col in schema["strings"]:
+        chunk[col] = chunk[col].str.strip().replace("", None)
+    return chunk
+
+
+def clean_chunk(chunk, name, coerced=False):
+    """Clean one raw chunk of `name` ("dataset1" or "dataset2") and return it.
+
+    Pass coerced=True for a chunk that already went through coerce_types (e.g. the one
+    validation.Validator.check returns), so it is not parsed twice.
+    """
+    schema = SCHEMAS[name]
+    if not coerced:
+        chunk = coerce_types(chunk, name)
+
+    # Drop rows we cannot use, then settle the integer columns once NaNs are gone
+    chunk = chunk.dropna(subset=schema["required"] + schema["ints"])
+    chunk = chunk.astype({col: "int64" for col in schema["ints"]})
+    chunk = chunk.astype({col: "float64" for col in schema["floats"]})
+    return chunk
+
+
+def py_scalar(value):
+    """Plain Python scalar, so keys compare equal after a JSON round trip."""
+    return value.item() if hasattr(value, "item") else value
+
+
+class BoundedReader:
+    """File-like view of f that stops at byte `stop` (the end of the last complete line)."""
+
+    def __init__(self, f, stop):
+        self.f, self.stop = f, stop
+
+    def read(self, n=-1):
+        left = self.stop - self.f.tell()
+        if left <= 0:
+            return b""
+        return self.f.read(left if n is None or n < 0 else min(n, left))
+
+    def __iter__(self):
+        return iter(lambda: self.read(1 << 16), b"")
+
+
+def read_raw_chunks(path, name, chunksize=CHUNK_SIZE):
+    """Return an iterator over raw chunks of a CSV, so the whole file is never loaded."""
+    schema = SCHEMAS[name]
+    # Dates and labels stay as text so pandas never tries to guess their format per row
+    dtypes = {col: "string" for col in schema["dates"] + schema["strings"]}
+    return pd.read_csv(path, dtype=dtypes, chunksize=chunksize)
+
+
+def clean_raw(name, src=None, dst=None, chunksize=CHUNK_SIZE, validate=True, site=None, derive=True,
+              sunsets=None):
+    """Stream a raw dataset into its cleaned CSV. Returns (rows_in, rows_out).
+
+    With validate=True every chunk is checked against validation.RULES first, and a chunk
+    breaking an error-level rule raises ValidationError before the cleaned file is replaced.
+    A `site` label is written as a leading "site" column (see ingestion.py). With
+    derive=True missing sunset_time/hours_after_sunset values are filled from the
+    cached per-night sunset table (sunset.py), which is saved at the end; pass a loaded
+    SunsetTable as `sunsets` to extend that one instead and leave saving to the caller.
+    """
+    from sunset import SunsetTable, fill_sunset
+    from validation import Validator
+
+    validator = Validator(name) if validate else None
+    own_sunsets = derive and sunsets is None
+    if own_sunsets:
+        sunsets = SunsetTable.load()
+    elif not derive:
+        sunsets = None
+    src = src or RAW_PATHS[name]
+    dst = dst or CLEAN_PATHS[name]
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+
+    # Write to a temporary file and swap it in at the end, so readers never see half a file
+    tmp = dst + ".tmp"
+    rows_in = rows_out = 0
+    header = True
+    try:
+        with open(tmp, "w", newline="") as out:
+            for chunk in read_raw_chunks(src, name, chunksize):
+                rows_in += len(chunk)
+                if validator is not None:
+                    chunk = validator.check(chunk)
+                chunk = clean_chunk(chunk, name, coerced=validator is not None)
+                if site is not None:
+                    chunk.insert(0, "site", site)
+                if sunsets is not None:
+                    chunk = fill_sunset(chunk, name, sunsets)
+                chunk.to_csv(out, index=False, header=header, date_format=CLEAN_DATE_FORMAT)
+                rows_out += len(chunk)
+                header = False
+    except BaseException:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, dst)
+    if own_sunsets:
+        sunsets.save()
+    return rows_in, rows_out
+
+
+if __name__ == "__main__":
+    print("Cleaning raw datasets...")
+    for dataset in ["dataset1", "dataset2"]:
+        n_in, n_out = clean_raw(dataset)
+        print(f"{dataset}: {n_in} raw rows -> {n_out} cleaned rows ({n_in - n_out} dropped)")
+        print(f"Saved: {CLEAN_PATHS[dataset]}")
+    print("Cleaning complete.")
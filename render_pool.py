@@ -0,0 +1,153 @@
+'''
+
+Parallel figure rendering
+
+A figure is described by a RenderJob: the name of a builder in figures.py, the output
+path, which shared frame it reads (and which columns/rows of it), plus any small extra
+arguments such as a crosstab or a test summary. render_jobs() publishes each frame's
+needed columns once into a shared-memory block and runs the jobs across a process pool
+on the Agg backend. Workers map the block instead of receiving a pickled copy of the
+frame, so the per-job payload stays a few hundred bytes however big the data is.
+
+'''
+
+
+# Import libraries
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# builder: function name in figures.py; frame: key into the frames dict (or None when the
+# builder only needs `args`); columns: columns of that frame the builder reads;
+# where: optional (column, value) equality filter applied before drawing.
+RenderJob = namedtuple("RenderJob", "builder path frame columns where args kwargs",
+                       defaults=(None, None, None, (), {}))
+
+
+class SharedFrame:
+    """Columns of a DataFrame copied once into a single shared-memory block."""
+
+    def __init__(self, df, columns):
+        layout = []
+        offset = 0
+        arrays = []
+        for col in columns:
+            series = df[col]
+            categories = None
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                categories = list(series.cat.categories)
+                values = series.cat.codes.to_numpy()
+            else:
+                values = series.to_numpy()
+            if values.dtype == object:
+                raise TypeError(f"column {col!r} has object dtype and cannot be shared")
+            # keep every column 8-byte aligned inside the block
+            offset = (offset + 7) // 8 * 8
+            layout.append((col, values.dtype.str, offset, len(values), categories))
+            arrays.append((offset, values))
+            offset += values.nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (start, values), (_, dtype, _, n, _) in zip(arrays, layout):
+            np.ndarray(n, dtype=dtype, buffer=self.shm.buf, offset=start)[:] = values
+        self.spec = (self.shm.name, layout)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach(spec, columns=None):
+    """Rebuild a read-only DataFrame over a SharedFrame spec. Returns (frame, shm handle)."""
+    name, layout = spec
+    shm = shared_memory.SharedMemory(name=name)
+    data = {}
+    for col, dtype, offset, n, categories in layout:
+        if columns is not None and col not in columns:
+            continue
+        values = np.ndarray(n, dtype=dtype, buffer=shm.buf, offset=offset)
+        values.flags.writeable = False
+        if categories is not None:
+            data[col] = pd.Categorical.from_codes(values, categories=categories)
+        else:
+            data[col] = values
+    return pd.DataFrame(data, copy=False), shm
+
+
+def _job_frame(job, frame):
+    if job.where is not None:
+        col, value = job.where
+        frame = frame[frame[col] == value]
+    return frame
+
+
+def _call_builder(job, frame):
+    import figures
+
+    builder = getattr(figures, job.builder)
+    if job.frame is None:
+        builder(*job.args, path=job.path, **job.kwargs)
+    else:
+        builder(_job_frame(job, frame), *job.args, path=job.path, **job.kwargs)
+    return job.path
+
+
+def _render_shared(job, spec):
+    frame = shm = None
+    if spec is not None:
+        columns = list(job.columns) + ([job.where[0]] if job.where else [])
+        frame, shm = attach(spec, columns)
+    try:
+        return _call_builder(job, frame)
+    finally:
+        del frame
+        if shm is not None:
+            shm.close()
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def render_jobs(jobs, frames, workers=None):
+    """Render every job; `frames` maps the job.frame keys to DataFrames.
+
+    workers=1 draws in this process; otherwise a pool of `workers` processes is used
+    (default: one per core, capped at the number of jobs). Yields output paths as
+    figures finish.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers == 1:
+        for job in jobs:
+            yield _call_builder(job, frames.get(job.frame))
+        return
+
+    # Publish each frame once, holding only the columns some job reads
+    needed = {}
+    for job in jobs:
+        if job.frame is not None:
+            cols = needed.setdefault(job.frame, [])
+            for col in list(job.columns) + ([job.where[0]] if job.where else []):
+                if col not in cols:
+                    cols.append(col)
+    shared = {}
+    try:
+        for key, cols in needed.items():
+            shared[key] = SharedFrame(frames[key], cols)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(_render_shared, job, shared[job.frame].spec if job.frame is not None else None)
+                for job in jobs
+            ]
+            for future in futures:
+                yield future.result()
+    finally:
+        for frame in shared.values():
+            frame.close()
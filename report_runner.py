@@ -0,0 +1,403 @@
+'''
+
+Full report in one process
+
+Runs everything the separate scripts do (descriptive tables and plots, inferential
+tests and plots, seasonal tests and plots) after loading each dataset once.
+Intermediates form a small dependency graph: every node is a cached property that is
+computed the first time something asks for it, so the risk x reward crosstab feeds
+both the chi-square test and three figures, and the logit model is fitted once for
+the printed odds ratios, the forest plot and the prediction curves. Test and model
+results are also kept in the results store (results_store.py), keyed by the data they
+came from, so a later run only computes what is not stored for the current data yet.
+
+Usage:
+    python report_runner.py                       # every section
+    python report_runner.py --sections tests plots
+    python report_runner.py --recompute           # ignore stored results
+
+'''
+
+
+# Import libraries
+import argparse
+import os
+import time
+from functools import cached_property
+
+import pandas as pd
+
+import analyses
+import interval_join
+import small_sample
+from data_access import load_datasets, season_from_month, season_names
+from figure_cache import render_cached
+from instrumentation import stage
+from raw_cleaning import BASE_DIR
+from results_store import STORE_PATH, ResultStore, current_versions
+
+SECTIONS = ["descriptive", "tests", "plots", "seasonal"]
+
+# Model formulas, as keys of the stored odds ratio tables
+RISK_MODEL = "risk ~ seconds_after_rat_arrival + C(season)"
+SEASONAL_RISK_MODEL = "risk ~ C(season) + seconds_after_rat_arrival + hours_after_sunset"
+
+
+def _without_samples(mw):
+    """A mann_whitney() result without its two input samples, which are not worth storing."""
+    return {key: mw[key] for key in ["u", "p", "rank_biserial", "method"] if key in mw}
+
+
+class Report:
+    """Lazily evaluated analyses over one shared load of dataset1/dataset2."""
+
+    def __init__(self, out_dir=BASE_DIR, workers=None, dpi=None, force=False, store_path=STORE_PATH,
+                 recompute=False):
+        self.out_dir = out_dir
+        self.force = force  # redraw figures even when the figure cache says they are current
+        self.workers = workers  # figure rendering processes (None = one per core)
+        self.dpi = dpi  # overrides the seasonal figures' dpi=300 when set
+        self.store_path = store_path  # results store (see results_store.py); None = always compute
+        self.recompute = recompute  # compute every stored result again and overwrite it
+
+    # ---------- data ----------
+
+    @cached_property
+    def data(self):
+        return load_datasets()
+
+    @cached_property
+    def store(self):
+        return ResultStore(self.store_path)
+
+    @cached_property
+    def versions(self):
+        return current_versions()
+
+    def stored(self, analysis, datasets, compute, subset="all", **params):
+        """compute() unless the results store already holds this result for the current data."""
+        if self.store_path is None:
+            return compute()
+        versions = {name: self.versions[name] for name in datasets}
+        return self.store.fetch(analysis, versions, compute, subset, params, recompute=self.recompute)
+
+    @property
+    def d1(self):
+        return self.data[0]
+
+    @property
+    def d2(self):
+        return self.data[1]
+
+    @cached_property
+    def d1_seasons(self):
+        return self.d1.assign(season=season_names(self.d1["season"]))
+
+    @cached_property
+    def d2_seasons(self):
+        return self.d2.assign(season=season_from_month(self.d2["month"]))
+
+    @cached_property
+    def rat_episodes(self):
+        return interval_join.rat_episodes(self.d1)
+
+    @cached_property
+    def landing_links(self):
+        return interval_join.link_landings(self.d1, self.d2, self.rat_episodes)
+
+    # ---------- dataset1 ----------
+
+    @cached_property
+    def risk_reward_ct(self):
+        return analyses.risk_reward_crosstab(self.d1)
+
+    @cached_property
+    def chi_square(self):
+        return self.stored("chi_square", ["dataset1"], lambda: analyses.chi_square(self.risk_reward_ct),
+                           rows="risk", columns="reward")
+
+    @cached_property
+    def mann_whitney(self):
+        return self.stored("mann_whitney", ["dataset1"],
+                           lambda: _without_samples(analyses.mann_whitney_by_risk(self.d1)),
+                           value="bat_landing_to_food", by="risk")
+
+    @cached_property
+    def logit(self):
+        return analyses.fit_risk_logit(self.d1)
+
+    @cached_property
+    def odds_ratios(self):
+        return self.stored("odds_ratios", ["dataset1"], lambda: analyses.odds_ratio_table(self.logit),
+                           model=RISK_MODEL)
+
+    @cached_property
+    def odds_ratios_per_minute(self):
+        rescale = {"seconds_after_rat_arrival": ("sec_minutes", 60.0)}
+        return self.stored("odds_ratios", ["dataset1"], lambda: analyses.odds_ratio_table(self.logit, rescale),
+                           model=RISK_MODEL, rescale=rescale)
+
+    @cached_property
+    def risk_prediction_curves(self):
+        return analyses.risk_prediction_curves(self.logit, self.d1)
+
+    # ---------- dataset2 ----------
+
+    @cached_property
+    def spearman_arrivals_landings(self):
+        return self._spearman("rat_arrival_number", "bat_landing_number")
+
+    @cached_property
+    def spearman_minutes_food(self):
+        return self._spearman("rat_minutes", "food_availability")
+
+    def _spearman(self, x, y):
+        found = self.stored("spearman", ["dataset2"],
+                            lambda: dict(zip(["rho", "p"], analyses.spearman(self.d2[x], self.d2[y]))), x=x, y=y)
+        return found["rho"], found["p"]
+
+    @cached_property
+    def effect_size_cis(self):
+        # the intervals do not depend on the number of workers, so it is not part of the key
+        return self.stored("bootstrap_ci", ["dataset1", "dataset2"],
+                           lambda: analyses.effect_size_cis(self.d1, self.d2, workers=self.workers),
+                           n_resamples=10_000, confidence=0.95, seed=0)
+
+    # ---------- seasonal ----------
+    # seasonal cells can be small, so these use small_sample's exact tests where they apply
+
+    @cached_property
+    def chi_risk_season(self):
+        return self.stored("chi_square", ["dataset1"], lambda: small_sample.chi_square_auto(
+            pd.crosstab(self.d1_seasons["season"], self.d1_seasons["risk"])), rows="season", columns="risk",
+            method="auto")
+
+    @cached_property
+    def chi_reward_season(self):
+        return self.stored("chi_square", ["dataset1"], lambda: small_sample.chi_square_auto(
+            pd.crosstab(self.d1_seasons["season"], self.d1_seasons["reward"])), rows="season", columns="reward",
+            method="auto")
+
+    @cached_property
+    def mann_whitney_season(self):
+        def compute():
+            d1 = self.d1_seasons
+            return _without_samples(small_sample.mann_whitney_auto(
+                d1.loc[d1["season"] == "winter", "bat_landing_to_food"].dropna(),
+                d1.loc[d1["season"] == "spring", "bat_landing_to_food"].dropna(),
+            ))
+        return self.stored("mann_whitney", ["dataset1"], compute, value="bat_landing_to_food", by="season",
+                           method="auto")
+
+    @cached_property
+    def spearman_by_season(self):
+        params = {"x": "rat_arrival_number", "y": "bat_landing_number", "method": "auto"}
+        seasons = ["winter", "spring"]
+        if self.store_path is not None and not self.recompute:
+            found = {s: self.store.get("spearman", {"dataset2": self.versions["dataset2"]}, f"season={s}", params)
+                     for s in seasons}
+            if all(found.values()):
+                return {s: (r["rho"], r["p"]) for s, r in found.items()}
+
+        table = small_sample.dispatch_spearman(self.d2_seasons, "season", params["x"], params["y"])
+        table = table.set_index("season")
+        nan = (float("nan"), float("nan"))
+        result = {season: tuple(table.loc[season, ["statistic", "p_value"]]) if season in table.index else nan
+                  for season in seasons}
+        if self.store_path is not None:
+            for season, (rho, p) in result.items():
+                method = table.loc[season, "method"] if season in table.index else "asymptotic"
+                self.store.put("spearman", {"dataset2": self.versions["dataset2"]},
+                               {"rho": rho, "p": p, "method": method}, f"season={season}", params)
+        return result
+
+    @cached_property
+    def seasonal_logit(self):
+        return analyses.fit_seasonal_risk_logit(self.d1_seasons)
+
+    @cached_property
+    def seasonal_odds_ratios(self):
+        return self.stored("odds_ratios", ["dataset1"], lambda: analyses.odds_ratio_table(self.seasonal_logit),
+                           model=SEASONAL_RISK_MODEL)
+
+    # ---------- outputs ----------
+
+    def _path(self, *parts):
+        path = os.path.join(self.out_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def figure_jobs(self, section):
+        """RenderJobs (see render_pool.py) for a plotting section."""
+        from render_pool import RenderJob
+
+        if section == "descriptive":
+            def path(name):
+                return self._path("plots", name)
+            return [
+                RenderJob("plot_landing_to_food_hist", path("d1_bat_landing_to_food_hist.png"),
+                          "d1", ["bat_landing_to_food"]),
+                RenderJob("plot_risk_reward_bar", path("d1_risk_vs_reward_bar.png"),
+                          args=(self.risk_reward_ct,)),
+                RenderJob("plot_seconds_after_rat_by_risk_box", path("d1_seconds_after_rat_arrival_by_risk_box.png"),
+                          "d1", ["seconds_after_rat_arrival", "risk"]),
+                RenderJob("plot_scatter", path("d2_rat_arrivals_vs_bat_landings_scatter.png"),
+                          "d2", ["rat_arrival_number", "bat_landing_number"],
+                          args=("rat_arrival_number", "bat_landing_number", "Rat arrivals vs Bat landings (dataset2)",
+                                "Rat arrival number (per 30 min)", "Bat landing number (per 30 min)")),
+                RenderJob("plot_scatter", path("d2_rat_minutes_vs_bat_landings_scatter.png"),
+                          "d2", ["rat_minutes", "bat_landing_number"],
+                          args=("rat_minutes", "bat_landing_number", "Rat minutes vs Bat landings (dataset2)",
+                                "Rat minutes (per 30 min)", "Bat landing number (per 30 min)")),
+                RenderJob("plot_scatter", path("d2_rat_minutes_vs_food_scatter.png"),
+                          "d2", ["rat_minutes", "food_availability"],
+                          args=("rat_minutes", "food_availability", "Rat minutes vs Food availability (dataset2)",
+                                "Rat minutes (per 30 min)", "Food availability")),
+            ]
+        if section == "plots":
+            def path(name):
+                return self._path("inferential_plots", name)
+            mw = {"p": self.mann_whitney["p"], "rank_biserial": self.mann_whitney["rank_biserial"]}
+            return [
+                RenderJob("plot_chi_counts", path("chi_counts_risk_reward.png"), args=(self.risk_reward_ct,)),
+                RenderJob("plot_chi_percent_stacked", path("chi_percent_stacked_risk_reward.png"),
+                          args=(self.risk_reward_ct,)),
+                RenderJob("plot_mannwhitney_box", path("mannwhitney_boxplot_landing_to_food_by_risk.png"),
+                          "d1", ["risk", "bat_landing_to_food"], args=(mw,)),
+                RenderJob("plot_logit_forest", path("logit_forest_odds_ratios.png"),
+                          args=(self.odds_ratios_per_minute,)),
+                RenderJob("plot_logit_pred_prob", path("logit_pred_prob_vs_minutes_by_season.png"),
+                          args=(self.risk_prediction_curves,)),
+                RenderJob("plot_correlation", path("corr_rat_arrivals_vs_bat_landings.png"),
+                          "d2", ["rat_arrival_number", "bat_landing_number"],
+                          args=("rat_arrival_number", "bat_landing_number", *self.spearman_arrivals_landings,
+                                "Rat arrivals vs Bat landings", "Rat arrival number (per 30 min)",
+                                "Bat landing number (per 30 min)")),
+                RenderJob("plot_correlation", path("corr_rat_minutes_vs_food.png"),
+                          "d2", ["rat_minutes", "food_availability"],
+                          args=("rat_minutes", "food_availability", *self.spearman_minutes_food,
+                                "Rat minutes vs Food availability", "Rat minutes (per 30 min)", "Food availability")),
+            ]
+        if section == "seasonal":
+            def path(name):
+                return self._path("seasonal_analysis", "figures", name)
+            style = {} if self.dpi is None else {"dpi": self.dpi}
+            return [
+                RenderJob("plot_risk_by_season", path("risk_by_season_bar.png"),
+                          "d1_seasons", ["season", "risk"], kwargs=style),
+                RenderJob("plot_landing_to_food_by_season", path("landing_to_food_boxplot.png"),
+                          "d1_seasons", ["season", "bat_landing_to_food"], kwargs=style),
+                RenderJob("plot_rat_vs_bat_scatter", path("rat_vs_bat_winter_scatter.png"),
+                          "d2_seasons", ["rat_arrival_number", "bat_landing_number"], where=("season", "winter"),
+                          args=("Winter: Rat Arrivals vs Bat Landings",), kwargs=style),
+                RenderJob("plot_correlation_heatmap", path("correlation_heatmap_dataset2.png"),
+                          "d2", ["bat_landing_number", "rat_arrival_number", "rat_minutes", "food_availability"],
+                          kwargs=style),
+            ]
+        return []
+
+    def render(self, sections):
+        """Draw the figures of every section in `sections` through one worker pool.
+
+        Figures whose data, style and figure code are unchanged since the last run are skipped.
+        """
+        jobs = [job for section in sections for job in self.figure_jobs(section)]
+        frames = {key: getattr(self, key) for key in {job.frame for job in jobs} if key is not None}
+        render_cached(jobs, frames, force=self.force, workers=self.workers, root=self.out_dir)
+
+    def print_descriptive(self):
+        print("=== Descriptive summaries ===")
+        print(f"dataset1_cleaned shape: {self.d1.shape}")
+        print(f"dataset2_cleaned shape: {self.d2.shape}\n")
+        for col in ["risk", "reward"]:
+            print(f"Value counts: {col}")
+            print(self.d1[col].value_counts(dropna=False), "\n")
+        print("Crosstab: risk vs reward")
+        print(self.risk_reward_ct, "\n")
+        print("Descriptive stats: bat_landing_to_food (seconds)")
+        print(self.d1["bat_landing_to_food"].describe(), "\n")
+        for col in ["bat_landing_number", "rat_arrival_number", "rat_minutes", "food_availability"]:
+            print(f"Descriptive stats: {col}")
+            print(self.d2[col].describe(), "\n")
+        d1, d2 = self.d1, self.d2
+        print("Mean landing-to-food time by risk (seconds):")
+        print(d1.groupby("risk")["bat_landing_to_food"].mean(), "\n")
+        print("Mean bat landings by rat arrival buckets:")
+        arrivals_bucket = pd.cut(d2["rat_arrival_number"], bins=[-1, 0, 1, 3, d2["rat_arrival_number"].max()],
+                                 labels=["0", "1", "2-3", "4+"])
+        print(d2.groupby(arrivals_bucket)["bat_landing_number"].mean(), "\n")
+        print("Mean food availability by rat minutes buckets:")
+        minutes_bucket = pd.cut(d2["rat_minutes"], bins=[-0.1, 0, 5, 30, d2["rat_minutes"].max()],
+                                labels=["0", "0-5", "5-30", "30+"])
+        print(d2.groupby(minutes_bucket)["food_availability"].mean(), "\n")
+        links = self.landing_links
+        print(f"Rat episodes in dataset1: {len(self.rat_episodes)}")
+        print("Landings per rat episode")
+        print(self.rat_episodes["landings"].describe(), "\n")
+        print(f"Landings inside a dataset2 window: {(links['window'] != -1).sum()} of {len(links)}\n")
+
+    def print_tests(self):
+        chi, mw, cis = self.chi_square, self.mann_whitney, self.effect_size_cis
+
+        def ci_text(name):
+            return f"95% CI [{cis[name]['ci_low']:.3f}, {cis[name]['ci_high']:.3f}]"
+
+        print("=== Inferential tests ===")
+        print(f"Chi-square risk x reward: chi2={chi['chi2']:.3f}, df={chi['dof']}, p={chi['p']:.6f}, "
+              f"Cramer's V={chi['cramers_v']:.3f} ({ci_text('cramers_v')})")
+        print(f"Mann–Whitney landing→food by risk: U={mw['u']:.1f}, p={mw['p']:.6f}, "
+              f"rank-biserial={mw['rank_biserial']:.3f} ({ci_text('rank_biserial')})")
+        print("Logit odds ratios (with 95% CI):")
+        print(self.odds_ratios)
+        rho1, p1 = self.spearman_arrivals_landings
+        rho2, p2 = self.spearman_minutes_food
+        print(f"Spearman rat arrivals vs bat landings: rho={rho1:.3f} ({ci_text('rho_arrivals_landings')}), p={p1:.6f}")
+        print(f"Spearman rat minutes vs food availability: rho={rho2:.3f} ({ci_text('rho_minutes_food')}), p={p2:.6f}\n")
+
+    def print_seasonal(self):
+        risk, reward, mw = self.chi_risk_season, self.chi_reward_season, self.mann_whitney_season
+        print("=== Seasonal analysis ===")
+        print(f"Chi-square (Risk vs Season): {risk['chi2']:.3f}, p={risk['p']:.4f}{small_sample.method_note(risk)}")
+        print(f"Chi-square (Reward vs Season): {reward['chi2']:.3f}, p={reward['p']:.4f}{small_sample.method_note(reward)}")
+        print(f"Mann–Whitney U (Landing Speed): U={mw['u']:.3f}, p={mw['p']:.4f}{small_sample.method_note(mw)}")
+        for season, (rho, p) in self.spearman_by_season.items():
+            print(f"Spearman ({season.title()}): rho={rho:.3f}, p={p:.4f}")
+        print("Seasonal logit odds ratios (with 95% CI):")
+        print(self.seasonal_odds_ratios, "\n")
+
+    def run(self, sections=SECTIONS):
+        printers = {
+            "descriptive": self.print_descriptive,
+            "tests": self.print_tests,
+            "seasonal": self.print_seasonal,
+        }
+        for section in sections:
+            if section in printers:
+                start = time.perf_counter()
+                with stage(section):
+                    printers[section]()
+                print(f"[{section}] done in {time.perf_counter() - start:.2f}s\n")
+
+        # All figures are independent once their inputs exist, so draw them in one batch
+        start = time.perf_counter()
+        with stage("figures"):
+            self.render(sections)
+        print(f"[figures] done in {time.perf_counter() - start:.2f}s\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the full report after loading the data once.")
+    parser.add_argument("--sections", nargs="+", choices=SECTIONS, default=SECTIONS)
+    parser.add_argument("--out-dir", default=BASE_DIR, help="root folder for figure output")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes used to draw figures (default: one per core, 1 = no pool)")
+    parser.add_argument("--dpi", type=int, default=None, help="dpi for the seasonal figures (default 300)")
+    parser.add_argument("--force", action="store_true", help="redraw every figure, ignoring the figure cache")
+    parser.add_argument("--recompute", action="store_true",
+                        help="recompute every test and model result instead of reading the results store")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    Report(args.out_dir, workers=args.workers, dpi=args.dpi, force=args.force,
+           recompute=args.recompute).run(args.sections)
+    print(f"Report complete in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,160 @@
+'''
+
+Bootstrap confidence intervals and permutation tests with vectorized resampling
+
+Instead of calling scipy once per resample, a whole block of resamples is drawn as one
+(resamples x rows) index matrix and the statistic is computed along the row axis for
+all of them at once. Blocks are sized so each one stays under a memory budget, and each
+block gets its own child seed from a SeedSequence. Results are therefore the same
+whether the blocks run in this process or across a process pool, and whatever the
+pool size. By default the blocks are spread over one process per core.
+
+Memory: a block holds its index matrix, the gathered columns and the ranks, about
+BYTES_PER_CELL bytes per (resample, row) cell, so blocks are sized to stay under
+MAX_BLOCK_BYTES. The floor is one resample per block: every statistic here ranks or
+counts a whole resample at once, so past MAX_BLOCK_BYTES / BYTES_PER_CELL rows (about
+two million) each worker needs roughly BYTES_PER_CELL * rows bytes, i.e. ~3 GB for a
+100M-row extract, whatever the number of resamples.
+
+Vectorized statistics (each takes arrays of shape (resamples, rows)):
+    cramers_v      two coded categorical columns -> Cramer's V (Yates for 2x2, as analyses.chi_square)
+    rank_biserial  values and 0/1 group codes -> 1 - 2U/(n0 n1), as analyses.mann_whitney
+    spearman       two numeric columns -> Spearman rho
+
+'''
+
+
+# Import libraries
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import stats
+
+# Largest index block held in memory at once
+MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+# Working memory per (resample, row) cell: int64 index, gathered columns and their ranks
+BYTES_PER_CELL = 8 * 4
+
+
+def cramers_v(rows, cols):
+    """Cramer's V for each resample; rows/cols are integer codes of shape (B, n)."""
+    n_r = int(rows.max()) + 1
+    n_c = int(cols.max()) + 1
+    b, n = rows.shape
+    cell = rows * n_c + cols + (np.arange(b) * n_r * n_c)[:, None]
+    observed = np.bincount(cell.ravel(), minlength=b * n_r * n_c).reshape(b, n_r, n_c).astype(float)
+    row_tot = observed.sum(axis=2, keepdims=True)
+    col_tot = observed.sum(axis=1, keepdims=True)
+    r_eff = (row_tot[:, :, 0] > 0).sum(axis=1)
+    c_eff = (col_tot[:, 0, :] > 0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        expected = row_tot * col_tot / n
+        diff = np.abs(observed - expected)
+        dof = (r_eff - 1) * (c_eff - 1)
+        diff = diff - np.minimum(0.5, diff) * (dof == 1)[:, None, None]
+        chi2 = np.where(expected > 0, diff ** 2 / expected, 0.0).sum(axis=(1, 2))
+        return np.sqrt(chi2 / n / (np.minimum(r_eff, c_eff) - 1))
+
+
+def rank_biserial(values, groups):
+    """Rank-biserial r of group 0 vs group 1 for each resample (shape (B, n))."""
+    ranks = stats.rankdata(values, axis=1)
+    in_0 = groups == 0
+    n0 = in_0.sum(axis=1)
+    n1 = values.shape[1] - n0
+    u = (ranks * in_0).sum(axis=1) - n0 * (n0 + 1) / 2.0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 1 - 2 * u / (n0 * n1)
+
+
+def spearman(x, y):
+    """Spearman rho for each resample (shape (B, n))."""
+    rx = stats.rankdata(x, axis=1)
+    ry = stats.rankdata(y, axis=1)
+    rx -= rx.mean(axis=1, keepdims=True)
+    ry -= ry.mean(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (rx * ry).sum(axis=1) / np.sqrt((rx ** 2).sum(axis=1) * (ry ** 2).sum(axis=1))
+
+
+STATISTICS = {"cramers_v": cramers_v, "rank_biserial": rank_biserial, "spearman": spearman}
+
+# Arrays shared with pool workers once, through the initializer, instead of per block
+_worker_arrays = None
+
+
+def _init_worker(arrays):
+    global _worker_arrays
+    _worker_arrays = arrays
+
+
+def _resample_block(kind, stat, seed, size, arrays=None):
+    arrays = _worker_arrays if arrays is None else arrays
+    stat = STATISTICS[stat] if isinstance(stat, str) else stat
+    rng = np.random.default_rng(seed)
+    n = len(arrays[0])
+    if kind == "bootstrap":
+        # resample whole rows, keeping the columns of each row together
+        idx = rng.integers(0, n, size=(size, n))
+        return stat(*(a[idx] for a in arrays))
+    # permutation: shuffle every column after the first against it, which breaks the association
+    idx = rng.permuted(np.broadcast_to(np.arange(n), (size, n)), axis=1)
+    first = np.broadcast_to(arrays[0], (size, n))
+    return stat(first, *(a[idx] for a in arrays[1:]))
+
+
+def _blocks(n_resamples, n_rows, block_size):
+    """Resamples per block; never fewer than one, however many rows (see the module docstring)."""
+    if block_size is None:
+        block_size = max(1, MAX_BLOCK_BYTES // (BYTES_PER_CELL * max(n_rows, 1)))
+    sizes = [block_size] * (n_resamples // block_size)
+    if n_resamples % block_size:
+        sizes.append(n_resamples % block_size)
+    return sizes
+
+
+def resample(kind, stat, arrays, n_resamples=10_000, seed=0, workers=None, block_size=None):
+    """Statistic over `n_resamples` bootstrap or permutation resamples, as one array.
+
+    `stat` is a name in STATISTICS or a vectorized callable. workers=None uses one process
+    per core and workers=1 runs every block in this process; a callable always runs here,
+    since only the named statistics can be sent to pool workers.
+    """
+    arrays = [np.asarray(a) for a in arrays]
+    sizes = _blocks(n_resamples, len(arrays[0]), block_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if not isinstance(stat, str):
+        workers = 1
+    workers = min(workers or os.cpu_count() or 1, len(sizes))
+    if workers == 1:
+        parts = [_resample_block(kind, stat, s, size, arrays) for s, size in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(arrays,)) as pool:
+            parts = list(pool.map(_resample_block, [kind] * len(sizes), [stat] * len(sizes), seeds, sizes))
+    return np.concatenate(parts)
+
+
+def bootstrap_ci(stat, arrays, n_resamples=10_000, confidence=0.95, seed=0, workers=None, block_size=None):
+    """Point estimate, percentile confidence interval and standard error of a statistic."""
+    arrays = [np.asarray(a) for a in arrays]
+    fn = STATISTICS[stat] if isinstance(stat, str) else stat
+    estimate = float(fn(*(a[None, :] for a in arrays))[0])
+    dist = resample("bootstrap", stat, arrays, n_resamples, seed, workers, block_size)
+    dist = dist[~np.isnan(dist)]
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(dist, [alpha, 1 - alpha])
+    return {"estimate": estimate, "ci_low": float(low), "ci_high": float(high),
+            "se": float(dist.std(ddof=1)), "n_resamples": int(len(dist))}
+
+
+def permutation_test(stat, arrays, n_resamples=10_000, seed=0, workers=None, block_size=None):
+    """Two-sided permutation p-value of a statistic (|null| >= |observed|, with the +1 correction)."""
+    arrays = [np.asarray(a) for a in arrays]
+    fn = STATISTICS[stat] if isinstance(stat, str) else stat
+    observed = float(fn(*(a[None, :] for a in arrays))[0])
+    null = resample("permutation", stat, arrays, n_resamples, seed, workers, block_size)
+    null = null[~np.isnan(null)]
+    p = (np.sum(np.abs(null) >= abs(observed) - 1e-12) + 1) / (len(null) + 1)
+    return {"observed": observed, "p_value": float(p), "n_resamples": int(len(null))}
@@ -0,0 +1,291 @@
+'''
+
+Persistent store of test and model results
+
+Every statistical output the report produces (chi-square, Mann–Whitney, Spearman, odds
+ratio tables, bootstrap intervals) is saved in an SQLite file,
+dataset_cleaned/results.sqlite, keyed by
+
+    analysis   what was computed ("chi_square", "mann_whitney", "spearman", ...)
+    version    the SHA-256 of each cleaned CSV it was computed from (data_access.dataset_version)
+    code       a SHA-256 over the source of the modules that compute results (CODE_MODULES)
+    subset     which rows were used ("all", "season=winter", ...)
+    params     the remaining arguments, as canonical JSON
+
+ResultStore.fetch() returns the stored result for a key and only calls the analysis
+when there is none, so the scripts and report_runner.py recompute a test only after the
+data, the analysis code or its parameters change. A result is saved twice: whole, as tagged JSON
+that restores the same dicts, tuples, arrays and DataFrames, and as one row per scalar
+field ("p", "cramers_v", "OR[season]", ...) in an indexed table, so a dashboard can
+ask for a single p-value of any past version without loading data or SciPy.
+
+Usage:
+    python results_store.py                                # latest result of everything, current code
+    python results_store.py --analysis chi_square --field p --all-versions
+
+'''
+
+
+# Import libraries
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from raw_cleaning import BASE_DIR, CLEAN_DIR
+
+STORE_PATH = os.path.join(CLEAN_DIR, "results.sqlite")
+
+# Modules whose code decides the stored results; editing any of them starts a new code version
+CODE_MODULES = ["analyses", "batch_tests", "small_sample", "resampling", "risk_model", "data_access",
+                "report_runner"]
+
+# Bump with every change to SCHEMA (kept in PRAGMA user_version)
+SCHEMA_VERSION = 2
+
+RESULTS_TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY,
+    analysis TEXT NOT NULL,
+    datasets TEXT NOT NULL,
+    version TEXT NOT NULL,
+    code TEXT NOT NULL,
+    subset TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result TEXT NOT NULL,
+    seconds REAL,
+    created REAL NOT NULL,
+    UNIQUE (analysis, version, code, subset, params)
+);
+"""
+
+SCHEMA = RESULTS_TABLE.format(name="results") + """
+CREATE TABLE IF NOT EXISTS result_values (
+    result_id INTEGER NOT NULL REFERENCES results(id) ON DELETE CASCADE,
+    field TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (result_id, field)
+);
+CREATE INDEX IF NOT EXISTS results_by_subset ON results (analysis, subset, created);
+CREATE INDEX IF NOT EXISTS values_by_field ON result_values (field);
+"""
+
+
+def _encode(obj):
+    """JSON-ready copy of a result; tagged objects keep tuples, arrays and frames distinct."""
+    if isinstance(obj, dict):
+        return {str(k): _encode(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return {"__tuple__": [_encode(v) for v in obj]}
+    if isinstance(obj, list):
+        return [_encode(v) for v in obj]
+    if isinstance(obj, pd.DataFrame):
+        return {"__frame__": {"index": [_encode(v) for v in obj.index], "index_name": obj.index.name,
+                              "columns": [str(c) for c in obj.columns],
+                              "data": [[_encode(v) for v in row] for row in obj.itertuples(index=False)]}}
+    if isinstance(obj, np.ndarray):
+        return {"__ndarray__": _encode(obj.tolist()), "dtype": obj.dtype.str}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    raise TypeError(f"cannot store a {type(obj).__name__} in the results store")
+
+
+def _decode(obj):
+    if isinstance(obj, list):
+        return [_decode(v) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+    if "__tuple__" in obj:
+        return tuple(_decode(v) for v in obj["__tuple__"])
+    if "__ndarray__" in obj:
+        return np.array(obj["__ndarray__"], dtype=obj["dtype"])
+    if "__frame__" in obj:
+        frame = obj["__frame__"]
+        return pd.DataFrame(frame["data"], columns=frame["columns"],
+                            index=pd.Index(frame["index"], name=frame["index_name"]))
+    return {k: _decode(v) for k, v in obj.items()}
+
+
+def _fields(obj, prefix=""):
+    """(field, value) for every scalar number in a result; arrays are left out."""
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield from _fields(v, f"{prefix}.{k}" if prefix else str(k))
+    elif isinstance(obj, (tuple, list)):
+        for i, v in enumerate(obj):
+            yield from _fields(v, f"{prefix}[{i}]")
+    elif isinstance(obj, pd.DataFrame):
+        for col in obj.columns:
+            for row, v in obj[col].items():
+                yield from _fields(v, f"{prefix}.{col}[{row}]" if prefix else f"{col}[{row}]")
+    elif isinstance(obj, (bool, int, float, np.number, np.bool_)):
+        yield prefix, float(obj)
+
+
+def _params_key(params):
+    return json.dumps(params or {}, sort_keys=True, separators=(",", ":"), default=str)
+
+
+@lru_cache(maxsize=None)
+def code_version(modules=tuple(CODE_MODULES)):
+    """SHA-256 over the source files of `modules` (read as files, so nothing is imported)."""
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(os.path.join(BASE_DIR, module + ".py"), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _version_key(versions):
+    """("dataset1,dataset2", "<sha1>,<sha2>") for a {name: sha256} mapping, in name order."""
+    names = sorted(versions)
+    return ",".join(names), ",".join(versions[n] for n in names)
+
+
+class ResultStore:
+    """Results keyed by (analysis, dataset version, code version, subset, params) in an SQLite file.
+
+    Lookups and saves use `code` (default: code_version() of the current checkout).
+    """
+
+    def __init__(self, path=STORE_PATH, code=None):
+        self.path = path
+        self.code = code or code_version()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._migrate()
+        self._conn.executescript(SCHEMA)
+
+    def _migrate(self):
+        """Bring a store written before the code column to SCHEMA_VERSION, keeping its results."""
+        (user_version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if user_version >= SCHEMA_VERSION:
+            return
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(results)")]
+        if columns and "code" not in columns:
+            # copy into a new table and swap it in (renaming the old one would rewrite the
+            # result_values foreign key); old results match no current code version
+            self._conn.execute("PRAGMA foreign_keys = OFF")
+            self._conn.executescript("BEGIN;" + RESULTS_TABLE.format(name="results_new") + """
+                INSERT INTO results_new (id, analysis, datasets, version, code, subset, params, result, seconds,
+                                         created)
+                SELECT id, analysis, datasets, version, '', subset, params, result, seconds, created FROM results;
+                DROP TABLE results;
+                ALTER TABLE results_new RENAME TO results;
+                COMMIT;""")
+            self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, analysis, versions, subset="all", params=None):
+        """The stored result for this key, or None."""
+        _, version = _version_key(versions)
+        row = self._conn.execute(
+            "SELECT result FROM results WHERE analysis = ? AND version = ? AND code = ? AND subset = ? AND params = ?",
+            (analysis, version, self.code, subset, _params_key(params))).fetchone()
+        return None if row is None else _decode(json.loads(row[0]))
+
+    def put(self, analysis, versions, result, subset="all", params=None, seconds=None):
+        """Save (or replace) the result for this key; returns it as get() will give it back."""
+        datasets, version = _version_key(versions)
+        params = _params_key(params)
+        encoded = json.dumps(_encode(result))
+        with self._conn:
+            self._conn.execute("DELETE FROM results WHERE analysis = ? AND version = ? AND code = ? AND subset = ? "
+                               "AND params = ?", (analysis, version, self.code, subset, params))
+            cur = self._conn.execute(
+                "INSERT INTO results (analysis, datasets, version, code, subset, params, result, seconds, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (analysis, datasets, version, self.code, subset, params, encoded, seconds, time.time()))
+            self._conn.executemany("INSERT INTO result_values (result_id, field, value) VALUES (?, ?, ?)",
+                                   [(cur.lastrowid, f, v) for f, v in _fields(result)])
+        return _decode(json.loads(encoded))
+
+    def fetch(self, analysis, versions, compute, subset="all", params=None, recompute=False):
+        """Stored result for this key; otherwise compute() it, save it and return it.
+
+        A fresh result is returned in its stored form (NumPy scalars become Python
+        numbers), so callers see the same values and types either way.
+        """
+        if not recompute:
+            found = self.get(analysis, versions, subset, params)
+            if found is not None:
+                return found
+        start = time.perf_counter()
+        result = compute()
+        return self.put(analysis, versions, result, subset, params, time.perf_counter() - start)
+
+    def query(self, analysis=None, subset=None, field=None, version=None, latest=True, code=None):
+        """Scalar fields of stored results as a long table (one row per field).
+
+        Filters are exact matches except `version`, which matches any dataset hash that
+        starts with it. With latest=True only the newest result per (analysis, subset,
+        params) is kept, among those of `code` when that is given.
+        """
+        where, args = [], []
+        for column, value in (("r.analysis", analysis), ("r.subset", subset), ("v.field", field),
+                              ("r.code", code)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+        if version is not None:
+            where.append("(',' || r.version) LIKE ?")
+            args.append(f"%,{version}%")
+        if latest:
+            where.append("r.created = (SELECT MAX(created) FROM results l WHERE l.analysis = r.analysis "
+                         "AND l.subset = r.subset AND l.params = r.params"
+                         + (" AND l.code = r.code)" if code is not None else ")"))
+        sql = ("SELECT r.analysis, r.subset, r.params, v.field, v.value, r.datasets, r.version, r.code, r.created "
+               "FROM results r JOIN result_values v ON v.result_id = r.id"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + " ORDER BY r.analysis, r.subset, r.params, r.created, v.rowid")
+        table = pd.read_sql_query(sql, self._conn, params=args)
+        table["created"] = pd.to_datetime(table["created"], unit="s").dt.floor("s")
+        return table
+
+
+def current_versions(names=("dataset1", "dataset2")):
+    """{name: sha256} of the cleaned CSVs as they are now."""
+    from data_access import dataset_version
+
+    return {name: dataset_version(name) for name in names}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Look up stored test and model results.")
+    parser.add_argument("--analysis", default=None, help="e.g. chi_square, mann_whitney, spearman, odds_ratios")
+    parser.add_argument("--subset", default=None, help='e.g. all or "season=winter"')
+    parser.add_argument("--field", default=None, help="e.g. p, chi2, cramers_v, OR[season]")
+    parser.add_argument("--version", default=None, help="dataset SHA-256 (or a prefix of it)")
+    parser.add_argument("--all-versions", action="store_true",
+                        help="include results of older dataset and code versions")
+    parser.add_argument("--path", default=STORE_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with ResultStore(args.path) as store:
+        found = store.query(args.analysis, args.subset, args.field, args.version, latest=not args.all_versions,
+                            code=None if args.all_versions else store.code)
+    found["version"] = found["version"].map(lambda v: ",".join(h[:12] for h in v.split(",")))
+    found["code"] = found["code"].str[:12]
+    with pd.option_context("display.width", 200, "display.max_rows", None, "display.max_colwidth", 80):
+        print(found.to_string(index=False) if len(found) else "No stored results match.")
+    print(f"{len(found)} values in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,212 @@
+'''
+
+Fast logistic regression for the risk models
+
+The scripts used to fit every risk model through a statsmodels formula, which parses the
+formula and rebuilds the design matrix on each call. Here the design is built once, with
+sparse treatment (one-hot) columns for categorical terms such as season, habit or month,
+and any number of fits then reuse it: one fit on all rows, one per site or month group,
+or one per rolling window. Fits run Newton–Raphson on the log-likelihood, and a fit can
+start from earlier coefficients (by default the previous group's) instead of from zero.
+
+A LogitFit has params, bse, pvalues, conf_int(), predict() and summary(), with the same
+term names patsy would give (Intercept, C(season)[T.1], seconds_after_rat_arrival), so
+analyses.odds_ratio_table() prints the same odds-ratio table as before.
+
+'''
+
+
+# Import libraries
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+from scipy.special import expit, xlogy
+
+
+class ConvergenceWarning(UserWarning):
+    """Newton–Raphson stopped at max_iter (as statsmodels' warning of the same name)."""
+
+
+class Design:
+    """Sparse design matrix: Intercept, then treatment columns for `categorical`, then `numeric`.
+
+    Column order and names follow patsy, so C(season) comes before numeric terms and the
+    first category is the reference level. Rows with a missing value in any term are
+    dropped; `index` holds the labels of the rows that were kept.
+    """
+
+    def __init__(self, df, numeric=(), categorical=(), intercept=True):
+        self.numeric = list(numeric)
+        self.categorical = list(categorical)
+        self.intercept = intercept
+        self.levels = {}
+        for col in self.categorical:
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                levels = list(series.cat.categories)
+            else:
+                levels = sorted(series.dropna().unique())
+            self.levels[col] = levels
+        self.names = (["Intercept"] if intercept else []) + [
+            f"C({col})[T.{level}]" for col in self.categorical for level in self.levels[col][1:]
+        ] + self.numeric
+        self.X, self.index = self.transform(df)
+
+    def transform(self, df):
+        """Encode another frame with this design's levels. Returns (csr matrix, kept index)."""
+        used = self.categorical + self.numeric
+        keep = df[used].notna().all(axis=1).to_numpy()
+        df = df.loc[keep]
+        n = len(df)
+        rows = np.arange(n)
+        blocks = []
+        if self.intercept:
+            blocks.append(sparse.csr_matrix(np.ones((n, 1))))
+        for col in self.categorical:
+            levels = self.levels[col]
+            codes = pd.Categorical(df[col], categories=levels).codes
+            if (codes < 0).any():
+                raise ValueError(f"{col} has levels not seen when the design was built")
+            hit = codes > 0
+            blocks.append(sparse.csr_matrix((np.ones(hit.sum()), (rows[hit], codes[hit] - 1)),
+                                            shape=(n, len(levels) - 1)))
+        if self.numeric:
+            blocks.append(sparse.csr_matrix(df[self.numeric].to_numpy(dtype=float)))
+        return sparse.hstack(blocks, format="csr"), df.index
+
+    def group_rows(self, keys):
+        """Positional rows of the design for each value of `keys` (a Series aligned to the data)."""
+        keys = pd.Series(keys).loc[self.index]
+        return {key: np.asarray(rows) for key, rows in keys.groupby(keys, observed=True, sort=True).indices.items()}
+
+
+class LogitFit:
+    """Result of one logistic regression fit (the parts of a statsmodels result the repo uses)."""
+
+    def __init__(self, design, cols, beta, cov, llf, llnull, nobs, y_name, n_iter, converged):
+        self.design = design
+        self.cols = cols
+        names = [design.names[i] for i in cols]
+        self.params = pd.Series(beta, index=names)
+        self.cov_params = pd.DataFrame(cov, index=names, columns=names)
+        self.bse = pd.Series(np.sqrt(np.diag(cov)), index=names)
+        self.tvalues = self.params / self.bse
+        self.pvalues = pd.Series(2 * stats.norm.sf(np.abs(self.tvalues)), index=names)
+        self.llf, self.llnull, self.nobs = llf, llnull, nobs
+        self.df_model = len(cols) - int(design.intercept)
+        self.y_name, self.n_iter, self.converged = y_name, n_iter, converged
+
+    @property
+    def prsquared(self):
+        return 1 - self.llf / self.llnull
+
+    @property
+    def llr_pvalue(self):
+        return stats.chi2.sf(2 * (self.llf - self.llnull), self.df_model)
+
+    def conf_int(self, alpha=0.05):
+        z = stats.norm.ppf(1 - alpha / 2)
+        return pd.DataFrame({0: self.params - z * self.bse, 1: self.params + z * self.bse})
+
+    def predict(self, df):
+        X, _ = self.design.transform(df)
+        return expit(X[:, self.cols] @ self.params.to_numpy())
+
+    def summary(self):
+        ci = self.conf_int()
+        lines = [
+            "Logit Regression Results",
+            f"Dep. Variable: {self.y_name:>20}   No. Observations: {self.nobs:>10}",
+            f"Df Model: {self.df_model:>25}   Df Residuals: {self.nobs - len(self.cols):>14}",
+            f"Pseudo R-squ.: {self.prsquared:>20.4f}   Log-Likelihood: {self.llf:>12.2f}",
+            f"converged: {str(self.converged):>24}   LL-Null: {self.llnull:>19.2f}",
+            f"iterations: {self.n_iter:>23}   LLR p-value: {self.llr_pvalue:>15.4g}",
+            "",
+            f"{'':<32}{'coef':>10}{'std err':>10}{'z':>10}{'P>|z|':>10}{'[0.025':>10}{'0.975]':>10}",
+        ]
+        for name in self.params.index:
+            lines.append(f"{name:<32}{self.params[name]:>10.4f}{self.bse[name]:>10.3f}"
+                         f"{self.tvalues[name]:>10.3f}{self.pvalues[name]:>10.3f}"
+                         f"{ci.loc[name, 0]:>10.3f}{ci.loc[name, 1]:>10.3f}")
+        return "\n".join(lines)
+
+
+def fit_logit(design, y, rows=None, start=None, max_iter=35, tol=1e-8, y_name="risk"):
+    """Newton–Raphson logit of 0/1 `y` (aligned to the design's data) on the design's columns.
+
+    `rows` restricts the fit to positional rows of the design; columns that are constant
+    over those rows (a level absent from a group, or the only level present) are left out
+    of that fit. `start` is a coefficient Series to warm-start from; terms missing from it
+    start at zero.
+
+    A fit that has not converged after max_iter steps (perfect separation, or one outcome
+    only) is still returned, with converged=False, and a ConvergenceWarning is issued.
+    """
+    y = np.asarray(pd.Series(y).loc[design.index], dtype=float)
+    X = design.X
+    if rows is not None:
+        X, y = X[rows], y[rows]
+    varies = (X.max(axis=0).toarray() != X.min(axis=0).toarray()).ravel()
+    if design.intercept:
+        varies[0] = True
+    cols = np.flatnonzero(varies)
+    X = X[:, cols]
+    names = [design.names[i] for i in cols]
+    beta = np.zeros(len(cols))
+    if start is not None:
+        beta = pd.Series(start).reindex(names).fillna(0.0).to_numpy(dtype=float)
+
+    converged = False
+    for n_iter in range(1, max_iter + 1):
+        p = expit(X @ beta)
+        hessian = (X.T @ X.multiply((p * (1 - p))[:, None])).toarray()
+        step = np.linalg.solve(hessian, X.T @ (y - p))
+        beta = beta + step
+        if np.max(np.abs(step)) < tol:
+            converged = True
+            break
+
+    eta = X @ beta
+    p = expit(eta)
+    cov = np.linalg.inv((X.T @ X.multiply((p * (1 - p))[:, None])).toarray())
+    llf = float(np.sum(y * eta - np.logaddexp(0, eta)))
+    ybar = y.mean()
+    # xlogy(0, 0) is 0, so a constant outcome gives llnull = 0 rather than log(0) warnings
+    llnull = float(len(y) * (xlogy(ybar, ybar) + xlogy(1 - ybar, 1 - ybar)))
+    if not converged:
+        warnings.warn(f"logit of {y_name} did not converge in {max_iter} iterations "
+                      "(perfect separation or a single outcome?)", ConvergenceWarning, stacklevel=2)
+    return LogitFit(design, cols, beta, cov, llf, llnull, len(y), y_name, n_iter, converged)
+
+
+def fit_many(design, y, row_sets, warm_start=True, **kwargs):
+    """Fit one model per entry of `row_sets` ({key: positional rows}, in order).
+
+    With warm_start each fit starts from the previous fit's coefficients, which suits
+    rolling windows and similar groups. Groups whose fit fails or does not converge (too
+    few rows, one outcome only, perfect separation) map to None, without a warning each.
+    """
+    fits = {}
+    start = kwargs.pop("start", None)
+    for key, rows in row_sets.items():
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", ConvergenceWarning)
+                fit = fit_logit(design, y, rows=rows, start=start, **kwargs)
+        except np.linalg.LinAlgError:
+            fit = None
+        if fit is not None and (not fit.converged or not np.isfinite(fit.params).all()):
+            fit = None
+        fits[key] = fit
+        if warm_start and fit is not None:
+            start = fit.params
+    return fits
+
+
+def window_rows(design, order, window, step=None):
+    """Positional rows of consecutive windows of `window` rows after sorting by `order`."""
+    order = np.argsort(np.asarray(pd.Series(order).loc[design.index]), kind="stable")
+    step = step or window
+    return {start: order[start:start + window] for start in range(0, max(len(order) - window, 0) + 1, step)}
@@ -0,0 +1,246 @@
+'''
+
+Sliding-window statistics over the whole observation timeline
+
+The seasonal analysis compares two fixed buckets (winter, spring). For monitoring the
+same measures are computed over sliding windows instead, e.g. 14-day windows stepping
+one day: risk-taking rate and median landing-to-food time from dataset1's irregular
+landings, and the Spearman correlation of rat arrivals and bat landings from
+dataset2's 30-minute windows.
+
+The timeline is cut into blocks of one step each, and a window is `width / step`
+consecutive blocks. Every statistic is kept as a running total over blocks (a prefix
+sum, or a cumulative histogram), so a window is the total at its last block minus the
+total before its first: the rows entering at one edge are added and the rows leaving
+at the other are subtracted, and no window is recomputed from its rows. All windows
+are evaluated at once with NumPy, with no Python loop over windows.
+
+    rolling_rate(times, flags)          share of 1s per window (risk-taking rate)
+    rolling_median(times, values)       exact median per window, via value histograms
+    rolling_spearman(times, x, y)       Spearman rho with tie-corrected ranks, via joint counts
+    rolling_summary(d1, d2)             all of the above on the cleaned datasets
+
+'''
+
+
+# Import libraries
+import numpy as np
+import pandas as pd
+
+# Largest (windows x cells) block of counts, or of gathered values, held in memory at once
+MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+# Value bins used to locate each window's median before the exact lookup
+MEDIAN_BINS = 1024
+
+
+def window_blocks(times, width="14D", step="1D", origin=None, end=None):
+    """Block layout of a sorted timeline from `origin` to `end` (default: the data's own span).
+
+    Returns (starts, bounds, k): the start time of every window, the row offset where
+    each block begins (len = blocks + 1) and the number of blocks per window. Window w
+    covers rows bounds[w]:bounds[w + k].
+    """
+    width, step = pd.Timedelta(width), pd.Timedelta(step)
+    if width % step:
+        raise ValueError(f"window width {width} is not a whole number of steps ({step})")
+    k = width // step
+    times = pd.DatetimeIndex(times)
+    origin = times.min().floor(step) if origin is None else pd.Timestamp(origin)
+    end = times.max() if end is None else pd.Timestamp(end)
+    blocks = max(int((end - origin) // step) + 1, k)
+    edges = pd.date_range(origin, periods=blocks + 1, freq=step)
+    bounds = np.searchsorted(times.asi8, edges.as_unit(times.unit).asi8, side="left")
+    starts = edges[:blocks - k + 1]
+    return starts, bounds, k
+
+
+def _frame(starts, width, **columns):
+    return pd.DataFrame({"start": starts, "end": starts + pd.Timedelta(width), **columns})
+
+
+def _sorted(times, *columns):
+    """Rows ordered by time (stable), dropping rows where any column is missing."""
+    times = pd.DatetimeIndex(times)
+    arrays = [np.asarray(c, dtype=float) for c in columns]
+    keep = ~np.isnat(times.to_numpy())
+    for a in arrays:
+        keep &= ~np.isnan(a)
+    order = np.argsort(times.asi8[keep], kind="stable")
+    return times[keep][order], [a[keep][order] for a in arrays]
+
+
+def rolling_rate(times, flags, width="14D", step="1D", origin=None, end=None):
+    """Rows and mean of a 0/1 column per window, from one prefix sum."""
+    times, (flags,) = _sorted(times, flags)
+    starts, bounds, k = window_blocks(times, width, step, origin, end)
+    prefix = np.concatenate([[0.0], np.cumsum(flags)])
+    lo, hi = bounds[:-k], bounds[k:]
+    n = hi - lo
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = (prefix[hi] - prefix[lo]) / n
+    return _frame(starts, width, n=n, rate=np.where(n > 0, rate, np.nan))
+
+
+def _kth(values, key, n, hist, lo, hi, k, constant):
+    """k-th smallest value (0-based) in rows lo:hi of each window.
+
+    The cumulative histograms find the bin holding it and its rank within the bin; the
+    rows of that bin inside the window are a contiguous slice of `key`. A bin holding a
+    single value (`constant`) answers directly; other slices are gathered and sorted,
+    shortest first, in groups of at most MAX_BLOCK_BYTES.
+    """
+    cum = np.cumsum(hist, axis=1)
+    b = (cum <= k[:, None]).sum(axis=1)
+    rank = k - np.where(b > 0, cum[np.arange(len(k)), np.maximum(b - 1, 0)], 0)
+    first = np.searchsorted(key, b * n + lo)
+    span = np.searchsorted(key, b * n + hi) - first
+    out = values[first]
+    todo = np.flatnonzero(~constant[b])
+    todo = todo[np.argsort(span[todo], kind="stable")]
+    budget = max(1, MAX_BLOCK_BYTES // 8)
+    s = 0
+    while s < len(todo):
+        # spans only grow along todo, so the group's slab is (windows so far) x (last span)
+        cost = np.arange(1, len(todo) - s + 1) * span[todo[s:]]
+        e = s + max(1, int(np.searchsorted(cost, budget, side="right")))
+        w = todo[s:e]
+        cols = np.arange(span[w[-1]])
+        take = first[w, None] + cols
+        slab = np.where(cols < span[w, None], values[np.minimum(take, len(values) - 1)], np.inf)
+        slab.sort(axis=1)
+        out[w] = slab[np.arange(len(w)), rank[w]]
+        s = e
+    return out
+
+
+def rolling_median(times, values, width="14D", step="1D", origin=None, end=None):
+    """Rows and exact median of a numeric column per window (mean of the middle two for even counts)."""
+    times, (values,) = _sorted(times, values)
+    starts, bounds, k = window_blocks(times, width, step, origin, end)
+    n = len(values)
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, MEDIAN_BINS + 1)[1:-1])) if n else np.array([])
+    bins = np.searchsorted(edges, values, side="right")
+    n_bins = len(edges) + 1
+    # rows grouped by bin, then by position: any (bin, row range) is a contiguous slice
+    order = np.lexsort((np.arange(n), bins))
+    key = bins[order].astype(np.int64) * n + order
+    by_bin = values[order]
+    low_value, high_value = np.full(n_bins, np.inf), np.full(n_bins, -np.inf)
+    np.minimum.at(low_value, bins, values)
+    np.maximum.at(high_value, bins, values)
+    constant = low_value == high_value
+
+    block = np.searchsorted(bounds, np.arange(n), side="right") - 1
+    blocks = len(bounds) - 1
+    counts = np.bincount(block * n_bins + bins, minlength=blocks * n_bins).reshape(blocks, n_bins)
+    cumulative = np.vstack([np.zeros((1, n_bins), dtype=np.int64), np.cumsum(counts, axis=0)])
+
+    windows = blocks - k + 1
+    lo, hi = bounds[:windows], bounds[k:k + windows]
+    size = hi - lo
+    median = np.full(windows, np.nan)
+    step_rows = max(1, MAX_BLOCK_BYTES // (8 * n_bins))
+    for s in range(0, windows, step_rows):
+        w = np.arange(s, min(s + step_rows, windows))
+        w = w[size[w] > 0]
+        if not len(w):
+            continue
+        hist = cumulative[w + k] - cumulative[w]
+        low = _kth(by_bin, key, n, hist, lo[w], hi[w], (size[w] - 1) // 2, constant)
+        high = _kth(by_bin, key, n, hist, lo[w], hi[w], size[w] // 2, constant)
+        median[w] = (low + high) / 2
+    return _frame(starts, width, n=size, median=median)
+
+
+def _spearman_from_counts(joint, px, py, nx, ny):
+    """Tie-corrected Spearman rho per row of a (windows x pairs) count matrix."""
+    from scipy import sparse
+
+    pairs = joint.shape[1]
+    ones = np.ones(pairs)
+    to_x = sparse.csr_matrix((ones, (np.arange(pairs), px)), shape=(pairs, nx))
+    to_y = sparse.csr_matrix((ones, (np.arange(pairs), py)), shape=(pairs, ny))
+    cx = np.asarray((to_x.T @ joint.T).T)
+    cy = np.asarray((to_y.T @ joint.T).T)
+    # midrank of each level within each window
+    rx = np.cumsum(cx, axis=1) - (cx - 1) / 2
+    ry = np.cumsum(cy, axis=1) - (cy - 1) / 2
+    n = joint.sum(axis=1)
+    mean = ((n + 1) / 2)[:, None]
+    dx, dy = rx - mean, ry - mean
+    cov = (joint * dx[:, px] * dy[:, py]).sum(axis=1)
+    var_x = (cx * dx ** 2).sum(axis=1)
+    var_y = (cy * dy ** 2).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return n, cov / np.sqrt(var_x * var_y)
+
+
+def rolling_spearman(times, x, y, width="14D", step="1D", origin=None, end=None):
+    """Rows, Spearman rho and its two-sided p-value per window.
+
+    Each window's joint counts of (x, y) values come from cumulative per-block counts,
+    so this suits count columns with a limited number of distinct pairs (rat arrivals,
+    bat landings); memory grows with windows x distinct pairs, handled in blocks.
+    """
+    from scipy import stats
+
+    times, (x, y) = _sorted(times, x, y)
+    starts, bounds, k = window_blocks(times, width, step, origin, end)
+    ux, xi = np.unique(x, return_inverse=True)
+    uy, yi = np.unique(y, return_inverse=True)
+    pair_codes, pair = np.unique(xi.astype(np.int64) * len(uy) + yi, return_inverse=True)
+    px, py = pair_codes // len(uy), pair_codes % len(uy)
+    n_pairs = len(pair_codes)
+
+    block = np.searchsorted(bounds, np.arange(len(x)), side="right") - 1
+    blocks = len(bounds) - 1
+    counts = np.bincount(block * n_pairs + pair, minlength=blocks * n_pairs).reshape(blocks, n_pairs)
+    cumulative = np.vstack([np.zeros((1, n_pairs), dtype=np.int64), np.cumsum(counts, axis=0)])
+
+    windows = blocks - k + 1
+    n = np.zeros(windows, dtype=np.int64)
+    rho = np.full(windows, np.nan)
+    step_rows = max(1, MAX_BLOCK_BYTES // (8 * max(n_pairs, len(ux), len(uy)) * 4))
+    for s in range(0, windows, step_rows):
+        w = np.arange(s, min(s + step_rows, windows))
+        joint = (cumulative[w + k] - cumulative[w]).astype(float)
+        n[w], rho[w] = _spearman_from_counts(joint, px, py, len(ux), len(uy))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = rho * np.sqrt((n - 2) / (1 - rho ** 2))
+    p = np.where(n > 2, 2 * stats.t.sf(np.abs(t), np.maximum(n - 2, 1)), np.nan)
+    return _frame(starts, width, n=n, rho=rho, p=p)
+
+
+def rolling_summary(d1, d2, width="14D", step="1D"):
+    """Per-window risk rate, median landing-to-food time and arrivals/landings Spearman.
+
+    Both datasets are cut on one timeline covering either's data, so their windows line up.
+    """
+    origin = min(d1["start_time"].min(), d2["time"].min()).floor(pd.Timedelta(step))
+    end = max(d1["start_time"].max(), d2["time"].max())
+    risk = rolling_rate(d1["start_time"], d1["risk"].astype(float), width, step, origin, end)
+    food = rolling_median(d1["start_time"], d1["bat_landing_to_food"], width, step, origin, end)
+    corr = rolling_spearman(d2["time"], d2["rat_arrival_number"], d2["bat_landing_number"],
+                            width, step, origin, end)
+    summary = risk.rename(columns={"n": "landings", "rate": "risk_rate"})
+    summary["median_landing_to_food"] = food["median"]
+    summary["windows_d2"] = corr["n"]
+    summary["rho_arrivals_landings"] = corr["rho"]
+    summary["p_arrivals_landings"] = corr["p"]
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from data_access import load_datasets
+
+    parser = argparse.ArgumentParser(description="Sliding-window risk rate, median and Spearman over the timeline.")
+    parser.add_argument("--width", default="14D", help="window length, e.g. 14D or 7D")
+    parser.add_argument("--step", default="1D", help="distance between window starts")
+    args = parser.parse_args()
+
+    d1, d2 = load_datasets()
+    with pd.option_context("display.width", 160, "display.max_rows", 400):
+        print(rolling_summary(d1, d2, args.width, args.step).to_string(index=False, float_format="%.3f"))
@@ -9,13 +9,22 @@ Description:
     based on the official Project and Data Brief.
 """
 
+import os
+import sys
 import pandas as pd
-from scipy.stats import chi2_contingency, mannwhitneyu, spearmanr
-import statsmodels.formula.api as smf
+
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from analyses import fit_seasonal_risk_logit
+from data_access import load_datasets, season_from_month, season_names
+from report_runner import Report
+from small_sample import method_note
+
+# Tests are read from the results store when they were already computed on this data
+report = Report()
 
 # Load Cleaned Datasets
-d1 = pd.read_csv('../dataset_cleaned/dataset1_cleaned.csv')
-d2 = pd.read_csv('../dataset_cleaned/dataset2_cleaned.csv')
+d1, d2 = load_datasets()
 
 print("Datasets loaded successfully!")
 print(f"Dataset1 shape: {d1.shape}")
@@ -24,36 +33,25 @@ print(f"Dataset2 shape: {d2.shape}")
 # Map numeric seasons in dataset1 to actual names
 # (0 = winter, 1 = spring)
 if 'season' in d1.columns:
-    d1['season'] = d1['season'].map({0: 'winter', 1: 'spring'})
+    d1 = d1.assign(season=season_names(d1['season']))
 else:
     print("No 'season' column found in dataset1 — please verify column names.")
 
 # Convert numeric months in dataset2 and assign seasons
 # (Winter = June–August & Spring = September–November)
-def month_to_season(m):
-    try:
-        if int(m) in [5, 6, 7]:
-            return 'winter'
-        elif int(m) in [8, 9, 10]:
-            return 'spring'
-        else:
-            return None
-    except:
-        return None
-
-d2['season'] = d2['month'].apply(month_to_season)
+d2 = d2.assign(season=season_from_month(d2['month']))
 
 # Chi-Square: Risk vs Season
 print("\n=== Chi-Square: Risk vs Season ===")
-cont_risk = pd.crosstab(d1['season'], d1['risk'])
-chi2_risk, p_risk, _, _ = chi2_contingency(cont_risk)
-print(f"Chi-square = {chi2_risk:.3f}, p = {p_risk:.4f}")
+chi_risk = report.chi_risk_season
+chi2_risk, p_risk = chi_risk['chi2'], chi_risk['p']
+print(f"Chi-square = {chi2_risk:.3f}, p = {p_risk:.4f}{method_note(chi_risk)}")
 
 # Chi-Square: Reward vs Season
 print("\n=== Chi-Square: Reward vs Season ===")
-cont_reward = pd.crosstab(d1['season'], d1['reward'])
-chi2_reward, p_reward, _, _ = chi2_contingency(cont_reward)
-print(f"Chi-square = {chi2_reward:.3f}, p = {p_reward:.4f}")
+chi_reward = report.chi_reward_season
+chi2_reward, p_reward = chi_reward['chi2'], chi_reward['p']
+print(f"Chi-square = {chi2_reward:.3f}, p = {p_reward:.4f}{method_note(chi_reward)}")
 
 # Mann–Whitney U: Landing Speed (Winter vs Spring)
 print("\n=== Mann–Whitney U: Landing Time ===")
@@ -63,21 +61,26 @@ spring = d1[d1['season'] == 'spring']
 winter_times = pd.to_numeric(winter['bat_landing_to_food'], errors='coerce').dropna()
 spring_times = pd.to_numeric(spring['bat_landing_to_food'], errors='coerce').dropna()
 
-if len(winter_times) > 10 and len(spring_times) > 10:
-    u_stat, p_val = mannwhitneyu(winter_times, spring_times, alternative='two-sided')
-    print(f"Mann–Whitney U = {u_stat:.3f}, p = {p_val:.4f}")
+# Small samples get the exact distribution of U instead of the normal approximation
+if len(winter_times) > 0 and len(spring_times) > 0:
+    mw = report.mann_whitney_season
+    u_stat, p_val = mw['u'], mw['p']
+    print(f"Mann–Whitney U = {u_stat:.3f}, p = {p_val:.4f}{method_note(mw)}")
 else:
-    print(f"Not enough valid samples for Mann–Whitney test. Winter={len(winter_times)}, Spring={len(spring_times)}")
+    print(f"No valid samples for Mann–Whitney test. Winter={len(winter_times)}, Spring={len(spring_times)}")
+    mw = {}
     u_stat, p_val = float('nan'), float('nan')
 
 # Spearman Correlation: Rat arrivals vs Bat landings per season
 print("\n=== Spearman Correlations (Dataset2) ===")
 results_corr = []
 
+# Every season's correlation in one batched pass (or from the results store)
+by_season = report.spearman_by_season
+
 for season in ['winter', 'spring']:
-    sub = d2[d2['season'] == season]
-    if not sub.empty:
-        corr, p_corr = spearmanr(sub['rat_arrival_number'], sub['bat_landing_number'])
+    if (d2['season'] == season).any():
+        corr, p_corr = by_season[season]
         results_corr.append((season, corr, p_corr))
         print(f"{season.capitalize()} → Spearman ρ = {corr:.3f}, p = {p_corr:.4f}")
     else:
@@ -87,19 +90,20 @@ for season in ['winter', 'spring']:
 # Logistic Regression to add analytical depth
 print("\n=== Logistic Regression: Risk ~ Season + Rat Presence + Hours After Sunset ===")
 try:
-    model = smf.logit('risk ~ C(season) + seconds_after_rat_arrival + hours_after_sunset', data=d1).fit()
+    model = fit_seasonal_risk_logit(d1)
     print(model.summary())
 except Exception as e:
     print("Logistic regression could not be computed:", e)
 
 # Save Results to Summary File
-with open('seasonal_results_summary.txt', 'w') as f:
+SUMMARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seasonal_results_summary.txt')
+with open(SUMMARY_PATH, 'w') as f:
     f.write("=== Seasonal Analysis Results ===\n\n")
-    f.write(f"Chi-square (Risk vs Season): {chi2_risk:.3f}, p={p_risk:.4f}\n")
-    f.write(f"Chi-square (Reward vs Season): {chi2_reward:.3f}, p={p_reward:.4f}\n")
-    f.write(f"Mann–Whitney U (Landing Speed): U={u_stat:.3f}, p={p_val:.4f}\n\n")
+    f.write(f"Chi-square (Risk vs Season): {chi2_risk:.3f}, p={p_risk:.4f}{method_note(chi_risk)}\n")
+    f.write(f"Chi-square (Reward vs Season): {chi2_reward:.3f}, p={p_reward:.4f}{method_note(chi_reward)}\n")
+    f.write(f"Mann–Whitney U (Landing Speed): U={u_stat:.3f}, p={p_val:.4f}{method_note(mw)}\n\n")
     for s, c, p in results_corr:
         f.write(f"Spearman ({s.title()}): rho={c:.3f}, p={p:.4f}\n")
     f.write("\nLogistic regression summary printed in console.\n")
 
-print("\nResults saved to seasonal_results_summary.txt")
+print(f"\nResults saved to {SUMMARY_PATH}")
@@ -0,0 +1,368 @@
+'''
+
+Local HTTP service answering analysis queries from warm in-memory data
+
+Dashboards used to run the scripts and read their stdout, paying for the imports, the
+data load and the model fit on every query. This service does that work once at
+startup (both cleaned datasets with season names, SciPy, the fitted risk logit) and
+then answers small JSON queries over an asyncio server:
+
+    GET /crosstab?row=risk&col=reward&site=A&season=winter
+        counts and a chi-square test (Fisher's exact test for sparse 2x2 tables)
+    GET /spearman?x=rat_minutes&y=food_availability&month=march
+        Spearman rho and p (exact permutation test for small subsets)
+    GET /mann_whitney?value=bat_landing_to_food&by=risk&season=spring
+        Mann–Whitney U between the two levels of `by` (exact for small subsets)
+    GET /predict?minutes=5&season=winter
+        P(risk=1) from the fitted logit at N minutes after rat arrival
+    GET /health
+        rows per dataset and cache counters
+
+Every query accepts the filters site, season (winter/spring) and month (a month name,
+or the datasets' own month code, which counts from December: 0 = December, 1 = January,
+3 = March, ...) and, for crosstab and spearman, dataset=dataset1 or dataset2. warm()
+drops rows whose month code disagrees with their timestamp (validation.py rule
+month_matches_time), so month=march selects March's rows; /health reports how many.
+The tests run on a thread pool so a slow query never blocks the event loop, and
+finished results sit in a bounded LRU keyed by the normalized query; concurrent
+identical queries share one computation.
+
+Usage:
+    python service.py                    # http://127.0.0.1:8765
+    python service.py --port 9000 --cache-size 4096 --workers 4
+
+'''
+
+
+# Import libraries
+import asyncio
+import calendar
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_SIZE = 1024
+
+# Columns each dataset's queries may name
+COLUMNS = {
+    "dataset1": ["risk", "reward", "habit", "season", "month", "bat_landing_to_food",
+                 "seconds_after_rat_arrival", "hours_after_sunset"],
+    "dataset2": ["season", "month", "bat_landing_number", "food_availability", "rat_minutes",
+                 "rat_arrival_number", "hours_after_sunset"],
+}
+
+# Month names -> the datasets' month code (calendar month modulo 12, so December is 0)
+MONTHS = {name.lower(): i % 12 for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i % 12 for i, name in enumerate(calendar.month_abbr) if name})
+
+STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class BadRequest(ValueError):
+    """A query the service cannot answer as asked (answered with HTTP 400)."""
+
+
+class LRUCache:
+    """At most `maxsize` entries; the least recently used one is dropped first."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+
+
+def _plain(obj):
+    """JSON-ready copy: NumPy scalars and arrays become Python values, NaN becomes null."""
+    if isinstance(obj, dict):
+        return {str(k): _plain(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return _plain(obj.tolist())
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    return obj
+
+
+def _one(query, name, default=None):
+    values = query.get(name)
+    return default if not values else values[-1]
+
+
+class AnalysisService:
+    """Warm datasets and model, a thread pool for the tests and an LRU of finished results."""
+
+    def __init__(self, cache_size=CACHE_SIZE, workers=None):
+        self.cache = LRUCache(cache_size)
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self.frames = {}
+        self.dropped = {}
+        self.logit = None
+
+    def warm(self):
+        """Load both datasets, import SciPy and fit the risk logit before the first query."""
+        from scipy import stats  # noqa: F401
+
+        import analyses
+        import small_sample  # noqa: F401
+        from data_access import load_datasets, season_from_month, season_names
+        from sunset import TIME_COLUMNS
+        from validation import month_mismatch
+
+        d1, d2 = load_datasets()
+        self.logit = analyses.fit_risk_logit(d1)
+        self.frames = {
+            "dataset1": d1.assign(season=season_names(d1["season"])),
+            "dataset2": d2.assign(season=season_from_month(d2["month"])),
+        }
+        # month names are only right if each row's month code matches its timestamp
+        for name, df in self.frames.items():
+            bad = month_mismatch(df["month"], df[TIME_COLUMNS[name]])
+            self.dropped[name] = int(bad.sum())
+            if bad.any():
+                print(f"{name}: dropping {bad.sum()} rows whose month code disagrees with their timestamp",
+                      flush=True)
+                self.frames[name] = df[~bad]
+
+    # ---------- queries ----------
+
+    def _subset(self, name, query):
+        """Rows of a dataset matching the site, season and month filters."""
+        df = self.frames[name]
+        mask = np.ones(len(df), dtype=bool)
+        site = _one(query, "site")
+        if site is not None:
+            if "site" not in df.columns:
+                raise BadRequest(f"{name} has no site column")
+            mask &= (df["site"].astype(str) == site).to_numpy()
+        season = _one(query, "season")
+        if season is not None:
+            if season not in ("winter", "spring"):
+                raise BadRequest(f"season must be winter or spring, not {season!r}")
+            mask &= (df["season"] == season).to_numpy()
+        month = _one(query, "month")
+        if month is not None:
+            mask &= (df["month"] == self._month(month)).to_numpy()
+        return df[mask]
+
+    @staticmethod
+    def _month(value):
+        if value.lower() in MONTHS:
+            return MONTHS[value.lower()]
+        try:
+            return int(value)
+        except ValueError:
+            raise BadRequest(f"month must be a number or a month name, not {value!r}") from None
+
+    @staticmethod
+    def _column(name, query, key, default=None):
+        column = _one(query, key, default)
+        if column is None:
+            raise BadRequest(f"missing parameter {key!r}")
+        if column not in COLUMNS[name]:
+            raise BadRequest(f"{key}={column!r} is not a column of {name} ({', '.join(COLUMNS[name])})")
+        return column
+
+    @staticmethod
+    def _dataset(query, default):
+        name = _one(query, "dataset", default)
+        if name not in COLUMNS:
+            raise BadRequest(f"dataset must be dataset1 or dataset2, not {name!r}")
+        return name
+
+    def crosstab(self, query):
+        from small_sample import chi_square_auto
+
+        name = self._dataset(query, "dataset1")
+        row, col = self._column(name, query, "row", "risk"), self._column(name, query, "col", "reward")
+        df = self._subset(name, query)
+        ct = pd.crosstab(df[row], df[col])
+        result = {"n": int(ct.to_numpy().sum()), "rows": ct.index.tolist(), "columns": ct.columns.tolist(),
+                  "counts": ct.to_numpy()}
+        if ct.shape[0] >= 2 and ct.shape[1] >= 2:
+            chi = chi_square_auto(ct)
+            result.update({key: chi[key] for key in ["chi2", "dof", "p", "cramers_v", "method"]})
+        return result
+
+    def spearman(self, query):
+        from small_sample import spearman_auto
+
+        name = self._dataset(query, "dataset2")
+        x, y = self._column(name, query, "x"), self._column(name, query, "y")
+        df = self._subset(name, query)[[x, y]].dropna()
+        if len(df) < 3:
+            return {"n": len(df), "rho": None, "p": None, "method": None}
+        rho, p, method = spearman_auto(df[x].to_numpy(float), df[y].to_numpy(float))
+        return {"n": len(df), "rho": rho, "p": p, "method": method}
+
+    def mann_whitney(self, query):
+        from small_sample import mann_whitney_auto
+
+        value = self._column("dataset1", query, "value", "bat_landing_to_food")
+        by = self._column("dataset1", query, "by", "risk")
+        df = self._subset("dataset1", query)[[value, by]].dropna()
+        levels = sorted(df[by].unique().tolist())
+        if len(levels) != 2:
+            raise BadRequest(f"{by} has {len(levels)} levels in this subset; Mann–Whitney needs two")
+        x, y = (df.loc[df[by] == level, value].to_numpy(float) for level in levels)
+        mw = mann_whitney_auto(x, y)
+        return {"groups": levels, "n": [len(x), len(y)], "u": mw["u"], "p": mw["p"],
+                "rank_biserial": mw["rank_biserial"], "method": mw["method"]}
+
+    def predict(self, query):
+        from data_access import SEASON_CODE_NAMES
+
+        try:
+            minutes = float(_one(query, "minutes", ""))
+        except ValueError:
+            raise BadRequest("minutes must be a number") from None
+        season = _one(query, "season")
+        names = {label: code for code, label in SEASON_CODE_NAMES.items()}
+        if season is not None and season not in names:
+            raise BadRequest(f"season must be winter or spring, not {season!r}")
+        seasons = [season] if season is not None else list(names)
+        frame = pd.DataFrame({"seconds_after_rat_arrival": minutes * 60.0,
+                              "season": [names[s] for s in seasons]})
+        probability = np.asarray(self.logit.predict(frame))
+        return {"minutes": minutes, "p_risk": dict(zip(seasons, probability))}
+
+    def health(self, query):
+        return {"status": "ok", "rows": {name: len(df) for name, df in self.frames.items()},
+                "dropped": self.dropped,
+                "cache": {"size": len(self.cache.entries), "maxsize": self.cache.maxsize,
+                          "hits": self.cache.hits, "misses": self.cache.misses}}
+
+    # ---------- dispatch ----------
+
+    ROUTES = {"/crosstab": "crosstab", "/spearman": "spearman", "/mann_whitney": "mann_whitney",
+              "/predict": "predict", "/health": "health"}
+
+    async def answer(self, path, query):
+        """Result for one query, from the LRU or computed on the thread pool."""
+        handler = getattr(self, self.ROUTES[path])
+        if path == "/health":
+            return handler(query)
+        key = (path, tuple(sorted((k, v[-1]) for k, v in query.items())))
+        future = self.cache.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, handler, query)
+            self.cache.put(key, future)
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            # failures (bad parameters included) are not remembered
+            self.cache.discard(key)
+            raise
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 GET requests on one connection until the client closes it."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = header.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, 400, {"error": "malformed request line"}, close=True)
+                    break
+                close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+                status, body = await self._respond(method, target)
+                await self._send(writer, status, body, close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, target):
+        if method != "GET":
+            return 405, {"error": "only GET is supported"}
+        url = urlsplit(target)
+        if url.path not in self.ROUTES:
+            return 404, {"error": f"unknown path {url.path}", "paths": sorted(self.ROUTES)}
+        query = parse_qs(url.query)
+        start = time.perf_counter()
+        try:
+            result = await self.answer(url.path, query)
+        except BadRequest as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+        return 200, {"query": {k: v[-1] for k, v in query.items()}, "result": result,
+                     "ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    @staticmethod
+    async def _send(writer, status, body, close):
+        payload = json.dumps(_plain(body)).encode()
+        head = (f"HTTP/1.1 {status} {STATUS[status]}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+
+async def serve(host=HOST, port=PORT, cache_size=CACHE_SIZE, workers=None):
+    """Warm the service, then answer queries until cancelled."""
+    started = time.perf_counter()
+    service = AnalysisService(cache_size, workers)
+    await asyncio.get_running_loop().run_in_executor(None, service.warm)
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving on http://{host}:{port} (warm in {time.perf_counter() - started:.2f}s)", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Answer analysis queries over HTTP from warm in-memory data.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="results kept in the LRU")
+    parser.add_argument("--workers", type=int, default=None, help="threads running tests (default: one per core)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.cache_size, args.workers))
+    except KeyboardInterrupt:
+        pass
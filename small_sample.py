@@ -0,0 +1,326 @@
+'''
+
+Exact tests for small cells, asymptotic ones for large cells
+
+Once the data is split by site, month and season many cells hold only a handful of
+rows, where the chi-square, normal and t approximations used by analyses.py and
+batch_tests.py stop being trustworthy. The functions here pick the method per cell:
+
+    chi-square   2x2 tables with an expected count under FISHER_MIN_EXPECTED get
+                 Fisher's exact test (two-sided, as scipy.stats.fisher_exact)
+    Mann–Whitney cells of at most MWU_EXACT_MAX_N rows get the exact permutation
+                 distribution of the rank sum, ties included
+    Spearman     cells of at most SPEARMAN_EXACT_MAX_N rows get an exact permutation
+                 test over every pairing of the ranks
+
+and every other cell keeps the asymptotic result. A "method" column (or key) says
+which one was used.
+
+The exact null distributions depend only on the cell's shape: the table margins for
+Fisher, the group sizes and tie pattern for Mann–Whitney, the size and the two tie
+patterns for Spearman. Each one is computed once (Mann–Whitney by dynamic programming
+over the ranks rather than by enumerating subsets) and kept in an lru_cache, so
+thousands of small cells cost a few distinct distributions plus a lookup each.
+
+    dispatch_chi_square(df, by, row, col)          batch_tests tables, plus a method column
+    dispatch_mann_whitney(df, by, value, group)
+    dispatch_spearman(df, by, x, y)
+    chi_square_auto(ct), mann_whitney_auto(x, y)   one table / one pair of samples
+
+'''
+
+
+# Import libraries
+from functools import lru_cache
+from itertools import combinations, permutations
+from math import factorial, prod
+
+import numpy as np
+import pandas as pd
+
+# Below this expected count in any cell a 2x2 table gets Fisher's exact test
+FISHER_MIN_EXPECTED = 5
+
+# Largest cells (rows in both groups / pairs) given an exact test
+MWU_EXACT_MAX_N = 40
+SPEARMAN_EXACT_MAX_N = 9
+
+# Relative tolerance for "as or more extreme" on probabilities (scipy uses the same)
+RTOL = 1 + 1e-7
+
+
+def _doubled_midranks(runs):
+    """Twice the midrank of every position, for a tie pattern (integers, so sums stay exact)."""
+    ends = np.cumsum(runs)
+    return np.repeat(2 * ends - np.asarray(runs) + 1, runs)
+
+
+def _ranks(values):
+    """(doubled midranks of values, tie pattern): run lengths of equal values in sorted order."""
+    _, inverse, runs = np.unique(np.asarray(values, dtype=float), return_inverse=True, return_counts=True)
+    ends = np.cumsum(runs)
+    return (2 * ends - runs + 1)[inverse], tuple(runs.tolist())
+
+
+# ---------- Fisher's exact test ----------
+
+@lru_cache(maxsize=None)
+def _hypergeom_pmf(row1, col1, n):
+    """P(top-left = k) for k from its lowest possible value, given the margins of a 2x2 table."""
+    from scipy import stats
+
+    low = max(0, row1 + col1 - n)
+    k = np.arange(low, min(row1, col1) + 1)
+    return low, stats.hypergeom.pmf(k, n, row1, col1)
+
+
+def fisher_exact(table):
+    """Sample odds ratio and two-sided Fisher exact p-value of a 2x2 table."""
+    (a, b), (c, d) = np.asarray(table, dtype=np.int64)
+    low, pmf = _hypergeom_pmf(int(a + b), int(a + c), int(a + b + c + d))
+    p = pmf[pmf <= pmf[a - low] * RTOL].sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        odds = np.float64(a * d) / np.float64(b * c)
+    return float(odds), float(min(p, 1.0))
+
+
+# ---------- exact Mann–Whitney ----------
+
+@lru_cache(maxsize=None)
+def _rank_sum_null(n1, runs):
+    """P(S <= s) and P(S >= s) for the doubled rank sum S of n1 rows drawn from a tie pattern.
+
+    counts[k, s] is the number of ways to pick k rows with doubled ranks summing to s;
+    adding the rows one at a time only ever reads the previous row's counts.
+    """
+    ranks = _doubled_midranks(runs)
+    counts = np.zeros((n1 + 1, int(ranks.sum()) + 1))
+    counts[0, 0] = 1.0
+    for r in ranks:
+        counts[1:, r:] = counts[1:, r:] + counts[:-1, :-r]
+    pmf = counts[n1] / counts[n1].sum()
+    return np.cumsum(pmf), np.cumsum(pmf[::-1])[::-1]
+
+
+def mann_whitney_exact(x, y):
+    """U of x and its exact two-sided permutation p-value (ties handled exactly)."""
+    n1 = len(x)
+    ranks, runs = _ranks(np.concatenate([np.asarray(x, dtype=float), np.asarray(y, dtype=float)]))
+    s = int(ranks[:n1].sum())
+    cdf, sf = _rank_sum_null(n1, runs)
+    p = min(1.0, 2 * min(cdf[s], sf[s]))
+    return s / 2 - n1 * (n1 + 1) / 2, float(p)
+
+
+# ---------- exact Spearman ----------
+
+@lru_cache(maxsize=None)
+def _pairings(n):
+    """Every permutation of range(n), one per row."""
+    return np.array(list(permutations(range(n))), dtype=np.int8).reshape(-1, n)
+
+
+@lru_cache(maxsize=None)
+def _arrangements(runs):
+    """Every distinct ordering of a sample's tie groups, one row of group numbers each.
+
+    Rows only differ where tied values trade places, so a sample with ties has far
+    fewer of them than the n! permutations. They are built group by group: each row
+    is extended by every choice of positions, among its free ones, for the next group.
+    """
+    n = sum(runs)
+    if len(runs) == n:
+        return _pairings(n)
+    rows = np.full((1, n), len(runs) - 1, dtype=np.int8)
+    for group, size in enumerate(runs[:-1]):
+        free = n - sum(runs[:group])
+        # positions still holding the last group's number are the unassigned ones
+        open_positions = np.nonzero(rows == len(runs) - 1)[1].reshape(len(rows), free)
+        picks = np.array(list(combinations(range(free), size)), dtype=np.int64)
+        grown = np.repeat(rows, len(picks), axis=0)
+        chosen = open_positions[:, picks].reshape(-1, size)
+        grown[np.arange(len(grown))[:, None], chosen] = group
+        rows = grown
+    return rows
+
+
+def _orderings(runs):
+    return factorial(sum(runs)) // prod(factorial(r) for r in runs)
+
+
+@lru_cache(maxsize=None)
+def _rank_product_null(runs_x, runs_y):
+    """Distinct values of n * sum(doubled x rank * doubled y rank) - n * its mean over every
+    pairing, with the number of pairings at or below each (integers, so ties compare exactly)."""
+    if _orderings(runs_x) < _orderings(runs_y):
+        # the distribution is symmetric in x and y: enumerate whichever has fewer orderings
+        runs_x, runs_y = runs_y, runs_x
+    a = _doubled_midranks(runs_x)
+    group_rank = 2 * np.cumsum(runs_y) - np.asarray(runs_y) + 1
+    centred = len(a) * (group_rank[_arrangements(runs_y)] @ a) - a.sum() * (group_rank @ np.asarray(runs_y))
+    low = centred.min()
+    counts = np.bincount(centred - low)
+    values = np.flatnonzero(counts)
+    return values + low, np.cumsum(counts[values])
+
+
+def spearman_exact(x, y):
+    """Spearman rho and its exact two-sided permutation p-value.
+
+    The statistic is sum(rank_x * rank_y), which orders pairings exactly as rho does; a
+    pairing counts as extreme when it is at least as far from the null mean.
+    """
+    (rx, runs_x), (ry, runs_y) = _ranks(x), _ranks(y)
+    if len(runs_x) < 2 or len(runs_y) < 2:
+        return float("nan"), float("nan")
+    n = len(rx)
+    dx, dy = rx - rx.mean(), ry - ry.mean()
+    rho = (dx @ dy) / np.sqrt((dx @ dx) * (dy @ dy))
+    observed = abs(n * int(rx @ ry) - int(rx.sum()) * int(ry.sum()))
+    if observed == 0:
+        return float(rho), 1.0
+    values, at_or_below = _rank_product_null(runs_x, runs_y)
+    total = at_or_below[-1]
+    below = np.searchsorted(values, -observed, side="right")
+    above = np.searchsorted(values, observed, side="left")
+    extreme = (at_or_below[below - 1] if below else 0) + total - (at_or_below[above - 1] if above else 0)
+    return float(rho), float(min(1.0, extreme / total))
+
+
+# ---------- dispatch over one table / one pair of samples ----------
+
+def chi_square_auto(ct):
+    """analyses.chi_square(), with Fisher's exact p for a sparse 2x2 table."""
+    from analyses import chi_square
+
+    result = chi_square(ct)
+    result["method"] = "asymptotic"
+    if ct.shape == (2, 2) and result["expected"].min() < FISHER_MIN_EXPECTED:
+        result["odds_ratio"], result["p"] = fisher_exact(ct)
+        result["method"] = "fisher_exact"
+    return result
+
+
+def mann_whitney_auto(x, y):
+    """analyses.mann_whitney(), with the exact p-value when the samples are small."""
+    from analyses import mann_whitney
+
+    if len(x) + len(y) > MWU_EXACT_MAX_N or not len(x) or not len(y):
+        return {**mann_whitney(x, y), "method": "asymptotic"}
+    u, p = mann_whitney_exact(x, y)
+    return {"x": x, "y": y, "u": u, "p": p, "rank_biserial": 1 - 2 * u / (len(x) * len(y)), "method": "exact"}
+
+
+def spearman_auto(x, y):
+    """(rho, p, method): analyses.spearman() or the exact permutation test for small samples."""
+    from analyses import spearman
+
+    if len(x) <= SPEARMAN_EXACT_MAX_N:
+        return (*spearman_exact(x, y), "exact")
+    return (*spearman(x, y), "asymptotic")
+
+
+def method_note(result):
+    """" (exact)" or " (fisher exact)" to print after a p-value that is not asymptotic."""
+    method = result.get("method", "asymptotic")
+    return "" if method == "asymptotic" else f" ({method.replace('_', ' ')})"
+
+
+# ---------- dispatch over every group of a frame ----------
+
+def _key(key):
+    return key if isinstance(key, tuple) else (key,)
+
+
+def _cells(df, by, columns):
+    """{group key tuple: (arrays of `columns`)} over the groups of df."""
+    grouped = df.groupby(by, observed=True)
+    arrays = [df[c].to_numpy() for c in columns]
+    return {_key(k): [a[rows] for a in arrays] for k, rows in grouped.indices.items()}
+
+
+def _table_keys(out, by):
+    return list(out[by].itertuples(index=False, name=None))
+
+
+def dispatch_chi_square(df, by, row, col, correction=True):
+    """batch_chi_square(), with Fisher's exact test in sparse 2x2 cells.
+
+    In Fisher rows the statistic is the sample odds ratio and dof is NaN.
+    """
+    from batch_tests import _as_list, batch_chi_square
+
+    by = _as_list(by)
+    out = batch_chi_square(df, by, row, col, correction)
+    counts = df.groupby(by + [row, col], observed=True).size()
+    rows, cols = counts.index.levels[-2], counts.index.levels[-1]
+    cube = counts.unstack([row, col], fill_value=0)
+    cube = cube.reindex(columns=pd.MultiIndex.from_product([rows, cols]), fill_value=0)
+    tables = cube.to_numpy().reshape(len(cube), len(rows), len(cols))
+    lookup = {_key(k): t for k, t in zip(cube.index, tables)}
+
+    statistic, p, dof = (out[c].to_numpy(dtype=float, copy=True) for c in ["statistic", "p_value", "dof"])
+    method = np.full(len(out), "asymptotic", dtype=object)
+    for i, key in enumerate(_table_keys(out, by)):
+        table = lookup[key]
+        table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+        if table.shape != (2, 2):
+            continue
+        expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0, keepdims=True) / table.sum()
+        if expected.min() < FISHER_MIN_EXPECTED:
+            statistic[i], p[i] = fisher_exact(table)
+            dof[i], method[i] = np.nan, "fisher_exact"
+    return out.assign(statistic=statistic, dof=dof, p_value=p, method=method)
+
+
+def dispatch_mann_whitney(df, by, value, group, x=0, y=1):
+    """batch_mann_whitney(), with exact p-values in cells of at most MWU_EXACT_MAX_N rows."""
+    from batch_tests import _as_list, batch_mann_whitney
+
+    by = _as_list(by)
+    out = batch_mann_whitney(df, by, value, group, x, y)
+    p = out["p_value"].to_numpy(dtype=float, copy=True)
+    method = np.full(len(out), "asymptotic", dtype=object)
+    small = ((out["n"] <= MWU_EXACT_MAX_N) & out["statistic"].notna()).to_numpy()
+    if small.any():
+        sub = df.loc[df[group].isin([x, y]) & df[value].notna()]
+        cells = _cells(sub, by, [value, group])
+        for i, key in zip(np.flatnonzero(small), _table_keys(out[small], by)):
+            values, groups = cells[key]
+            _, p[i] = mann_whitney_exact(values[groups == x], values[groups == y])
+            method[i] = "exact"
+    return out.assign(p_value=p, method=method)
+
+
+def dispatch_spearman(df, by, x, y):
+    """batch_spearman(), with exact permutation p-values in cells of at most SPEARMAN_EXACT_MAX_N rows."""
+    from batch_tests import _as_list, batch_spearman
+
+    by = _as_list(by)
+    out = batch_spearman(df, by, x, y)
+    p = out["p_value"].to_numpy(dtype=float, copy=True)
+    method = np.full(len(out), "asymptotic", dtype=object)
+    small = (out["n"] <= SPEARMAN_EXACT_MAX_N).to_numpy()
+    if small.any():
+        cells = _cells(df.loc[df[x].notna() & df[y].notna()], by, [x, y])
+        for i, key in zip(np.flatnonzero(small), _table_keys(out[small], by)):
+            _, p[i] = spearman_exact(*cells[key])
+            method[i] = "exact"
+    return out.assign(p_value=p, method=method)
+
+
+if __name__ == "__main__":
+    from data_access import load_datasets, season_from_month, season_names
+
+    d1, d2 = load_datasets()
+    d1 = d1.assign(season=season_names(d1["season"]))
+    d2 = d2.assign(season=season_from_month(d2["month"]))
+    with pd.option_context("display.width", 160):
+        print("=== Risk x reward by month (dataset1) ===")
+        print(dispatch_chi_square(d1, "month", "risk", "reward").to_string(index=False), "\n")
+        print("=== Landing-to-food time by risk, per month (dataset1) ===")
+        print(dispatch_mann_whitney(d1, "month", "bat_landing_to_food", "risk").to_string(index=False), "\n")
+        print("=== Rat arrivals vs bat landings by month and hours after sunset (dataset2) ===")
+        hour = d2["hours_after_sunset"].floordiv(1).rename("hour")
+        table = dispatch_spearman(d2.assign(hour=hour), ["month", "hour"], "rat_arrival_number", "bat_landing_number")
+        print(table.to_string(index=False))
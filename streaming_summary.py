@@ -0,0 +1,338 @@
+'''
+
+Out-of-core descriptive statistics
+
+summarize_csv() profiles a raw or cleaned export in one pass over fixed-size chunks,
+so the file never has to fit in memory: count/mean/std/min/max per numeric column,
+approximate quartiles from a quantile sketch, value counts, crosstabs, group means and
+the bucketed means of dataset_cleaning.py step 9. With workers > 1 the file is cut
+into byte ranges on line boundaries and each range is summarized in its own process.
+
+Every accumulator merges exactly, so summarizing ranges separately and merging gives
+the same state as one pass over the whole file. Moments, crosstabs and bucket means
+reuse the accumulators of online_stats.py. Quantiles come from QuantileSketch, a
+DDSketch: values are counted in logarithmic buckets, so any quantile is within 1%
+relative error of a value in the data, and merging is adding bucket counts.
+
+Usage:
+    python streaming_summary.py dataset1 --raw --workers 4
+    python streaming_summary.py dataset2 --path big_export.csv --raw
+
+'''
+
+
+# Import libraries
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from online_stats import TRACKED, BucketMeans, ContingencyCounts, RunningMoments
+from raw_cleaning import CLEAN_DATE_FORMAT, CLEAN_PATHS, RAW_PATHS, SCHEMAS, BoundedReader, clean_chunk, py_scalar
+
+# Extra summaries on top of the numeric columns in SCHEMAS. Buckets reuse online_stats.TRACKED.
+SUMMARY = {
+    "dataset1": {
+        "value_counts": ["habit", "risk", "reward", "month", "season"],
+        "crosstabs": {"risk_reward": ("risk", "reward")},
+        "group_means": {"landing_to_food_by_risk": ("risk", "bat_landing_to_food")},
+    },
+    "dataset2": {
+        "value_counts": ["month"],
+        "crosstabs": {},
+        "group_means": {},
+    },
+}
+
+
+class QuantileSketch:
+    """DDSketch with relative accuracy `alpha`: mergeable approximate quantiles."""
+
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = self.max = None
+
+    def _add(self, store, magnitudes):
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        tiny = np.abs(values) < 1e-12
+        self.zeros += int(tiny.sum())
+        self._add(self.positive, values[(values > 0) & ~tiny])
+        self._add(self.negative, -values[(values < 0) & ~tiny])
+        self.count += len(values)
+        lo, hi = float(values.min()), float(values.max())
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+        return self
+
+    def merge(self, other):
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        for attr, pick in (("min", min), ("max", max)):
+            a, b = getattr(self, attr), getattr(other, attr)
+            setattr(self, attr, b if a is None else a if b is None else pick(a, b))
+        return self
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float("nan")
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = 0
+        # walk from the most negative value up: negatives by falling magnitude, zeros, positives
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+
+class ValueCounts:
+    """Exact counts of each distinct value, missing values counted separately."""
+
+    def __init__(self):
+        self.counts = {}
+        self.missing = 0
+
+    def update(self, values):
+        values = pd.Series(values)
+        self.missing += int(values.isna().sum())
+        for value, count in values.dropna().value_counts(sort=False).items():
+            value = py_scalar(value)
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        return self
+
+    def merge(self, other):
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        self.missing += other.missing
+        return self
+
+    def series(self):
+        return pd.Series(self.counts, dtype="int64").sort_values(ascending=False, kind="stable")
+
+
+class GroupMoments:
+    """RunningMoments of `value` for each level of a grouping column."""
+
+    def __init__(self):
+        self.groups = {}
+
+    def update(self, groups, values):
+        frame = pd.DataFrame({"g": np.asarray(groups), "v": np.asarray(values, dtype=float)}).dropna()
+        for key, part in frame.groupby("g", sort=False)["v"]:
+            self.groups.setdefault(py_scalar(key), RunningMoments()).update(part.to_numpy())
+        return self
+
+    def merge(self, other):
+        for key, moments in other.groups.items():
+            self.groups.setdefault(key, RunningMoments()).merge(moments)
+        return self
+
+    def means(self):
+        return pd.Series({k: m.mean for k, m in sorted(self.groups.items())})
+
+
+class StreamingSummary:
+    """All accumulators for one dataset; update() with chunks, merge() partial summaries."""
+
+    def __init__(self, name):
+        schema, extra = SCHEMAS[name], SUMMARY[name]
+        self.name = name
+        self.numeric = schema["floats"] + schema["ints"]
+        self.dates = schema["dates"]
+        self.rows = 0
+        self.nulls = {col: 0 for col in self.dates + schema["floats"] + schema["ints"] + schema["strings"]}
+        self.moments = {col: RunningMoments() for col in self.numeric}
+        self.sketches = {col: QuantileSketch() for col in self.numeric}
+        self.date_range = {col: [None, None] for col in self.dates}
+        self.value_counts = {col: ValueCounts() for col in extra["value_counts"]}
+        self.crosstabs = {key: ContingencyCounts() for key in extra["crosstabs"]}
+        self.group_means = {key: GroupMoments() for key in extra["group_means"]}
+        self.buckets = {key: BucketMeans(bins, labels)
+                        for key, (_, _, bins, labels) in TRACKED[name]["buckets"].items()}
+
+    def update(self, chunk):
+        """Fold in a chunk of cleaned rows (numeric columns numeric, dates as datetimes)."""
+        extra = SUMMARY[self.name]
+        self.rows += len(chunk)
+        for col in self.nulls:
+            self.nulls[col] += int(chunk[col].isna().sum())
+        for col in self.numeric:
+            values = pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=float)
+            self.moments[col].update(values)
+            self.sketches[col].update(values)
+        for col in self.dates:
+            values = chunk[col].dropna()
+            if len(values):
+                lo, hi = self.date_range[col]
+                self.date_range[col] = [values.min() if lo is None else min(lo, values.min()),
+                                        values.max() if hi is None else max(hi, values.max())]
+        for col, acc in self.value_counts.items():
+            acc.update(chunk[col])
+        for key, (row, col) in extra["crosstabs"].items():
+            self.crosstabs[key].update(chunk[row], chunk[col])
+        for key, (group, value) in extra["group_means"].items():
+            self.group_means[key].update(chunk[group], chunk[value])
+        for key, (by, value, _, _) in TRACKED[self.name]["buckets"].items():
+            self.buckets[key].update(chunk[by], chunk[value])
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        for col in self.nulls:
+            self.nulls[col] += other.nulls[col]
+        for col in self.numeric:
+            self.moments[col].merge(other.moments[col])
+            self.sketches[col].merge(other.sketches[col])
+        for col, (lo, hi) in other.date_range.items():
+            mine = self.date_range[col]
+            self.date_range[col] = [lo if mine[0] is None else mine[0] if lo is None else min(mine[0], lo),
+                                    hi if mine[1] is None else mine[1] if hi is None else max(mine[1], hi)]
+        for group in ("value_counts", "crosstabs", "group_means", "buckets"):
+            for key, acc in getattr(other, group).items():
+                getattr(self, group)[key].merge(acc)
+        return self
+
+    def describe(self):
+        """Table shaped like DataFrame.describe(): one column per data column."""
+        table = {}
+        for col in self.numeric:
+            m, sketch = self.moments[col].describe(), self.sketches[col]
+            quartiles = [sketch.quantile(q) for q in (0.25, 0.5, 0.75)]
+            if col in SCHEMAS[self.name]["ints"]:
+                # each bucket below ~50 holds at most one integer, so rounding recovers it
+                quartiles = [float(round(q)) for q in quartiles]
+            table[col] = {"count": m["count"], "mean": m["mean"], "std": m["std"], "min": m["min"],
+                          "25%": quartiles[0], "50%": quartiles[1], "75%": quartiles[2], "max": m["max"]}
+            if col in self.value_counts:
+                counts = self.value_counts[col].series()
+                table[col].update({"unique": len(counts), "top": counts.index[0] if len(counts) else None,
+                                   "freq": counts.iloc[0] if len(counts) else None})
+        for col, acc in self.value_counts.items():
+            if col not in table:
+                counts = acc.series()
+                table[col] = {"count": float(counts.sum()), "unique": len(counts),
+                              "top": counts.index[0] if len(counts) else None,
+                              "freq": counts.iloc[0] if len(counts) else None}
+        for col, (lo, hi) in self.date_range.items():
+            table[col] = {"count": float(self.rows - self.nulls[col]), "min": lo, "max": hi}
+        index = ["count", "unique", "top", "freq", "mean", "std", "min", "25%", "50%", "75%", "max"]
+        return pd.DataFrame(table).reindex(index)
+
+
+def _parse(chunk, name, raw):
+    if raw:
+        return clean_chunk(chunk, name)
+    for col in SCHEMAS[name]["dates"]:
+        chunk[col] = pd.to_datetime(chunk[col], format=CLEAN_DATE_FORMAT)
+    return chunk
+
+
+def _read_dtypes(name):
+    schema = SCHEMAS[name]
+    return {col: "string" for col in schema["dates"] + schema["strings"]}
+
+
+def _summarize_range(path, name, raw, start, stop, header, chunksize):
+    summary = StreamingSummary(name)
+    with open(path, "rb") as f:
+        f.seek(start)
+        reader = pd.read_csv(BoundedReader(f, stop), names=header, header=None,
+                             dtype=_read_dtypes(name), chunksize=chunksize)
+        for chunk in reader:
+            summary.update(_parse(chunk, name, raw))
+    return summary
+
+
+def _byte_ranges(path, parts):
+    """Split the body of a CSV into `parts` byte ranges that start and end on line boundaries."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline().decode().strip().split(",")
+        body = f.tell()
+        cuts = [body]
+        for i in range(1, parts):
+            f.seek(max(body + (size - body) * i // parts - 1, cuts[-1]))
+            f.readline()
+            cuts.append(max(f.tell(), cuts[-1]))
+        cuts.append(size)
+    return header, [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+
+def summarize_csv(name, path=None, raw=False, workers=1, chunksize=100_000):
+    """StreamingSummary of a whole CSV (raw export with raw=True), read in chunks."""
+    path = path or (RAW_PATHS if raw else CLEAN_PATHS)[name]
+    header, ranges = _byte_ranges(path, max(1, workers))
+    args = [(path, name, raw, start, stop, header, chunksize) for start, stop in ranges]
+    if workers == 1 or len(args) == 1:
+        parts = [_summarize_range(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_summarize_range, *zip(*args)))
+    summary = StreamingSummary(name)
+    for part in parts:
+        summary.merge(part)
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Profile a dataset export in one streaming pass.")
+    parser.add_argument("name", choices=list(SUMMARY))
+    parser.add_argument("--path", default=None, help="CSV to read (default: the repo's cleaned or raw file)")
+    parser.add_argument("--raw", action="store_true", help="the file is a raw export; clean each chunk first")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    summary = summarize_csv(args.name, args.path, args.raw, args.workers, args.chunksize)
+    with pd.option_context("display.width", 160, "display.max_columns", 20):
+        print(f"=== {args.name}: {summary.rows} rows ===\n")
+        print("Missing values:")
+        print(pd.Series(summary.nulls), "\n")
+        print(summary.describe(), "\n")
+        for col, acc in summary.value_counts.items():
+            print(f"Value counts: {col}")
+            print(acc.series(), "\n")
+        for key, acc in summary.crosstabs.items():
+            print(f"Crosstab: {key}")
+            print(acc.table(), "\n")
+        for key, acc in summary.group_means.items():
+            print(f"Group means: {key}")
+            print(acc.means(), "\n")
+        for key, acc in summary.buckets.items():
+            print(f"Bucket means: {key}")
+            print(acc.means(), "\n")
@@ -0,0 +1,204 @@
+'''
+
+Sunset times and hours after sunset, derived once per site and night
+
+The raw exports carry sunset_time and hours_after_sunset precomputed, but new field
+data can come without them. SunsetTable holds one sunset time per (site, night),
+computed with NOAA's solar equations (vectorized over every new key at once) and
+kept on disk in dataset_cleaned/sunset_table.csv, so each night is only ever computed
+once, whatever the number of rows. fill_sunset() merges the table onto a frame by
+(site, night) and fills in whichever of sunset_time and hours_after_sunset are missing.
+
+A row belongs to the night whose evening precedes it: anything before noon counts
+towards the previous day's sunset, so a landing at 03:58 is 11 hours after the sunset
+of the evening before. Site positions are listed in SITES. "default" is used for
+frames without a site column, and its position reproduces the sunset times in the
+original exports to within a minute; a site missing from SITES raises UnknownSiteError.
+
+Parallel cleaners (ingestion.py) should not each save the table: every worker returns
+the rows it added (SunsetTable.added()) and the parent merges them with add() and
+saves once.
+
+'''
+
+
+# Import libraries
+import os
+
+import numpy as np
+import pandas as pd
+
+from raw_cleaning import CLEAN_DIR
+
+TABLE_PATH = os.path.join(CLEAN_DIR, "sunset_table.csv")
+
+# Latitude, longitude (degrees, east positive) and time zone of each recording site
+SITES = {
+    "default": {"lat": 32.1, "lon": 34.75, "tz": "Asia/Jerusalem"},
+}
+
+# Column holding each row's timestamp
+TIME_COLUMNS = {"dataset1": "start_time", "dataset2": "time"}
+
+NIGHT_OFFSET = pd.Timedelta(hours=12)
+
+
+class UnknownSiteError(KeyError):
+    """Sunsets were needed for a site that has no position in SITES."""
+
+    def __str__(self):
+        # KeyError would show the message in quotes
+        return str(self.args[0]) if self.args else ""
+
+
+def night_of(times):
+    """Date of the evening each timestamp belongs to (times before noon go to the day before)."""
+    return (pd.DatetimeIndex(times) - NIGHT_OFFSET).normalize().as_unit("ns")
+
+
+def solar_sunset(dates, lat, lon, tz):
+    """Local sunset time (naive, to the minute) on each date, from NOAA's solar equations."""
+    dates = pd.DatetimeIndex(dates)
+    days = np.where(dates.is_leap_year, 366, 365)
+    # fractional year at 18:00, close enough to sunset for the declination and equation of time
+    g = 2 * np.pi / days * (dates.dayofyear - 1 + 0.25)
+    eqtime = 229.18 * (0.000075 + 0.001868 * np.cos(g) - 0.032077 * np.sin(g)
+                       - 0.014615 * np.cos(2 * g) - 0.040849 * np.sin(2 * g))
+    decl = (0.006918 - 0.399912 * np.cos(g) + 0.070257 * np.sin(g) - 0.006758 * np.cos(2 * g)
+            + 0.000907 * np.sin(2 * g) - 0.002697 * np.cos(3 * g) + 0.00148 * np.sin(3 * g))
+    lat = np.radians(lat)
+    cos_ha = np.cos(np.radians(90.833)) / (np.cos(lat) * np.cos(decl)) - np.tan(lat) * np.tan(decl)
+    hour_angle = np.degrees(np.arccos(np.clip(cos_ha, -1, 1)))
+    utc_minutes = 720 - 4 * (lon - hour_angle) - eqtime
+    utc = dates.tz_localize("UTC") + pd.to_timedelta(np.asarray(utc_minutes), unit="min")
+    return utc.tz_convert(tz).tz_localize(None).round("min")
+
+
+class SunsetTable:
+    """(site, night) -> sunset time, computed on demand and cached on disk."""
+
+    def __init__(self, table=None, path=TABLE_PATH):
+        self.path = path
+        if table is None:
+            table = pd.DataFrame({"site": pd.Series(dtype=object), "night": pd.Series(dtype="datetime64[ns]"),
+                                  "lat": pd.Series(dtype=float), "lon": pd.Series(dtype=float),
+                                  "tz": pd.Series(dtype=object), "sunset_time": pd.Series(dtype="datetime64[ns]")})
+        self.table = table.astype({"night": "datetime64[ns]", "sunset_time": "datetime64[ns]"})
+        self.dirty = False
+        self.new_rows = []  # rows computed since loading, for added()
+
+    @classmethod
+    def load(cls, path=TABLE_PATH):
+        if not os.path.exists(path):
+            return cls(path=path)
+        table = pd.read_csv(path, parse_dates=["night", "sunset_time"], dtype={"site": str})
+        return cls(table, path)
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp-{os.getpid()}"
+        self.table.to_csv(tmp, index=False, date_format="%Y-%m-%d %H:%M:%S")
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def added(self):
+        """Rows computed since this table was loaded (to hand to another table's add())."""
+        if not self.new_rows:
+            return self.table.iloc[:0]
+        return pd.concat(self.new_rows, ignore_index=True)
+
+    def add(self, rows):
+        """Merge rows computed elsewhere (e.g. by a worker process), skipping known (site, night) pairs."""
+        if len(rows) == 0:
+            return
+        current = self._current()
+        rows = rows.drop_duplicates(["site", "night"])
+        new = rows.merge(current[["site", "night"]], on=["site", "night"], how="left", indicator=True)
+        new = new[new["_merge"] == "left_only"].drop(columns="_merge")
+        if len(new):
+            self.table = pd.concat([current, new[current.columns]], ignore_index=True)
+            self.dirty = True
+
+    def _current(self):
+        """Cached rows whose site position still matches SITES."""
+        table = self.table
+        if table.empty:
+            return table
+        position = pd.DataFrame([{"site": s, "lat": p["lat"], "lon": p["lon"], "tz": p["tz"]}
+                                 for s, p in SITES.items()])
+        return table.merge(position, on=["site", "lat", "lon", "tz"])
+
+    def lookup(self, keys):
+        """Sunset time per (site, night) row of `keys`, computing only the pairs not cached yet."""
+        keys = keys.drop_duplicates()
+        unknown = set(keys["site"]) - set(SITES)
+        if unknown:
+            raise UnknownSiteError(f"no position for site(s) {sorted(unknown)}; add them to sunset.SITES")
+        current = self._current()
+        missing = keys.merge(current[["site", "night"]], on=["site", "night"], how="left", indicator=True)
+        missing = missing[missing["_merge"] == "left_only"][["site", "night"]]
+        if len(missing):
+            parts = []
+            for site, rows in missing.groupby("site"):
+                pos = SITES[site]
+                parts.append(rows.assign(lat=pos["lat"], lon=pos["lon"], tz=pos["tz"],
+                                         sunset_time=solar_sunset(rows["night"], pos["lat"], pos["lon"], pos["tz"])))
+            # stale rows for a site whose position changed are dropped with the new ones added
+            self.table = pd.concat([current] + parts, ignore_index=True)
+            self.dirty = True
+            self.new_rows.extend(parts)
+            current = self.table
+        return keys.merge(current[["site", "night", "sunset_time"]], on=["site", "night"], how="left")
+
+
+def fill_sunset(df, name, table=None, overwrite=False):
+    """Fill missing sunset_time (dataset1) and hours_after_sunset from the sunset table.
+
+    Only the distinct (site, night) pairs of rows missing a value are looked up, and the
+    result is mapped back onto the rows by key. With overwrite=True every row is filled.
+    """
+    targets = ["sunset_time", "hours_after_sunset"] if name == "dataset1" else ["hours_after_sunset"]
+    need = np.full(len(df), overwrite)
+    for col in targets:
+        need |= df[col].isna().to_numpy() if col in df.columns else True
+    times = pd.DatetimeIndex(df[TIME_COLUMNS[name]])
+    need &= ~np.isnat(times.to_numpy())
+    df = df.copy()
+    if not need.any():
+        return df
+
+    own_table = table is None
+    table = SunsetTable.load() if own_table else table
+    site = df["site"].astype(str).to_numpy() if "site" in df.columns else np.full(len(df), "default", dtype=object)
+    keys = pd.DataFrame({"site": site[need], "night": night_of(times[need])})
+    found = table.lookup(keys)
+    index = pd.MultiIndex.from_frame(found[["site", "night"]])
+    positions = index.get_indexer(pd.MultiIndex.from_frame(keys))
+    sunset = np.full(len(df), np.datetime64("NaT"), dtype="datetime64[ns]")
+    sunset[need] = found["sunset_time"].to_numpy("datetime64[ns]")[positions]
+    sunset = pd.Series(sunset, index=df.index)
+    if name == "dataset1":
+        keep = not overwrite and "sunset_time" in df.columns
+        df["sunset_time"] = df["sunset_time"].fillna(sunset) if keep else sunset
+        # a recorded sunset is used for the hours where there is one
+        sunset = df["sunset_time"]
+    hours = pd.Series(np.asarray((times - pd.DatetimeIndex(sunset)).total_seconds() / 3600), index=df.index)
+    keep = not overwrite and "hours_after_sunset" in df.columns
+    df["hours_after_sunset"] = df["hours_after_sunset"].fillna(hours) if keep else hours
+    if own_table:
+        table.save()
+    return df
+
+
+if __name__ == "__main__":
+    from data_access import load_datasets
+
+    d1, _ = load_datasets()
+    table = SunsetTable.load()
+    derived = fill_sunset(d1, "dataset1", table, overwrite=True)
+    table.save()
+    diff = (derived["sunset_time"] - d1["sunset_time"]).abs().dt.total_seconds() / 60
+    print(f"{len(table.table)} (site, night) sunsets cached in {table.path}")
+    print(f"dataset1: derived vs recorded sunset differ by {diff.mean():.2f} min on average, {diff.max():.0f} min at most")
@@ -0,0 +1,240 @@
+'''
+
+Data-quality validation of the raw exports
+
+RULES declares what a valid row of each dataset looks like: allowed values, ranges,
+the habit vocabulary, rat periods that end after they start, landings inside their rat
+period, month codes that match the row's timestamp and dataset2's 30-minute observation
+grid. Validator.check() evaluates every
+rule on a raw chunk as one vectorized mask per rule and adds the violations to a
+ValidationReport. The report keeps a count and the first few row numbers per rule, so
+it stays small however large the export is.
+
+Rules marked "error" describe rows no analysis should ever see; a chunk breaking one
+raises ValidationError, which clean_raw() lets through so the cleaned file is never
+replaced by a bad batch. "warn" rules (unparseable or missing values that cleaning
+drops anyway, free-text habits, rat_minutes over a whole window, a month code that
+disagrees with the timestamp) are only reported.
+
+Usage:
+    python validation.py                 # validate both raw exports, print the report
+    python validation.py dataset2 --path new_export.csv
+
+'''
+
+
+# Import libraries
+import re
+
+import numpy as np
+import pandas as pd
+
+from raw_cleaning import CHUNK_SIZE, RAW_PATHS, SCHEMAS, coerce_types, read_raw_chunks
+
+# Words that make up a habit label ("bat_and_pick", "rat attack", "other_bats/rat")
+HABIT_WORDS = ["fast", "pick", "rat", "rats", "bat", "bats", "fight", "attack", "eating", "gaze",
+               "food", "bowl", "no", "and", "all", "both", "other", "others", "far", "out"]
+HABIT_PATTERN = r"(?:{w})(?:[_ /]+(?:{w}))*".format(w="|".join(HABIT_WORDS))
+
+# How many example row numbers each rule keeps
+EXAMPLES = 5
+
+RULES = {
+    "dataset1": [
+        {"name": "risk_binary", "kind": "allowed", "column": "risk", "values": [0, 1], "level": "error"},
+        {"name": "reward_binary", "kind": "allowed", "column": "reward", "values": [0, 1], "level": "error"},
+        {"name": "season_code", "kind": "allowed", "column": "season", "values": [0, 1], "level": "error"},
+        {"name": "month_code", "kind": "range", "column": "month", "min": 0, "max": 11, "level": "error"},
+        {"name": "month_matches_time", "kind": "month", "column": "month", "time": "start_time", "level": "warn"},
+        {"name": "landing_to_food_nonnegative", "kind": "range", "column": "bat_landing_to_food",
+         "min": 0, "level": "error"},
+        {"name": "seconds_after_rat_nonnegative", "kind": "range", "column": "seconds_after_rat_arrival",
+         "min": 0, "level": "error"},
+        {"name": "hours_after_sunset_range", "kind": "range", "column": "hours_after_sunset",
+         "min": -3, "max": 15, "level": "warn"},
+        {"name": "rat_period_order", "kind": "order", "low": "rat_period_start", "high": "rat_period_end",
+         "level": "error"},
+        {"name": "landing_in_rat_period", "kind": "between", "column": "start_time",
+         "low": "rat_period_start", "high": "rat_period_end", "level": "error"},
+        {"name": "habit_vocabulary", "kind": "pattern", "column": "habit", "pattern": HABIT_PATTERN,
+         "level": "warn"},
+    ],
+    "dataset2": [
+        {"name": "month_code", "kind": "range", "column": "month", "min": 0, "max": 11, "level": "error"},
+        {"name": "month_matches_time", "kind": "month", "column": "month", "time": "time", "level": "warn"},
+        {"name": "landings_nonnegative", "kind": "range", "column": "bat_landing_number", "min": 0,
+         "level": "error"},
+        {"name": "arrivals_nonnegative", "kind": "range", "column": "rat_arrival_number", "min": 0,
+         "level": "error"},
+        {"name": "food_nonnegative", "kind": "range", "column": "food_availability", "min": 0, "level": "error"},
+        {"name": "rat_minutes_nonnegative", "kind": "range", "column": "rat_minutes", "min": 0, "level": "error"},
+        {"name": "rat_minutes_within_window", "kind": "range", "column": "rat_minutes", "max": 30,
+         "level": "warn"},
+        {"name": "hours_after_sunset_range", "kind": "range", "column": "hours_after_sunset",
+         "min": -3, "max": 15, "level": "warn"},
+        # inside a night rows are 30 minutes apart (or a multiple, when windows are missing);
+        # gaps of several hours are the daytime break between nights
+        {"name": "time_spacing", "kind": "spacing", "column": "time", "step": "30min", "gap": "6h",
+         "level": "error"},
+    ],
+}
+
+
+def month_mismatch(months, times):
+    """Rows whose month code is not the calendar month of `times` modulo 12 (December = 0)."""
+    return (months != times.dt.month % 12).to_numpy(dtype=bool, na_value=False)
+
+
+class ValidationError(ValueError):
+    """A chunk broke an error-level rule; .report holds what was found."""
+
+    def __init__(self, report):
+        super().__init__(f"{report.name}: {report.errors()} error-level violations\n{report.table()}")
+        self.report = report
+
+
+class ValidationReport:
+    """Violation counts and example row numbers per rule, mergeable across chunks."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.levels = {}
+        self.counts = {}
+        self.examples = {}
+
+    def add(self, rule, level, mask, index):
+        mask = np.asarray(mask, dtype=bool)
+        self.levels[rule] = level
+        hits = int(mask.sum())
+        self.counts[rule] = self.counts.get(rule, 0) + hits
+        found = self.examples.setdefault(rule, [])
+        if hits and len(found) < EXAMPLES:
+            found.extend(np.asarray(index)[mask][:EXAMPLES - len(found)].tolist())
+
+    def merge(self, other):
+        self.rows += other.rows
+        for rule, count in other.counts.items():
+            self.levels[rule] = other.levels[rule]
+            self.counts[rule] = self.counts.get(rule, 0) + count
+            found = self.examples.setdefault(rule, [])
+            found.extend(other.examples[rule][:EXAMPLES - len(found)])
+        return self
+
+    def errors(self):
+        return sum(n for rule, n in self.counts.items() if self.levels[rule] == "error")
+
+    def table(self):
+        """One line per rule that was broken: level, violations, rate and example data rows."""
+        broken = [r for r, n in self.counts.items() if n]
+        return pd.DataFrame({
+            "level": [self.levels[r] for r in broken],
+            "violations": [self.counts[r] for r in broken],
+            "rate": [round(self.counts[r] / self.rows, 4) if self.rows else 0.0 for r in broken],
+            "example_rows": [self.examples[r] for r in broken],
+        }, index=pd.Index(broken, name="rule"))
+
+
+class Validator:
+    """Evaluates RULES[name] chunk by chunk, carrying what spans chunks (the previous timestamp).
+
+    `last` maps spacing rules to the last timestamp seen (ns since the epoch). Pass a saved
+    copy to pick up where an earlier Validator over the same file stopped.
+    """
+
+    def __init__(self, name, rules=None, reject=True, last=None):
+        self.name = name
+        self.rules = RULES[name] if rules is None else rules
+        self.reject = reject
+        self.report = ValidationReport(name)
+        self.last = dict(last or {})
+        self._patterns = {r["name"]: re.compile(r["pattern"]) for r in self.rules if r["kind"] == "pattern"}
+
+    def _mask(self, rule, chunk):
+        kind = rule["kind"]
+        if kind == "allowed":
+            values = chunk[rule["column"]]
+            return values.notna() & ~values.isin(rule["values"])
+        if kind == "range":
+            values = chunk[rule["column"]]
+            mask = np.zeros(len(chunk), dtype=bool)
+            if "min" in rule:
+                mask |= (values < rule["min"]).to_numpy(dtype=bool, na_value=False)
+            if "max" in rule:
+                mask |= (values > rule["max"]).to_numpy(dtype=bool, na_value=False)
+            return mask
+        if kind == "order":
+            return (chunk[rule["high"]] < chunk[rule["low"]]).to_numpy(dtype=bool, na_value=False)
+        if kind == "between":
+            values = chunk[rule["column"]]
+            outside = (values < chunk[rule["low"]]) | (values > chunk[rule["high"]])
+            return outside.to_numpy(dtype=bool, na_value=False)
+        if kind == "pattern":
+            values = chunk[rule["column"]].astype("string")
+            return (~values.str.fullmatch(self._patterns[rule["name"]])).to_numpy(dtype=bool, na_value=False)
+        if kind == "month":
+            return month_mismatch(chunk[rule["column"]], chunk[rule["time"]])
+        if kind == "spacing":
+            return self._spacing(rule, chunk[rule["column"]])
+        raise ValueError(f"unknown rule kind {kind!r}")
+
+    def _spacing(self, rule, times):
+        step, gap = pd.Timedelta(rule["step"]).value, pd.Timedelta(rule["gap"]).value
+        valid = times.notna().to_numpy()
+        ns = times.to_numpy("datetime64[ns]")[valid].view("i8")
+        mask = np.zeros(len(times), dtype=bool)
+        if not len(ns):
+            return mask
+        last = self.last.get(rule["name"])
+        diffs = np.diff(ns, prepend=ns[0] if last is None else last)
+        bad = (diffs <= 0) | ((diffs < gap) & (diffs % step != 0))
+        if last is None:
+            bad[0] = False
+        mask[valid] = bad
+        self.last[rule["name"]] = int(ns[-1])
+        return mask
+
+    def check(self, chunk):
+        """Validate one raw chunk; returns it with types coerced (as raw_cleaning.coerce_types)."""
+        schema = SCHEMAS[self.name]
+        report = ValidationReport(self.name)
+        report.rows = len(chunk)
+        present = {col: chunk[col].notna().to_numpy()
+                   for col in schema["dates"] + schema["floats"] + schema["ints"] if col in chunk.columns}
+        chunk = coerce_types(chunk, self.name)
+        for col, had_value in present.items():
+            report.add(f"{col}_type", "warn", had_value & chunk[col].isna().to_numpy(), chunk.index)
+        for col in schema["required"]:
+            report.add(f"{col}_required", "warn", chunk[col].isna().to_numpy(), chunk.index)
+        for rule in self.rules:
+            report.add(rule["name"], rule["level"], self._mask(rule, chunk), chunk.index)
+        self.report.merge(report)
+        if self.reject and report.errors():
+            raise ValidationError(report)
+        return chunk
+
+
+def validate_csv(name, path=None, chunksize=CHUNK_SIZE, reject=False):
+    """ValidationReport for a whole raw export, read in chunks."""
+    validator = Validator(name, reject=reject)
+    for chunk in read_raw_chunks(path or RAW_PATHS[name], name, chunksize):
+        validator.check(chunk)
+    return validator.report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check raw exports against the declared rules.")
+    parser.add_argument("names", nargs="*", help="dataset1 and/or dataset2 (default: both)")
+    parser.add_argument("--path", default=None, help="raw CSV to check (only with a single dataset name)")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(RULES)
+    if unknown:
+        parser.error(f"unknown dataset(s): {', '.join(sorted(unknown))}")
+
+    for dataset in args.names or list(RULES):
+        report = validate_csv(dataset, args.path)
+        print(f"=== {dataset}: {report.rows} rows, {report.errors()} error-level violations ===")
+        table = report.table()
+        print(table.to_string() if len(table) else "No violations.", "\n")